@@ -0,0 +1,83 @@
+# data/cart.py
+"""Компактная корзина: ID товара -> количество, итоги считаются на лету.
+
+Корзина не хранит ссылки на объекты каталога: только ID, количество
+и цену на момент добавления. Сумма и число товаров поддерживаются
+инкрементально, поэтому просмотр и оформление не пересчитывают корзину.
+"""
+from typing import Dict, Iterator, Tuple
+
+
+class Cart:
+    """Корзина одного пользователя"""
+
+    __slots__ = ('_qty', '_prices', 'count', 'total')
+
+    def __init__(self):
+        self._qty: Dict[int, int] = {}     # product_id -> количество
+        self._prices: Dict[int, int] = {}  # product_id -> цена за штуку
+        self.count = 0                     # всего единиц товара
+        self.total = 0                     # сумма, ₽
+
+    def add(self, product_id: int, price: int, qty: int = 1) -> int:
+        """Добавляет товар; возвращает новое количество этой позиции"""
+        if qty <= 0:
+            raise ValueError("Количество должно быть положительным")
+        current = self._qty.get(product_id, 0)
+        if current:
+            # Цена позиции фиксируется при первом добавлении
+            price = self._prices[product_id]
+        else:
+            self._prices[product_id] = price
+        self._qty[product_id] = current + qty
+        self.count += qty
+        self.total += price * qty
+        return current + qty
+
+    def remove(self, product_id: int, qty: int = 1) -> int:
+        """Убирает qty единиц товара; возвращает оставшееся количество"""
+        if qty <= 0:
+            raise ValueError("Количество должно быть положительным")
+        current = self._qty.get(product_id, 0)
+        if not current:
+            return 0
+        qty = min(qty, current)
+        price = self._prices[product_id]
+        left = current - qty
+        if left:
+            self._qty[product_id] = left
+        else:
+            del self._qty[product_id]
+            del self._prices[product_id]
+        self.count -= qty
+        self.total -= price * qty
+        return left
+
+    def clear(self) -> None:
+        self._qty.clear()
+        self._prices.clear()
+        self.count = 0
+        self.total = 0
+
+    def quantity(self, product_id: int) -> int:
+        return self._qty.get(product_id, 0)
+
+    def items(self) -> Iterator[Tuple[int, int, int]]:
+        """Позиции корзины: (product_id, количество, цена за штуку)"""
+        prices = self._prices
+        for product_id, qty in self._qty.items():
+            yield product_id, qty, prices[product_id]
+
+    @property
+    def distinct(self) -> int:
+        """Число разных товаров в корзине"""
+        return len(self._qty)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __bool__(self) -> bool:
+        return self.count > 0
+
+    def __repr__(self) -> str:
+        return f"Cart(count={self.count}, total={self.total}, items={self._qty!r})"
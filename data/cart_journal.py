@@ -0,0 +1,347 @@
+# data/cart_journal.py
+"""Журнал корзин: переживают перезапуск в однопроцессном режиме.
+
+Два файла:
+  <path>.log      — журнал только на дозапись: на каждое изменение корзины
+                    одна двоичная запись с её полным состоянием (CRC32,
+                    user_id, время, позиции). Пустая запись — корзина удалена.
+  <path>.snapshot — снапшот: заголовок, отсортированный индекс user_id и
+                    смещений, затем корзины. Файл отображается в память
+                    (mmap) и при запуске не разбирается: корзина читается
+                    из него только при первом обращении пользователя.
+
+Обработчик корзины лишь отмечает пользователя в множестве изменённых —
+записи кодируются и дописываются в журнал пачкой раз в flush_interval
+секунд. Когда журнал вырастает до compact_bytes (и при остановке), он
+сливается со старым снапшотом в новый в отдельном потоке, а журнал
+обнуляется. Восстановление — mmap снапшота и разбор короткого хвоста
+журнала, поэтому не зависит от общего числа корзин.
+
+При нескольких воркерах корзины хранятся в общей таблице (data/cart_sync.py).
+"""
+import asyncio
+import bisect
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from data.cart import Cart
+from data.cart_store import CartStore
+
+logger = logging.getLogger(__name__)
+
+CART_JOURNAL_PATH = os.getenv('CART_JOURNAL_PATH', 'carts')
+
+# Позиция: product_id, количество, цена за штуку
+_ITEM = struct.Struct('<iii')
+# Запись журнала: CRC32 остатка записи, затем user_id, время изменения, число позиций
+_CRC = struct.Struct('<I')
+_HEAD = struct.Struct('<qIH')
+_RECORD_SIZE = _CRC.size + _HEAD.size
+# Снапшот: сигнатура, версия формата, число корзин; за ним массивы user_id и смещений
+_SNAPSHOT_HEADER = struct.Struct('<4sIQ')
+_MAGIC = b'CART'
+_VERSION = 1
+# Корзина в снапшоте: время изменения, число позиций, затем позиции
+_ENTRY = struct.Struct('<IH')
+
+# Корзина в журнале: (время изменения, позиции) или None — удалена
+_Entry = Optional[Tuple[int, bytes]]
+
+
+def encode_cart(cart: Cart) -> bytes:
+    return b''.join(_ITEM.pack(*item) for item in cart.items())
+
+
+def decode_cart(payload: bytes) -> List[Tuple[int, int, int]]:
+    """Позиции в формате CartStore.replace: (product_id, price, qty)"""
+    return [(product_id, price, qty) for product_id, qty, price in _ITEM.iter_unpack(payload)]
+
+
+class _Snapshot:
+    """Снапшот, отображённый в память; поиск корзины — бинарный поиск по индексу"""
+
+    def __init__(self, path: str):
+        self.count = 0
+        self.user_ids = self.offsets = ()
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self._view: Optional[memoryview] = None
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return
+
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = _SNAPSHOT_HEADER.unpack_from(self._map)
+        index_end = _SNAPSHOT_HEADER.size + 16 * count
+        if magic != _MAGIC or version != _VERSION or len(self._map) < index_end:
+            self.close()
+            raise ValueError(f"{path}: неизвестный формат или файл обрезан")
+        # Индекс читается прямо из отображённого файла, без копирования
+        self._view = memoryview(self._map)
+        start = _SNAPSHOT_HEADER.size
+        self.user_ids = self._view[start:start + 8 * count].cast('q')
+        self.offsets = self._view[start + 8 * count:index_end].cast('Q')
+        self.count = count
+
+    def get(self, user_id: int) -> _Entry:
+        index = bisect.bisect_left(self.user_ids, user_id)
+        if index == self.count or self.user_ids[index] != user_id:
+            return None
+        return self._read(self.offsets[index])
+
+    def entries(self) -> Iterator[Tuple[int, int, bytes]]:
+        """Все корзины снапшота: (user_id, время изменения, позиции)"""
+        for user_id, offset in zip(self.user_ids, self.offsets):
+            yield (user_id,) + self._read(offset)
+
+    def _read(self, offset: int) -> Tuple[int, bytes]:
+        changed_at, size = _ENTRY.unpack_from(self._map, offset)
+        start = offset + _ENTRY.size
+        # Срез mmap — копия, ссылок на отображение не остаётся
+        return changed_at, self._map[start:start + size * _ITEM.size]
+
+    def close(self) -> None:
+        # Пока живы срезы memoryview, mmap закрыть нельзя
+        for view in (self.user_ids, self.offsets, self._view):
+            if isinstance(view, memoryview):
+                view.release()
+        self.user_ids = self.offsets = ()
+        self._view = None
+        self.count = 0
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _write_snapshot(path: str, snapshot: _Snapshot, changes: Dict[int, _Entry],
+                    deadline: int) -> int:
+    """Сливает снапшот с изменениями из журнала в новый файл; просроченные корзины выпадают"""
+    entries: Dict[int, Tuple[int, bytes]] = {}
+    for user_id, changed_at, payload in snapshot.entries():
+        if changed_at >= deadline:
+            entries[user_id] = (changed_at, payload)
+    for user_id, entry in changes.items():
+        if entry is None or entry[0] < deadline:
+            entries.pop(user_id, None)
+        else:
+            entries[user_id] = entry
+
+    user_ids = array('q', sorted(entries))
+    offsets = array('Q')
+    body = bytearray()
+    offset = _SNAPSHOT_HEADER.size + 16 * len(user_ids)
+    for user_id in user_ids:
+        changed_at, payload = entries[user_id]
+        offsets.append(offset + len(body))
+        body += _ENTRY.pack(changed_at, len(payload) // _ITEM.size)
+        body += payload
+
+    with open(path, 'wb') as f:
+        f.write(_SNAPSHOT_HEADER.pack(_MAGIC, _VERSION, len(user_ids)))
+        f.write(user_ids.tobytes())
+        f.write(offsets.tobytes())
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    return len(user_ids)
+
+
+class CartJournal:
+    """Журнал изменений корзин со снапшотом для быстрого восстановления"""
+
+    def __init__(self, store: CartStore, path: str = CART_JOURNAL_PATH,
+                 flush_interval: float = 0.5, compact_bytes: int = 1 << 20):
+        self.store = store
+        self.log_path = path + '.log'
+        self.snapshot_path = path + '.snapshot'
+        self.flush_interval = flush_interval
+        self.compact_bytes = compact_bytes
+
+        self._snapshot: Optional[_Snapshot] = None
+        # Изменения после снапшота: журнал в памяти, последнее состояние на пользователя
+        self._changes: Dict[int, _Entry] = {}
+        # Изменённые корзины до записи; ссылка на объект — корзина, вытесненная
+        # из памяти до записи, всё равно попадёт в журнал (None — удалена)
+        self._dirty: Dict[int, Optional[Cart]] = {}
+        self._log = None
+        self._subscribed = False
+        self._stopping: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+
+        # Статистика
+        self.log_bytes = 0
+        self.compactions = 0
+
+    def _on_change(self, user_id: int, cart: Optional[Cart]) -> None:
+        # Только отметка — в обработчике корзины никакой записи на диск
+        self._dirty[user_id] = cart
+
+    def lookup(self, user_id: int) -> Optional[List[Tuple[int, int, int]]]:
+        """Загрузчик для CartStore: корзина из журнала или снапшота"""
+        if user_id in self._dirty:
+            # Изменение ещё не записано, но оно свежее журнала: иначе удалённая
+            # корзина вернулась бы из журнала до ближайшей записи
+            cart = self._dirty[user_id]
+            if not cart:
+                return None
+            return [(product_id, price, qty) for product_id, qty, price in cart.items()]
+        if user_id in self._changes:
+            entry = self._changes[user_id]
+        elif self._snapshot is not None:
+            entry = self._snapshot.get(user_id)
+        else:
+            return None
+        if entry is None:
+            return None
+        changed_at, payload = entry
+        if changed_at < time.time() - self.store.ttl:
+            return None
+        return decode_cart(payload)
+
+    # === ЗАПИСЬ ===
+    def flush(self) -> None:
+        """Дописывает изменённые корзины в журнал одной записью на диск"""
+        if not self._dirty or self._log is None:
+            return
+        batch, self._dirty = self._dirty, {}
+        now = int(time.time())
+        records = []
+        changes = {}
+        for user_id, cart in batch.items():
+            payload = encode_cart(cart) if cart else b''
+            head = _HEAD.pack(user_id, now, len(payload) // _ITEM.size)
+            records.append(_CRC.pack(zlib.crc32(head + payload)) + head + payload)
+            changes[user_id] = (now, payload) if cart else None
+        data = b''.join(records)
+        try:
+            self._log.write(data)
+            self._log.flush()
+        except OSError as e:
+            logger.error(f"❌ Не удалось записать журнал корзин ({len(batch)} шт.): {e}")
+            # Повторим в следующий раз; более свежие изменения важнее
+            batch.update(self._dirty)
+            self._dirty = batch
+            return
+        self._changes.update(changes)
+        self.log_bytes += len(data)
+
+    async def compact(self) -> None:
+        """Сливает журнал со снапшотом и обнуляет журнал"""
+        if not self._changes:
+            return
+        started = time.perf_counter()
+        tmp_path = self.snapshot_path + '.tmp'
+        deadline = int(time.time() - self.store.ttl)
+        loop = asyncio.get_running_loop()
+        try:
+            count = await loop.run_in_executor(
+                None, _write_snapshot, tmp_path, self._snapshot, dict(self._changes), deadline
+            )
+            # Снапшот закрывается до замены файла — иначе на Windows os.replace не пройдёт
+            self._snapshot.close()
+            os.replace(tmp_path, self.snapshot_path)
+            self._snapshot = _Snapshot(self.snapshot_path)
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ Не удалось записать снапшот корзин: {e}", exc_info=True)
+            if self._snapshot.count == 0 and os.path.exists(self.snapshot_path):
+                self._snapshot = self._open_snapshot()
+            return
+        # Сбой между заменой снапшота и обнулением журнала не страшен:
+        # записи журнала — полные состояния, повторное применение ничего не меняет
+        self._log.truncate(0)
+        self._changes.clear()
+        self.log_bytes = 0
+        self.compactions += 1
+        logger.info(f"🗜 Снапшот корзин записан: {count} шт. за {time.perf_counter() - started:.2f} с")
+
+    # === ВОССТАНОВЛЕНИЕ ===
+    def _open_snapshot(self) -> _Snapshot:
+        try:
+            return _Snapshot(self.snapshot_path)
+        except ValueError as e:
+            broken = self.snapshot_path + '.broken'
+            os.replace(self.snapshot_path, broken)
+            logger.error(f"❌ Снапшот корзин повреждён ({e}), отложен в {broken}")
+            return _Snapshot(self.snapshot_path)
+
+    def _replay(self) -> int:
+        """Применяет хвост журнала; обрезанную при сбое последнюю запись отбрасывает"""
+        if not os.path.exists(self.log_path):
+            return 0
+        with open(self.log_path, 'rb') as f:
+            data = f.read()
+        offset = 0
+        replayed = 0
+        while offset + _RECORD_SIZE <= len(data):
+            (crc,) = _CRC.unpack_from(data, offset)
+            user_id, changed_at, size = _HEAD.unpack_from(data, offset + _CRC.size)
+            end = offset + _RECORD_SIZE + size * _ITEM.size
+            if end > len(data) or zlib.crc32(data[offset + _CRC.size:end]) != crc:
+                break
+            self._changes[user_id] = (changed_at, data[offset + _RECORD_SIZE:end]) if size else None
+            offset = end
+            replayed += 1
+        if offset < len(data):
+            logger.warning(f"⚠️ Журнал корзин: отброшен неполный хвост {len(data) - offset} байт")
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(offset)
+        self.log_bytes = offset
+        return replayed
+
+    # === ЗАПУСК И ОСТАНОВКА ===
+    async def start(self) -> None:
+        started = time.perf_counter()
+        self._snapshot = self._open_snapshot()
+        replayed = self._replay()
+        self._log = open(self.log_path, 'ab')
+        # Корзины не загружаются заранее: CartStore спросит журнал при первом обращении
+        self.store.set_loader(self.lookup)
+        if not self._subscribed:
+            self.store.subscribe(self._on_change)
+            self._subscribed = True
+        logger.info(
+            f"🛒 Корзины восстановлены за {(time.perf_counter() - started) * 1000:.1f} мс: "
+            f"в снапшоте {self._snapshot.count}, записей журнала {replayed}"
+        )
+        self._stopping = asyncio.Event()
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Дописывает журнал и сворачивает его в снапшот — следующий запуск без хвоста"""
+        if self._log is None:
+            return
+        if self._flusher is not None:
+            # Не отменяем задачу: она могла начать запись снапшота
+            self._stopping.set()
+            await self._flusher
+            self._flusher = None
+        self.flush()
+        os.fsync(self._log.fileno())
+        await self.compact()
+        self.store.set_loader(None)
+        self._log.close()
+        self._log = None
+        self._snapshot.close()
+
+    async def _flush_loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush()
+            if self.log_bytes >= self.compact_bytes:
+                await self.compact()
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty)
@@ -0,0 +1,246 @@
+# data/cart_store.py
+"""Хранилище корзин с ограничением по времени простоя (TTL) и по размеру (LRU).
+
+Порядок записей в OrderedDict совпадает с порядком последнего обращения,
+поэтому и вытеснение по LRU, и очистка по TTL идут с головы словаря
+и не просматривают «живые» корзины.
+
+Вытеснение по LRU только освобождает память: слушатели о нём не узнают,
+и сохранённая копия корзины (журнал, таблица carts) остаётся. Удалением
+считаются discard (очистка, заказ) и истечение TTL.
+"""
+import asyncio
+import logging
+import sys
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from data.cart import Cart
+
+logger = logging.getLogger(__name__)
+
+# Грубая оценка накладных расходов на запись в хранилище (ключ, время, узел OrderedDict)
+_ENTRY_OVERHEAD = 200
+
+# Слушатель изменений: (user_id, корзина или None, если корзина удалена)
+Listener = Callable[[int, Optional[Cart]], None]
+
+# Загрузчик корзины, которой нет в памяти: позиции (product_id, price, qty) или None
+Loader = Callable[[int], Optional[Iterable[Tuple[int, int, int]]]]
+
+
+def _cart_size(cart: Cart) -> int:
+    """Приблизительный размер корзины в байтах"""
+    return (sys.getsizeof(cart) + sys.getsizeof(cart._qty) + sys.getsizeof(cart._prices)
+            + _ENTRY_OVERHEAD)
+
+
+class CartStore:
+    """Корзины пользователей: user_id -> Cart"""
+
+    def __init__(self, ttl: float = 24 * 3600, max_entries: int = 50_000,
+                 sweep_interval: float = 300, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+
+        self._carts: "OrderedDict[int, Cart]" = OrderedDict()
+        self._touched: Dict[int, float] = {}
+        self._sizes: Dict[int, int] = {}
+        self._bytes = 0
+
+        self._listeners: List[Listener] = []
+        self._loader: Optional[Loader] = None
+
+        # Счётчики для статистики
+        self.evicted_ttl = 0
+        self.evicted_lru = 0
+
+        self._sweeper: Optional[asyncio.Task] = None
+
+    # === ЧТЕНИЕ ===
+    def get(self, user_id: int) -> Optional[Cart]:
+        """Корзина пользователя или None; обращение продлевает жизнь корзины"""
+        cart = self._carts.get(user_id)
+        if cart is None:
+            return self._load(user_id)
+        self._touch(user_id)
+        return cart
+
+    def peek(self, user_id: int) -> Optional[Cart]:
+        """Корзина без продления жизни (для фоновой записи и статистики)"""
+        return self._carts.get(user_id)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._carts
+
+    def __len__(self) -> int:
+        return len(self._carts)
+
+    def __iter__(self) -> Iterator[Tuple[int, Cart]]:
+        return iter(list(self._carts.items()))
+
+    # === ИЗМЕНЕНИЕ ===
+    def get_or_create(self, user_id: int) -> Cart:
+        cart = self.get(user_id)
+        if cart is None:
+            cart = self._carts[user_id] = Cart()
+            self._touched[user_id] = self._clock()
+            self._account(user_id, cart)
+            self._evict_overflow()
+        return cart
+
+    def add_item(self, user_id: int, product_id: int, price: int, qty: int = 1) -> Cart:
+        """Добавляет товар в корзину пользователя (создаёт корзину при необходимости)"""
+        cart = self.get_or_create(user_id)
+        cart.add(product_id, price, qty)
+        self._account(user_id, cart)
+        self._changed(user_id, cart)
+        return cart
+
+    def replace(self, user_id: int, items: Iterable[Tuple[int, int, int]]) -> Optional[Cart]:
+        """Заменяет корзину целиком позициями (product_id, price, qty) за одну операцию"""
+        cart = Cart()
+        for product_id, price, qty in items:
+            cart.add(product_id, price, qty)
+        if not cart:
+            self.discard(user_id)
+            return None
+        self._carts[user_id] = cart
+        self._touch(user_id)
+        self._account(user_id, cart)
+        self._changed(user_id, cart)
+        self._evict_overflow()
+        return cart
+
+    def remove_item(self, user_id: int, product_id: int, qty: int = 1) -> Optional[Cart]:
+        cart = self.get(user_id)
+        if cart is None:
+            return None
+        cart.remove(product_id, qty)
+        if not cart:
+            self.discard(user_id)
+            return None
+        self._account(user_id, cart)
+        self._changed(user_id, cart)
+        return cart
+
+    def discard(self, user_id: int) -> Optional[Cart]:
+        """Удаляет корзину целиком (очистка, оформленный заказ)"""
+        if user_id not in self._carts:
+            # Корзина могла остаться не загруженной — удаление должно дойти до слушателей
+            self._load(user_id)
+        cart = self._drop(user_id)
+        if cart is not None:
+            self._changed(user_id, None)
+        return cart
+
+    def _drop(self, user_id: int) -> Optional[Cart]:
+        """Убирает корзину из памяти, не сообщая слушателям"""
+        cart = self._carts.pop(user_id, None)
+        if cart is not None:
+            self._touched.pop(user_id, None)
+            self._bytes -= self._sizes.pop(user_id, 0)
+        return cart
+
+    # === СЛУШАТЕЛИ ===
+    def subscribe(self, listener: Listener) -> None:
+        """Слушатель вызывается синхронно при каждом изменении корзины"""
+        self._listeners.append(listener)
+
+    def _changed(self, user_id: int, cart: Optional[Cart]) -> None:
+        for listener in self._listeners:
+            listener(user_id, cart)
+
+    # === ЛЕНИВАЯ ЗАГРУЗКА ===
+    def set_loader(self, loader: Optional[Loader]) -> None:
+        """Источник корзин, которых нет в памяти (например, снапшот на диске).
+
+        Корзина поднимается при первом обращении к ней, слушатели при этом
+        не вызываются — она не изменилась.
+        """
+        self._loader = loader
+
+    def _load(self, user_id: int) -> Optional[Cart]:
+        if self._loader is None:
+            return None
+        items = self._loader(user_id)
+        if not items:
+            return None
+        cart = Cart()
+        for product_id, price, qty in items:
+            cart.add(product_id, price, qty)
+        if not cart:
+            return None
+        self._carts[user_id] = cart
+        self._touched[user_id] = self._clock()
+        self._account(user_id, cart)
+        self._evict_overflow()
+        return cart
+
+    # === ВЫТЕСНЕНИЕ ===
+    def sweep(self) -> int:
+        """Удаляет корзины, к которым не обращались дольше ttl секунд"""
+        deadline = self._clock() - self.ttl
+        removed = 0
+        while self._carts:
+            user_id = next(iter(self._carts))
+            if self._touched[user_id] > deadline:
+                break
+            self.discard(user_id)
+            removed += 1
+        self.evicted_ttl += removed
+        return removed
+
+    def _evict_overflow(self) -> None:
+        while len(self._carts) > self.max_entries:
+            # Только из памяти: корзина вернётся через загрузчик при следующем обращении
+            self._drop(next(iter(self._carts)))
+            self.evicted_lru += 1
+
+    def _touch(self, user_id: int) -> None:
+        self._carts.move_to_end(user_id)
+        self._touched[user_id] = self._clock()
+
+    def _account(self, user_id: int, cart: Cart) -> None:
+        size = _cart_size(cart)
+        self._bytes += size - self._sizes.get(user_id, 0)
+        self._sizes[user_id] = size
+
+    # === ФОНОВАЯ ОЧИСТКА ===
+    async def start(self) -> None:
+        """Запускает периодическую очистку в текущем event loop"""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            removed = self.sweep()
+            if removed:
+                logger.info(f"🧹 Удалено неактивных корзин: {removed}, осталось: {len(self)}")
+
+    # === СТАТИСТИКА ===
+    @property
+    def approx_bytes(self) -> int:
+        """Приблизительный объём памяти, занятый корзинами"""
+        return self._bytes
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self._carts),
+            'approx_bytes': self._bytes,
+            'evicted_ttl': self.evicted_ttl,
+            'evicted_lru': self.evicted_lru,
+        }
@@ -0,0 +1,142 @@
+# data/cart_sync.py
+"""Корзины в общей таблице carts — для режима нескольких процессов.
+
+Воркер держит в памяти корзины только своих пользователей (апдейты
+пользователя всегда приходят в один и тот же процесс), а изменения
+пачкой раз в flush_interval секунд записывает в SQLite. После
+перезапуска или смены числа воркеров каждый процесс поднимает из
+таблицы корзины своего шарда.
+
+Корзина, вытесненная из памяти по LRU, возвращается загрузчиком (lookup):
+сначала из ещё не записанных изменений, затем из строки таблицы.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from data.cart import Cart
+from data.cart_store import CartStore
+from data.database import Database
+
+logger = logging.getLogger(__name__)
+
+
+def encode_items(cart: Cart) -> str:
+    """Позиции корзины строкой "product_id:qty:price,..." """
+    return ','.join(f"{product_id}:{qty}:{price}" for product_id, qty, price in cart.items())
+
+
+def decode_items(text: str) -> Iterator[Tuple[int, int, int]]:
+    """Обратно в (product_id, price, qty) — формат CartStore.replace"""
+    for item in text.split(','):
+        product_id, qty, price = item.split(':')
+        yield int(product_id), int(price), int(qty)
+
+
+class CartSync:
+    """Отложенная пакетная запись корзин одного шарда в таблицу carts"""
+
+    def __init__(self, store: CartStore, database: Database, flush_interval: float = 1.0):
+        self.store = store
+        self.database = database
+        self.flush_interval = flush_interval
+
+        # Изменённые корзины до записи (None — удалена); ссылка на объект нужна,
+        # чтобы корзина, вытесненная из памяти до записи, не записалась как удалённая
+        self._dirty: Dict[int, Optional[Cart]] = {}
+        # Пачка, которая сейчас пишется: в таблице её ещё нет
+        self._writing: Dict[int, Optional[Cart]] = {}
+        self._subscribed = False
+        self._stopping: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+
+    def _on_change(self, user_id: int, cart: Optional[Cart]) -> None:
+        # Только отметка: сама корзина кодируется при записи, несколько
+        # изменений одного пользователя между записями схлопываются в одно
+        self._dirty[user_id] = cart
+
+    def lookup(self, user_id: int) -> Optional[List[Tuple[int, int, int]]]:
+        """Загрузчик для CartStore: несохранённое изменение или строка таблицы"""
+        for pending in (self._dirty, self._writing):
+            if user_id in pending:
+                cart = pending[user_id]
+                if not cart:
+                    return None
+                return [(product_id, price, qty) for product_id, qty, price in cart.items()]
+        try:
+            row = self.database.fetch_cart_sync(user_id)
+        except Exception as e:
+            logger.error(f"❌ Не удалось прочитать корзину {user_id}: {e}")
+            return None
+        if row is None:
+            return None
+        items, updated_at = row
+        if updated_at < time.time() - self.store.ttl:
+            return None
+        return list(decode_items(items))
+
+    async def load(self, shard_index: int = 0, shard_count: int = 1) -> int:
+        """Поднимает из таблицы корзины пользователей своего шарда"""
+        rows = await self.database.fetch_carts(shard_index, shard_count)
+        for user_id, items in rows:
+            self.store.replace(user_id, decode_items(items))
+        # Загруженное уже в таблице — повторно писать нечего
+        for user_id, _ in rows:
+            self._dirty.pop(user_id, None)
+        return len(rows)
+
+    async def flush(self) -> None:
+        if not self._dirty:
+            return
+        batch, self._dirty = self._dirty, {}
+        self._writing = batch
+        upserts = []
+        deletes = []
+        for user_id, cart in batch.items():
+            if cart:
+                upserts.append((user_id, encode_items(cart)))
+            else:
+                deletes.append(user_id)
+        try:
+            await self.database.save_carts(upserts, deletes)
+        except Exception as e:
+            logger.error(f"❌ Не удалось сохранить корзины ({len(batch)} шт.): {e}")
+            # Повторим в следующий раз; более свежие изменения важнее
+            batch.update(self._dirty)
+            self._dirty = batch
+        finally:
+            self._writing = {}
+
+    # === ЗАПУСК И ОСТАНОВКА ===
+    async def start(self, shard_index: int = 0, shard_count: int = 1) -> None:
+        if not self._subscribed:
+            self.store.subscribe(self._on_change)
+            self._subscribed = True
+        self.store.set_loader(self.lookup)
+        loaded = await self.load(shard_index, shard_count)
+        logger.info(f"🛒 Корзины шарда {shard_index}/{shard_count} загружены: {loaded}")
+        if self._flusher is None:
+            self._stopping = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._flusher is not None:
+            # Не отменяем задачу: пачка, которую она пишет, уже убрана из _dirty
+            self._stopping.set()
+            await self._flusher
+            self._flusher = None
+        await self.flush()
+        self.store.set_loader(None)
+
+    async def _flush_loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty)
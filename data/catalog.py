@@ -0,0 +1,147 @@
+# data/catalog.py
+"""Каталог товаров с индексами и неизменяемыми снимками.
+
+Читатели берут `catalog.snapshot` и работают с ним без блокировок:
+снимок никогда не меняется, а запись (админка) собирает новый снимок
+и атомарно подменяет ссылку на него.
+
+Версия снимка — версия каталога из БД (таблица catalog_version), если
+её передали: она переживает перезапуск и одинакова во всех воркерах,
+поэтому по ней можно судить о кнопках в старых сообщениях.
+"""
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Iterable, Iterator, Mapping, Optional, Tuple
+
+
+@dataclass(frozen=True, slots=True)
+class Product:
+    """Товар каталога (неизменяемый)"""
+    id: int
+    name: str
+    price: int
+    description: str = ""
+
+
+class CatalogSnapshot:
+    """Неизменяемая версия каталога со вторичными индексами"""
+
+    __slots__ = ('version', 'by_id', 'items', '_prices', '_by_price', '_names', '_by_name')
+
+    def __init__(self, version: int, items: Tuple[Product, ...]):
+        self.version = version
+        # Товары в порядке ID — так их показывает каталог
+        self.items = items
+        self.by_id: Mapping[int, Product] = MappingProxyType({p.id: p for p in items})
+
+        # Индекс по цене: отсортированные цены + параллельный кортеж товаров
+        by_price = sorted(items, key=lambda p: (p.price, p.id))
+        self._prices = tuple(p.price for p in by_price)
+        self._by_price = tuple(by_price)
+
+        # Индекс по префиксу названия (без учёта регистра)
+        by_name = sorted(items, key=lambda p: (p.name.casefold(), p.id))
+        self._names = tuple(p.name.casefold() for p in by_name)
+        self._by_name = tuple(by_name)
+
+    def get(self, product_id: int) -> Optional[Product]:
+        """Товар по ID за O(1)"""
+        return self.by_id.get(product_id)
+
+    def price_range(self, low: int, high: int) -> Tuple[Product, ...]:
+        """Товары с ценой в диапазоне [low, high]"""
+        start = bisect_left(self._prices, low)
+        end = bisect_right(self._prices, high)
+        return self._by_price[start:end]
+
+    def name_prefix(self, prefix: str) -> Tuple[Product, ...]:
+        """Товары, название которых начинается с prefix"""
+        prefix = prefix.casefold()
+        start = bisect_left(self._names, prefix)
+        end = bisect_left(self._names, prefix + '\U0010ffff')
+        return self._by_name[start:end]
+
+    def page_count(self, page_size: int) -> int:
+        return max(1, -(-len(self.items) // page_size))
+
+    def page(self, number: int, page_size: int) -> Tuple[Product, ...]:
+        """Страница каталога за O(page_size): срез кортежа, без обхода каталога"""
+        start = number * page_size
+        return self.items[start:start + page_size]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self) -> Iterator[Product]:
+        return iter(self.items)
+
+    def __contains__(self, product_id: object) -> bool:
+        return product_id in self.by_id
+
+
+class Catalog:
+    """Каталог: текущий снимок + монотонный генератор ID"""
+
+    def __init__(self, products: Iterable[Product] = ()):
+        self._snapshot = CatalogSnapshot(0, ())
+        self._next_id = 1
+        self.load(products)
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        """Текущая версия каталога; держать её можно сколько угодно"""
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def get(self, product_id: int) -> Optional[Product]:
+        return self._snapshot.get(product_id)
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    def __iter__(self) -> Iterator[Product]:
+        return iter(self._snapshot)
+
+    def allocate_id(self) -> int:
+        """Выдаёт новый ID; ID никогда не переиспользуются"""
+        product_id = self._next_id
+        self._next_id += 1
+        return product_id
+
+    def load(self, products: Iterable[Product], version: Optional[int] = None) -> CatalogSnapshot:
+        """Полностью заменяет содержимое каталога"""
+        items = tuple(sorted(products, key=lambda p: p.id))
+        if items:
+            self._next_id = max(self._next_id, items[-1].id + 1)
+        return self._publish(items, version)
+
+    def add(self, name: str, description: str, price: int) -> Product:
+        """Создаёт товар с новым ID и публикует новую версию каталога"""
+        product = Product(id=self.allocate_id(), name=name, price=price, description=description)
+        self.put(product)
+        return product
+
+    def put(self, product: Product, version: Optional[int] = None) -> CatalogSnapshot:
+        """Добавляет или заменяет товар (по ID)"""
+        current = self._snapshot
+        if product.id in current.by_id:
+            items = tuple(product if p.id == product.id else p for p in current.items)
+        else:
+            # ID монотонны, поэтому новый товар почти всегда в конце
+            items = current.items + (product,)
+            if current.items and current.items[-1].id > product.id:
+                items = tuple(sorted(items, key=lambda p: p.id))
+        self._next_id = max(self._next_id, product.id + 1)
+        return self._publish(items, version)
+
+    def _publish(self, items: Tuple[Product, ...], version: Optional[int] = None) -> CatalogSnapshot:
+        # Без версии из БД (тесты, нагрузочный прогон) — просто следующая
+        if version is None:
+            version = self._snapshot.version + 1
+        # Присваивание ссылки атомарно: читатели видят либо старый, либо новый снимок
+        self._snapshot = CatalogSnapshot(version, items)
+        return self._snapshot
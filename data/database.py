@@ -1,52 +1,513 @@
+import asyncio
+import logging
+import os
+import queue
 import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, NamedTuple, Optional, Sequence, Tuple
 
+from data.catalog import Product
 
-def init_db():
-    conn = sqlite3.connect('shop.db')
-    cursor = conn.cursor()
+logger = logging.getLogger(__name__)
 
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY,
-            name TEXT NOT NULL,
-            price INTEGER NOT NULL,
-            description TEXT
+DB_PATH = os.getenv('DB_PATH', 'shop.db')
+
+# === СХЕМА ===
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        price INTEGER NOT NULL,
+        description TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        phone TEXT NOT NULL DEFAULT '',
+        address TEXT NOT NULL DEFAULT '',
+        total INTEGER NOT NULL,
+        status TEXT DEFAULT 'new',
+        created_at INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS order_items (
+        order_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        qty INTEGER NOT NULL,
+        price INTEGER NOT NULL,
+        PRIMARY KEY (order_id, product_id)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY,
+        first_seen INTEGER NOT NULL,
+        blocked INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS broadcasts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        text TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'running',
+        last_user_id INTEGER NOT NULL DEFAULT 0,
+        sent INTEGER NOT NULL DEFAULT 0,
+        failed INTEGER NOT NULL DEFAULT 0,
+        report_chat_id INTEGER,
+        report_message_id INTEGER,
+        created_at INTEGER NOT NULL
+    )
+    ''',
+    # Фото товаров: файл для миниатюр и file_id — повторная отправка без загрузки
+    '''
+    CREATE TABLE IF NOT EXISTS product_media (
+        product_id INTEGER PRIMARY KEY,
+        filename TEXT NOT NULL,
+        file_id TEXT
+    )
+    ''',
+    # Версия каталога: растёт при каждом изменении товаров, по ней другие
+    # процессы (WORKERS > 1) узнают, что каталог пора перечитать
+    '''
+    CREATE TABLE IF NOT EXISTS catalog_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    ''',
+    # Ключи заказов, восстановленных из spool-файла: файл удаляется после
+    # транзакции, и повторное восстановление (сбой между ними) их пропускает
+    '''
+    CREATE TABLE IF NOT EXISTS recovered_orders (
+        spool_key TEXT PRIMARY KEY,
+        order_id INTEGER NOT NULL
+    )
+    ''',
+    # shop.db, созданная до таблицы версий: версия 0 значит «кнопка без версии»
+    'INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 1)',
+    # Корзины — общее хранилище для нескольких процессов: "id:qty:price,..."
+    '''
+    CREATE TABLE IF NOT EXISTS carts (
+        user_id INTEGER PRIMARY KEY,
+        items TEXT NOT NULL,
+        updated_at INTEGER NOT NULL
+    )
+    ''',
+    # История заказов: WHERE user_id = ? AND id < ? ORDER BY id DESC — чтение по индексу
+    # без сортировки; индекс только по user_id им полностью покрывается
+    'CREATE INDEX IF NOT EXISTS idx_orders_user_id_desc ON orders (user_id, id DESC)',
+    'DROP INDEX IF EXISTS idx_orders_user_id',
+    'CREATE INDEX IF NOT EXISTS idx_products_price ON products (price)',
+)
+
+# Колонки, добавленные после первой версии схемы (для уже существующих shop.db)
+MIGRATIONS = (
+    ('orders', 'created_at', 'ALTER TABLE orders ADD COLUMN created_at INTEGER NOT NULL DEFAULT 0'),
+)
+
+TEST_PRODUCTS = (
+    Product(id=1, name='📱 iPhone 15', price=79900, description='Новый iPhone 15'),
+    Product(id=2, name='💻 MacBook Air', price=119900, description='Ноутбук Apple'),
+    Product(id=3, name='🎧 AirPods Pro', price=24900, description='Беспроводные наушники'),
+)
+
+# === ЗАПРОСЫ ===
+# SQL держим в константах: sqlite3 кэширует подготовленные выражения по тексту
+# запроса, поэтому одинаковые строки переиспользуют уже скомпилированный план.
+SQL_SELECT_PRODUCTS = 'SELECT id, name, price, description FROM products ORDER BY id'
+SQL_UPSERT_PRODUCT = (
+    'INSERT INTO products (id, name, price, description) VALUES (?, ?, ?, ?) '
+    'ON CONFLICT(id) DO UPDATE SET name = excluded.name, price = excluded.price, '
+    'description = excluded.description'
+)
+SQL_INSERT_PRODUCT = 'INSERT INTO products (name, price, description) VALUES (?, ?, ?)'
+SQL_BUMP_CATALOG_VERSION = (
+    'INSERT INTO catalog_version (id, version) VALUES (1, 1) '
+    'ON CONFLICT(id) DO UPDATE SET version = version + 1'
+)
+SQL_SELECT_CATALOG_VERSION = 'SELECT version FROM catalog_version WHERE id = 1'
+SQL_INSERT_ORDER_ITEM = (
+    'INSERT INTO order_items (order_id, product_id, name, qty, price) VALUES (?, ?, ?, ?, ?)'
+)
+# Страницы истории — по ключу (id < / id > курсора), без OFFSET: стоимость
+# страницы не зависит от того, сколько заказов у пользователя
+_SQL_USER_ORDERS = (
+    'SELECT o.id, o.total, o.status, o.created_at, '
+    '(SELECT COALESCE(SUM(qty), 0) FROM order_items WHERE order_id = o.id) '
+    'FROM orders o WHERE o.user_id = ? '
+)
+SQL_SELECT_USER_ORDERS_BEFORE = _SQL_USER_ORDERS + 'AND o.id < ? ORDER BY o.id DESC LIMIT ?'
+SQL_SELECT_USER_ORDERS_AFTER = _SQL_USER_ORDERS + 'AND o.id > ? ORDER BY o.id ASC LIMIT ?'
+SQL_SELECT_ORDER_ITEMS = (
+    'SELECT product_id, name, qty, price FROM order_items WHERE order_id = ?'
+)
+SQL_SELECT_USER_ORDER_ITEMS = (
+    'SELECT i.product_id, i.name, i.qty, i.price FROM order_items i '
+    'JOIN orders o ON o.id = i.order_id WHERE i.order_id = ? AND o.user_id = ?'
+)
+
+SQL_INSERT_USER = 'INSERT OR IGNORE INTO users (id, first_seen) VALUES (?, ?)'
+SQL_SELECT_RECIPIENTS = 'SELECT id FROM users WHERE id > ? AND blocked = 0 ORDER BY id LIMIT ?'
+SQL_COUNT_RECIPIENTS = 'SELECT COUNT(*) FROM users WHERE id > ? AND blocked = 0'
+SQL_MARK_BLOCKED = 'UPDATE users SET blocked = 1 WHERE id = ?'
+SQL_INSERT_BROADCAST = (
+    'INSERT INTO broadcasts (text, report_chat_id, report_message_id, created_at) VALUES (?, ?, ?, ?)'
+)
+SQL_UPDATE_BROADCAST = (
+    'UPDATE broadcasts SET status = ?, last_user_id = ?, sent = ?, failed = ? WHERE id = ?'
+)
+SQL_SELECT_RUNNING_BROADCASTS = (
+    'SELECT id, text, last_user_id, sent, failed, report_chat_id, report_message_id '
+    "FROM broadcasts WHERE status = 'running' ORDER BY id"
+)
+
+SQL_SELECT_MEDIA = 'SELECT product_id, filename, file_id FROM product_media'
+SQL_UPSERT_MEDIA = (
+    'INSERT INTO product_media (product_id, filename, file_id) VALUES (?, ?, ?) '
+    'ON CONFLICT(product_id) DO UPDATE SET filename = excluded.filename, file_id = excluded.file_id'
+)
+
+SQL_SELECT_SHARD_CARTS = 'SELECT user_id, items FROM carts WHERE user_id % ? = ?'
+SQL_SELECT_CART = 'SELECT items, updated_at FROM carts WHERE user_id = ?'
+SQL_UPSERT_CART = (
+    'INSERT INTO carts (user_id, items, updated_at) VALUES (?, ?, ?) '
+    'ON CONFLICT(user_id) DO UPDATE SET items = excluded.items, updated_at = excluded.updated_at'
+)
+SQL_DELETE_CART = 'DELETE FROM carts WHERE user_id = ?'
+
+SQL_SELECT_RECOVERED_ORDER = 'SELECT 1 FROM recovered_orders WHERE spool_key = ?'
+SQL_INSERT_RECOVERED_ORDER = 'INSERT INTO recovered_orders (spool_key, order_id) VALUES (?, ?)'
+
+SQL_NEXT_ORDER_ID = (
+    "SELECT MAX(COALESCE((SELECT MAX(id) FROM orders), 0), "
+    "COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'orders'), 0)) + 1"
+)
+
+# Позиция заказа: (product_id, name, qty, price)
+OrderItem = Tuple[int, str, int, int]
+
+# Больше любого номера заказа: курсор первой страницы истории
+MAX_ORDER_ID = 2 ** 63 - 1
+
+
+class NewOrder(NamedTuple):
+    """Заказ, ещё не записанный в БД"""
+    user_id: int
+    items: Tuple[OrderItem, ...]
+    total: int
+    created_at: int
+    phone: str = ''
+    address: str = ''
+    # Уникальный ключ заказа из spool-файла: повторное восстановление его не продублирует
+    spool_key: str = ''
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, cached_statements=256)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA foreign_keys=ON')
+    return conn
+
+
+def _create_schema(conn: sqlite3.Connection) -> None:
+    for statement in SCHEMA:
+        conn.execute(statement)
+    for table, column, statement in MIGRATIONS:
+        columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        if column not in columns:
+            conn.execute(statement)
+    conn.commit()
+
+
+def _insert_orders(conn: sqlite3.Connection, orders: Sequence[NewOrder]) -> List[int]:
+    """Записывает заказы одной транзакцией с одним fsync на всю пачку.
+
+    Номера выдаются подряд под блокировкой записи (BEGIN IMMEDIATE), поэтому
+    они монотонны и не пересекаются даже при нескольких процессах. Заказы
+    со spool_key, который уже записан, пропускаются — их номеров в ответе нет.
+    """
+    conn.execute('PRAGMA synchronous=FULL')
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            orders = [o for o in orders if not o.spool_key or conn.execute(
+                SQL_SELECT_RECOVERED_ORDER, (o.spool_key,)).fetchone() is None]
+            if not orders:
+                conn.commit()
+                return []
+            first_id = conn.execute(SQL_NEXT_ORDER_ID).fetchone()[0]
+            ids = list(range(first_id, first_id + len(orders)))
+            conn.executemany(
+                'INSERT INTO orders (id, user_id, phone, address, total, status, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(order_id, o.user_id, o.phone, o.address, o.total, 'new', o.created_at)
+                 for order_id, o in zip(ids, orders)]
+            )
+            conn.executemany(
+                SQL_INSERT_ORDER_ITEM,
+                [(order_id, product_id, name, qty, price)
+                 for order_id, o in zip(ids, orders)
+                 for product_id, name, qty, price in o.items]
+            )
+            conn.executemany(
+                SQL_INSERT_RECOVERED_ORDER,
+                [(o.spool_key, order_id) for order_id, o in zip(ids, orders) if o.spool_key]
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    finally:
+        conn.execute('PRAGMA synchronous=NORMAL')
+    return ids
+
+
+class Database:
+    """Асинхронный доступ к shop.db через пул соединений в отдельных потоках.
+
+    Каждый запрос выполняется в потоке ThreadPoolExecutor и берёт соединение
+    из пула, поэтому event loop не ждёт диск.
+    """
+
+    def __init__(self, path: str = DB_PATH, pool_size: int = 4):
+        self.path = path
+        self.pool_size = pool_size
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='db')
+        self._pool: "queue.SimpleQueue[sqlite3.Connection]" = queue.SimpleQueue()
+
+    # === ПУЛ СОЕДИНЕНИЙ ===
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            # Соединений не больше, чем потоков в executor
+            return _connect(self.path)
+
+    def _call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        conn = self._acquire()
+        try:
+            return fn(conn, *args)
+        finally:
+            self._pool.put(conn)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Выполняет fn(conn, *args) в потоке пула"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, fn, *args)
+
+    async def init(self) -> None:
+        await self.run(_create_schema)
+        logger.info('✅ База данных инициализирована')
+
+    async def close(self) -> None:
+        def _close_all():
+            while True:
+                try:
+                    self._pool.get_nowait().close()
+                except queue.Empty:
+                    break
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, _close_all)
+
+    # === ТОВАРЫ ===
+    async def fetch_products(self) -> List[Product]:
+        def _fetch(conn):
+            return [Product(id=row[0], name=row[1], price=row[2], description=row[3] or '')
+                    for row in conn.execute(SQL_SELECT_PRODUCTS)]
+        return await self.run(_fetch)
+
+    async def save_product(self, product: Product) -> None:
+        await self.save_products((product,))
+
+    async def save_products(self, products: Iterable[Product]) -> None:
+        """Массовая запись товаров одной транзакцией (executemany)"""
+        rows = [(p.id, p.name, p.price, p.description) for p in products]
+
+        def _save(conn):
+            with conn:
+                conn.executemany(SQL_UPSERT_PRODUCT, rows)
+                conn.execute(SQL_BUMP_CATALOG_VERSION)
+        await self.run(_save)
+
+    async def insert_product(self, name: str, price: int, description: str) -> Tuple[int, int]:
+        """Новый товар: (ID, новая версия каталога).
+
+        ID выдаёт БД — уникален и при нескольких процессах; версия читается
+        в той же транзакции, что и увеличивается.
+        """
+        def _insert(conn):
+            with conn:
+                cursor = conn.execute(SQL_INSERT_PRODUCT, (name, price, description))
+                conn.execute(SQL_BUMP_CATALOG_VERSION)
+                version = conn.execute(SQL_SELECT_CATALOG_VERSION).fetchone()[0]
+            return cursor.lastrowid, version
+        return await self.run(_insert)
+
+    async def fetch_catalog_version(self) -> int:
+        def _fetch(conn):
+            row = conn.execute(SQL_SELECT_CATALOG_VERSION).fetchone()
+            return row[0] if row else 0
+        return await self.run(_fetch)
+
+    # === ФОТО ТОВАРОВ ===
+    async def fetch_media(self) -> List[Tuple[int, str, Optional[str]]]:
+        """(product_id, файл, file_id в Telegram или None)"""
+        return await self.run(lambda conn: conn.execute(SQL_SELECT_MEDIA).fetchall())
+
+    async def save_media(self, product_id: int, filename: str, file_id: Optional[str],
+                         catalog_changed: bool = False) -> Optional[int]:
+        """catalog_changed — новое фото товара (другие процессы перечитают каталог);
+        тогда возвращает новую версию каталога"""
+        def _save(conn):
+            with conn:
+                conn.execute(SQL_UPSERT_MEDIA, (product_id, filename, file_id))
+                if catalog_changed:
+                    conn.execute(SQL_BUMP_CATALOG_VERSION)
+                    return conn.execute(SQL_SELECT_CATALOG_VERSION).fetchone()[0]
+            return None
+        return await self.run(_save)
+
+    # === ЗАКАЗЫ ===
+    async def insert_order(self, user_id: int, items: Sequence[OrderItem], total: int,
+                           phone: str = '', address: str = '') -> int:
+        """Сохраняет заказ с позициями; возвращает номер заказа"""
+        order = NewOrder(user_id, tuple(items), total, int(time.time()), phone, address)
+        ids = await self.insert_orders((order,))
+        return ids[0]
+
+    async def insert_orders(self, orders: Sequence['NewOrder']) -> List[int]:
+        """Сохраняет пачку заказов одной транзакцией; возвращает их номера"""
+        return await self.run(_insert_orders, orders)
+
+    async def fetch_user_orders(self, user_id: int, limit: int = 10,
+                                before_id: int = MAX_ORDER_ID) -> List[tuple]:
+        """Заказы пользователя с номером меньше before_id, от новых к старым:
+        (id, total, status, created_at, число товаров)"""
+        return await self.run(
+            lambda conn: conn.execute(SQL_SELECT_USER_ORDERS_BEFORE, (user_id, before_id, limit)).fetchall()
         )
-    ''')
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS orders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            phone TEXT NOT NULL,
-            address TEXT NOT NULL,
-            total INTEGER NOT NULL,
-            status TEXT DEFAULT 'new'
+
+    async def fetch_user_orders_after(self, user_id: int, after_id: int, limit: int = 10) -> List[tuple]:
+        """Заказы пользователя с номером больше after_id, от старых к новым"""
+        return await self.run(
+            lambda conn: conn.execute(SQL_SELECT_USER_ORDERS_AFTER, (user_id, after_id, limit)).fetchall()
         )
-    ''')
 
-    conn.commit()
-    conn.close()
-    print('✅ База данных инициализирована')
+    async def fetch_order_items(self, order_id: int, user_id: Optional[int] = None) -> List[OrderItem]:
+        """Позиции заказа; с user_id — только если заказ принадлежит этому пользователю"""
+        if user_id is None:
+            return await self.run(
+                lambda conn: conn.execute(SQL_SELECT_ORDER_ITEMS, (order_id,)).fetchall()
+            )
+        return await self.run(
+            lambda conn: conn.execute(SQL_SELECT_USER_ORDER_ITEMS, (order_id, user_id)).fetchall()
+        )
 
+    # === ПОЛЬЗОВАТЕЛИ ===
+    async def save_users(self, user_ids: Iterable[int]) -> None:
+        """Запоминает пользователей (уже известные пропускаются)"""
+        now = int(time.time())
+        rows = [(user_id, now) for user_id in user_ids]
 
-def add_test_product():
-    conn = sqlite3.connect('shop.db')
-    cursor = conn.cursor()
+        def _save(conn):
+            with conn:
+                conn.executemany(SQL_INSERT_USER, rows)
+        await self.run(_save)
 
-    test_products = [
-        (1, '📱 iPhone 15', 79900, 'Новый iPhone 15'),
-        (2, '💻 MacBook Air', 119900, 'Ноутбук Apple'),
-        (3, '🎧 AirPods Pro', 24900, 'Беспроводные наушники'),
-    ]
+    async def fetch_recipients(self, after_id: int, limit: int) -> List[int]:
+        """Следующая порция получателей рассылки по ключу (id > after_id), без OFFSET"""
+        return await self.run(
+            lambda conn: [row[0] for row in conn.execute(SQL_SELECT_RECIPIENTS, (after_id, limit))]
+        )
 
-    cursor.execute('DELETE FROM products')
+    async def count_recipients(self, after_id: int = 0) -> int:
+        return await self.run(
+            lambda conn: conn.execute(SQL_COUNT_RECIPIENTS, (after_id,)).fetchone()[0]
+        )
 
-    cursor.executemany(
-        'INSERT INTO products (id, name, price, description) VALUES (?, ?, ?, ?)',
-        test_products
-    )
+    async def mark_users_blocked(self, user_ids: Iterable[int]) -> None:
+        """Пользователи, заблокировавшие бота, больше не попадают в рассылки"""
+        rows = [(user_id,) for user_id in user_ids]
+
+        def _mark(conn):
+            with conn:
+                conn.executemany(SQL_MARK_BLOCKED, rows)
+        await self.run(_mark)
+
+    # === КОРЗИНЫ ===
+    async def fetch_carts(self, shard_index: int = 0, shard_count: int = 1) -> List[Tuple[int, str]]:
+        """Корзины пользователей своего шарда: (user_id, позиции)"""
+        return await self.run(
+            lambda conn: conn.execute(SQL_SELECT_SHARD_CARTS, (shard_count, shard_index)).fetchall()
+        )
+
+    def fetch_cart_sync(self, user_id: int) -> Optional[Tuple[str, int]]:
+        """Корзина одного пользователя: (позиции, updated_at) или None.
+
+        Синхронно, в потоке вызывающего: это чтение по первичному ключу для
+        загрузчика CartStore, который не может ждать.
+        """
+        return self._call(lambda conn: conn.execute(SQL_SELECT_CART, (user_id,)).fetchone())
+
+    async def save_carts(self, upserts: Sequence[Tuple[int, str]], deletes: Sequence[int]) -> None:
+        """Изменённые и удалённые корзины — одной транзакцией"""
+        now = int(time.time())
+
+        def _save(conn):
+            with conn:
+                conn.executemany(SQL_UPSERT_CART, [(user_id, items, now) for user_id, items in upserts])
+                conn.executemany(SQL_DELETE_CART, [(user_id,) for user_id in deletes])
+        await self.run(_save)
+
+    # === РАССЫЛКИ ===
+    async def create_broadcast(self, text: str, report_chat_id: Optional[int] = None,
+                               report_message_id: Optional[int] = None) -> int:
+        def _create(conn):
+            with conn:
+                cursor = conn.execute(
+                    SQL_INSERT_BROADCAST, (text, report_chat_id, report_message_id, int(time.time()))
+                )
+            return cursor.lastrowid
+        return await self.run(_create)
+
+    async def save_broadcast_progress(self, broadcast_id: int, status: str,
+                                      last_user_id: int, sent: int, failed: int) -> None:
+        def _save(conn):
+            with conn:
+                conn.execute(SQL_UPDATE_BROADCAST, (status, last_user_id, sent, failed, broadcast_id))
+        await self.run(_save)
+
+    async def fetch_running_broadcasts(self) -> List[tuple]:
+        return await self.run(lambda conn: conn.execute(SQL_SELECT_RUNNING_BROADCASTS).fetchall())
+
+
+db = Database()
+
+
+# === СИНХРОННЫЕ УТИЛИТЫ (для ручного запуска) ===
+def init_db(path: Optional[str] = None):
+    conn = _connect(path or DB_PATH)
+    _create_schema(conn)
+    conn.close()
+    print('✅ База данных инициализирована')
+
+
+def add_test_product(path: Optional[str] = None):
+    conn = _connect(path or DB_PATH)
+
+    with conn:
+        conn.execute('DELETE FROM products')
+        conn.executemany(
+            'INSERT INTO products (id, name, price, description) VALUES (?, ?, ?, ?)',
+            [(p.id, p.name, p.price, p.description) for p in TEST_PRODUCTS]
+        )
 
-    conn.commit()
     conn.close()
-    print('✅ Тестовые товары добавлены')
\ No newline at end of file
+    print('✅ Тестовые товары добавлены')
@@ -0,0 +1,203 @@
+# data/fsm_storage.py
+"""FSM-хранилище aiogram поверх SQLite (WAL) с отложенной пакетной записью.
+
+Все состояния держатся в памяти — чтение никогда не идёт на диск.
+Изменения копятся в словаре «грязных» ключей (несколько изменений одного
+ключа схлопываются в одно) и пачкой записываются в отдельном потоке.
+Данные, которые не сериализуются в JSON, остаются только в памяти:
+такая запись пропускается с ошибкой в логе и не мешает остальным.
+
+При нескольких воркерах (WORKERS > 1) файл общий, а каждый процесс
+загружает только записи своих пользователей: апдейты пользователя
+всегда приходят в один и тот же воркер.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+logger = logging.getLogger(__name__)
+
+# Запись: (state, data)
+Record = Tuple[Optional[str], Dict[str, Any]]
+
+_EMPTY: Record = (None, {})
+
+
+def _key(key: StorageKey) -> str:
+    return (f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:"
+            f"{key.business_connection_id or ''}:{key.destiny}")
+
+
+class SQLiteStorage(BaseStorage):
+    """Персистентное FSM-хранилище: переживает перезапуски и редеплои"""
+
+    def __init__(self, path: str = 'shop.db', flush_interval: float = 0.5,
+                 owns: Optional[Callable[[int], bool]] = None):
+        self.path = path
+        self.flush_interval = flush_interval
+        # Фильтр user_id записей, которые обслуживает этот процесс
+        self.owns = owns
+
+        self._records: Dict[str, Record] = {}
+        self._dirty: Dict[str, Record] = {}
+
+        # Один поток на все обращения к файлу: sqlite-соединение живёт только в нём
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='fsm-sqlite')
+        self._conn: Optional[sqlite3.Connection] = None
+        self._ready: Optional[asyncio.Future] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+
+    # === РАБОТА С ДИСКОМ (в потоке executor) ===
+    def _open_sync(self) -> Dict[str, Record]:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS fsm_state (
+                key TEXT PRIMARY KEY,
+                state TEXT,
+                data TEXT NOT NULL DEFAULT '{}'
+            )
+        ''')
+        conn.commit()
+        self._conn = conn
+        owns = self.owns
+        return {
+            key: (state, json.loads(data))
+            for key, state, data in conn.execute('SELECT key, state, data FROM fsm_state')
+            if owns is None or owns(int(key.split(':')[2]))
+        }
+
+    def _write_sync(self, batch: Dict[str, Record]) -> None:
+        upserts = []
+        deletes = []
+        for key, (state, data) in batch.items():
+            if state is None and not data:
+                deletes.append((key,))
+                continue
+            try:
+                encoded = json.dumps(data, ensure_ascii=False)
+            except (TypeError, ValueError) as e:
+                # Повтор не поможет — иначе запись валила бы каждую следующую пачку
+                logger.error(f"❌ FSM-данные {key} не сериализуются в JSON, не сохранены: {e}")
+                continue
+            upserts.append((key, state, encoded))
+
+        with self._conn:  # одна транзакция на всю пачку
+            if upserts:
+                self._conn.executemany(
+                    'INSERT INTO fsm_state (key, state, data) VALUES (?, ?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET state = excluded.state, data = excluded.data',
+                    upserts
+                )
+            if deletes:
+                self._conn.executemany('DELETE FROM fsm_state WHERE key = ?', deletes)
+
+    def _close_sync(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # === ЗАГРУЗКА И ФОНОВАЯ ЗАПИСЬ ===
+    async def _ensure_ready(self) -> None:
+        if self._ready is None:
+            loop = asyncio.get_running_loop()
+            self._ready = loop.create_future()
+            try:
+                records = await loop.run_in_executor(self._executor, self._open_sync)
+            except Exception as e:
+                self._ready.set_exception(e)
+                self._ready = None
+                raise
+            self._records = records
+            self._wakeup = asyncio.Event()
+            self._stopping = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_loop())
+            self._ready.set_result(None)
+            logger.info(f"💾 FSM-хранилище загружено: {len(records)} записей")
+        elif not self._ready.done():
+            await self._ready
+
+    async def _flush_loop(self) -> None:
+        # Останавливается по _stopping, а не cancel(): пачка, уже забранная
+        # из _dirty, всегда дописывается до конца
+        while not self._stopping.is_set():
+            await self._wakeup.wait()
+            # Копим изменения, чтобы записать их одной транзакцией
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Записывает накопленные изменения на диск"""
+        if not self._dirty or self._conn is None:
+            return
+        batch, self._dirty = self._dirty, {}
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, self._write_sync, batch)
+        except asyncio.CancelledError:
+            # Пачка могла не дойти до потока — повторная запись безвредна
+            self._requeue(batch)
+            raise
+        except Exception as e:
+            logger.error(f"❌ Ошибка записи FSM-хранилища: {e}")
+            self._requeue(batch)
+            self._wakeup.set()
+
+    def _requeue(self, batch: Dict[str, Record]) -> None:
+        # Возвращаем неудавшиеся изменения, не затирая более свежие
+        for key, record in batch.items():
+            self._dirty.setdefault(key, record)
+
+    def _store(self, key: str, record: Record) -> None:
+        if record[0] is None and not record[1]:
+            self._records.pop(key, None)
+        else:
+            self._records[key] = record
+        self._dirty[key] = record
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # === ИНТЕРФЕЙС BaseStorage ===
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._ensure_ready()
+        k = _key(key)
+        state = state.state if isinstance(state, State) else state
+        self._store(k, (state, self._records.get(k, _EMPTY)[1]))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        await self._ensure_ready()
+        return self._records.get(_key(key), _EMPTY)[0]
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self._ensure_ready()
+        k = _key(key)
+        self._store(k, (self._records.get(k, _EMPTY)[0], data.copy()))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        await self._ensure_ready()
+        return self._records.get(_key(key), _EMPTY)[1].copy()
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._stopping.set()
+            self._wakeup.set()
+            await self._flusher
+            self._flusher = None
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._close_sync)
+        self._ready = None
+        logger.info("💾 FSM-хранилище сохранено и закрыто")
@@ -0,0 +1,84 @@
+# data/order_history.py
+"""История заказов пользователя постранично.
+
+Страницы читаются по ключу (номер заказа меньше/больше курсора) через
+индекс (user_id, id DESC) — время не зависит от числа заказов. Первую
+страницу, которую открывают чаще всего, держим в LRU-кэше и сбрасываем,
+когда пользователь оформляет новый заказ.
+"""
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+from data.database import Database, db
+
+
+class OrderSummary(NamedTuple):
+    """Строка истории заказов"""
+    id: int
+    total: int
+    status: str
+    created_at: int
+    count: int
+
+
+class OrdersPage(NamedTuple):
+    """Страница истории: заказы от новых к старым"""
+    orders: Tuple[OrderSummary, ...]
+    has_newer: bool
+    has_older: bool
+
+    @property
+    def first_id(self) -> Optional[int]:
+        return self.orders[0].id if self.orders else None
+
+    @property
+    def last_id(self) -> Optional[int]:
+        return self.orders[-1].id if self.orders else None
+
+
+class OrderHistory:
+    """Постраничная история заказов с кэшем первой страницы"""
+
+    def __init__(self, database: Database, page_size: int = 5, max_cached: int = 10_000):
+        self.database = database
+        self.page_size = page_size
+        self.max_cached = max_cached
+        self._first_pages: "OrderedDict[int, OrdersPage]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def first_page(self, user_id: int) -> OrdersPage:
+        page = self._first_pages.get(user_id)
+        if page is not None:
+            self.hits += 1
+            self._first_pages.move_to_end(user_id)
+            return page
+        self.misses += 1
+        page = await self.older(user_id)
+        self._first_pages[user_id] = page
+        if len(self._first_pages) > self.max_cached:
+            self._first_pages.popitem(last=False)
+        return page
+
+    async def older(self, user_id: int, before_id: Optional[int] = None) -> OrdersPage:
+        """Страница заказов старше before_id (без курсора — самые новые)"""
+        # Берём на одну строку больше, чтобы узнать, есть ли следующая страница
+        if before_id is None:
+            rows = await self.database.fetch_user_orders(user_id, self.page_size + 1)
+        else:
+            rows = await self.database.fetch_user_orders(user_id, self.page_size + 1, before_id)
+        orders = tuple(OrderSummary(*row) for row in rows[:self.page_size])
+        return OrdersPage(orders, has_newer=before_id is not None, has_older=len(rows) > self.page_size)
+
+    async def newer(self, user_id: int, after_id: int) -> OrdersPage:
+        """Страница заказов новее after_id"""
+        rows = await self.database.fetch_user_orders_after(user_id, after_id, self.page_size + 1)
+        orders = tuple(OrderSummary(*row) for row in reversed(rows[:self.page_size]))
+        return OrdersPage(orders, has_newer=len(rows) > self.page_size, has_older=True)
+
+    def invalidate(self, user_id: int) -> None:
+        """Вызывается при оформлении заказа: первая страница изменилась"""
+        self._first_pages.pop(user_id, None)
+
+
+order_history = OrderHistory(db)
@@ -0,0 +1,176 @@
+# data/order_log.py
+"""Запись заказов с групповой фиксацией (group commit).
+
+Подтверждённые заказы попадают в очередь; фоновая задача забирает из неё
+всё, что накопилось, и записывает пачкой в одной транзакции. Пока одна
+пачка пишется на диск, следующая копится в очереди — при наплыве заказов
+один fsync приходится на десятки заказов, а не на каждый.
+
+Заказы, которые не удалось записать при остановке, уходят в spool-файл
+с уникальным spool_key. Файл удаляется после транзакции восстановления,
+а ключи записываются в той же транзакции, что и заказы: если процесс
+упадёт между ними, повторное восстановление заказы не продублирует.
+"""
+import asyncio
+import glob
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from typing import List, Optional, Sequence, Tuple
+
+from data.database import Database, NewOrder, OrderItem, db
+
+logger = logging.getLogger(__name__)
+
+ORDERS_SPOOL_PATH = os.getenv('ORDERS_SPOOL_PATH', 'orders.pending')
+
+_Pending = Tuple[NewOrder, asyncio.Future]
+
+
+class OrderDeferred(Exception):
+    """Заказ не записан в БД, но сохранён в spool-файл и будет записан при перезапуске"""
+
+
+class OrderWriter:
+    """Очередь заказов с пакетной записью в таблицу orders"""
+
+    def __init__(self, database: Database, max_batch: int = 200, linger: float = 0.002,
+                 spool_path: str = ORDERS_SPOOL_PATH):
+        self.database = database
+        self.max_batch = max_batch
+        self.linger = linger
+        self.spool_path = spool_path
+        self._spool_base = spool_path
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._closing = False
+
+        # Счётчики для статистики
+        self.batches = 0
+        self.written = 0
+
+    @property
+    def pending(self) -> int:
+        """Заказов в очереди на запись"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, user_id: int, items: Sequence[OrderItem], total: int) -> int:
+        """Ставит заказ в очередь и ждёт его фиксации; возвращает номер заказа"""
+        if self._queue is None or self._closing:
+            raise RuntimeError("OrderWriter не запущен")
+        order = NewOrder(user_id, tuple(items), total, int(time.time()))
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((order, future))
+        return await future
+
+    # === ЗАПУСК И ОСТАНОВКА ===
+    async def start(self, shard_index: int = 0, shard_count: int = 1) -> None:
+        """При нескольких воркерах у каждого свой spool-файл, а восстанавливает их все шард 0"""
+        self._queue = asyncio.Queue()
+        self._closing = False
+        if shard_count > 1:
+            self.spool_path = f"{self._spool_base}.{shard_index}"
+        if shard_index == 0:
+            await self.recover()
+        self._worker = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Дописывает очередь; то, что записать не удалось, сохраняет в spool-файл"""
+        if self._queue is None:
+            return
+        self._closing = True
+        # None — маркер конца очереди: новые заказы после него не принимаются
+        self._queue.put_nowait(None)
+        if self._worker is not None:
+            await self._worker
+            self._worker = None
+        self._queue = None
+
+    # === ВОССТАНОВЛЕНИЕ ===
+    async def recover(self) -> int:
+        """Записывает заказы, отложенные в spool-файлы при прошлой остановке.
+
+        Файлы шардов (<spool>.N) собираются все: число воркеров могло измениться.
+        """
+        recovered = 0
+        for path in [self._spool_base] + sorted(glob.glob(glob.escape(self._spool_base) + '.*')):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    orders = [self._decode(line) for line in f if line.strip()]
+            except FileNotFoundError:
+                continue
+            if orders:
+                ids = await self.database.insert_orders(orders)
+                if ids:
+                    logger.info(f"♻️ Восстановлено отложенных заказов из {path}: {len(ids)} "
+                                f"(#{ids[0]}–#{ids[-1]})")
+                if len(ids) < len(orders):
+                    logger.info(f"♻️ Уже восстановлены раньше, пропущены: {len(orders) - len(ids)}")
+                recovered += len(ids)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return recovered
+
+    def _spool(self, orders: List[NewOrder]) -> None:
+        with open(self.spool_path, 'a', encoding='utf-8') as f:
+            for order in orders:
+                order = order._replace(spool_key=uuid.uuid4().hex)
+                f.write(json.dumps(order._asdict(), ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        logger.warning(f"💾 {len(orders)} заказов сохранены в {self.spool_path} до перезапуска")
+
+    @staticmethod
+    def _decode(line: str) -> NewOrder:
+        raw = json.loads(line)
+        raw['items'] = tuple(tuple(item) for item in raw['items'])
+        if not raw.get('spool_key'):
+            # Файл записан до появления ключей: ключ — хэш самой строки
+            raw['spool_key'] = hashlib.sha1(line.strip().encode()).hexdigest()
+        return NewOrder(**raw)
+
+    # === ФОНОВАЯ ЗАПИСЬ ===
+    async def _run(self) -> None:
+        stop = False
+        while not stop:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            if self.linger:
+                # Короткая пауза, чтобы одновременные заказы попали в одну пачку
+                await asyncio.sleep(self.linger)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                await self._commit(batch)
+            except Exception as e:
+                logger.error(f"❌ Ошибка записи пачки заказов ({len(batch)} шт.): {e}", exc_info=True)
+                if self._closing:
+                    # При остановке не теряем заказы: допишем их после перезапуска
+                    self._spool([order for order, _ in batch])
+                    e = OrderDeferred(str(e))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _commit(self, batch: List[_Pending]) -> None:
+        ids = await self.database.insert_orders([order for order, _ in batch])
+        self.batches += 1
+        self.written += len(ids)
+        for (_, future), order_id in zip(batch, ids):
+            if not future.done():
+                future.set_result(order_id)
+
+
+order_writer = OrderWriter(db)
@@ -0,0 +1,73 @@
+# data/users.py
+"""Реестр пользователей бота — получатели рассылок.
+
+Каждый апдейт отмечает пользователя, но в БД пишутся только новые ID,
+и не по одному, а пачкой раз в flush_interval секунд.
+"""
+import asyncio
+import logging
+from typing import Optional, Set
+
+from data.database import Database, db
+
+logger = logging.getLogger(__name__)
+
+
+class UserRegistry:
+    """Буфер новых пользователей с пакетной записью в таблицу users"""
+
+    def __init__(self, database: Database, flush_interval: float = 5.0, max_known: int = 1_000_000):
+        self.database = database
+        self.flush_interval = flush_interval
+        self.max_known = max_known
+
+        self._known: Set[int] = set()
+        self._pending: Set[int] = set()
+        self._stopping: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+
+    def touch(self, user_id: int) -> None:
+        """Отмечает пользователя; O(1), без обращения к диску"""
+        if user_id in self._known:
+            return
+        if len(self._known) >= self.max_known:
+            # Множество нужно только чтобы не писать одно и то же; сброс безопасен
+            self._known.clear()
+        self._known.add(user_id)
+        self._pending.add(user_id)
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, set()
+        try:
+            await self.database.save_users(batch)
+        except Exception as e:
+            logger.error(f"❌ Не удалось сохранить пользователей ({len(batch)} шт.): {e}")
+            # Повторим в следующий раз
+            self._pending |= batch
+
+    # === ЗАПУСК И ОСТАНОВКА ===
+    async def start(self) -> None:
+        if self._flusher is None:
+            self._stopping = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._flusher is not None:
+            # Не отменяем задачу: пачка, которую она пишет, уже убрана из _pending
+            self._stopping.set()
+            await self._flusher
+            self._flusher = None
+        await self.flush()
+
+    async def _flush_loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+
+user_registry = UserRegistry(db)
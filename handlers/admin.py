@@ -1,11 +1,23 @@
-from aiogram import Router, types, F
-from aiogram.filters import Command, StateFilter
+from aiogram import Bot, F, Router, types
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command, CommandObject, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 import logging
-
-# Импортируем существующий список товаров из products.py
-from handlers.products import products
+import os
+from typing import Optional
+
+# Импортируем каталог товаров из products.py
+from handlers.products import catalog
+from data.catalog import Product
+from data.database import db
+from keyboards.admin_keyboard import BROADCAST_CONFIRM_KEYBOARD, broadcast_progress_keyboard
+from keyboards.cache import markup_cache
+from services.broadcast import broadcaster
+from services.media import media_store
+from services.search import search_index
+from utils.callbacks import callback_data, callbacks
+from utils.logging_setup import configured_levels, set_level
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -25,6 +37,13 @@ class AddProduct(StatesGroup):
     waiting_for_name = State()
     waiting_for_description = State()
     waiting_for_price = State()
+    waiting_for_photo = State()
+
+
+class Broadcast(StatesGroup):
+    """Состояния для рассылки"""
+    waiting_for_text = State()
+    waiting_for_confirm = State()
 
 
 # === КОМАНДА /admin ДЛЯ ВЫЗОВА АДМИНКИ ===
@@ -38,10 +57,11 @@ async def cmd_admin(message: types.Message):
 
     # Клавиатура админ-меню
     keyboard = types.InlineKeyboardMarkup(inline_keyboard=[
-        [types.InlineKeyboardButton(text="➕ Добавить товар", callback_data="admin_add_product")],
-        [types.InlineKeyboardButton(text="📝 Управление товарами", callback_data="admin_manage_products")],
-        [types.InlineKeyboardButton(text="📊 Статистика", callback_data="admin_stats")],
-        [types.InlineKeyboardButton(text="🏠 В главное меню", callback_data="go_home")]
+        [types.InlineKeyboardButton(text="➕ Добавить товар", callback_data=callback_data("admin_add_product"))],
+        [types.InlineKeyboardButton(text="📝 Управление товарами", callback_data=callback_data("admin_manage_products"))],
+        [types.InlineKeyboardButton(text="📊 Статистика", callback_data=callback_data("admin_stats"))],
+        [types.InlineKeyboardButton(text="📣 Рассылка", callback_data=callback_data("admin_broadcast"))],
+        [types.InlineKeyboardButton(text="🏠 В главное меню", callback_data=callback_data("go_home"))]
     ])
 
     await message.answer(
@@ -54,7 +74,7 @@ async def cmd_admin(message: types.Message):
 
 
 # === НАЧАЛО ДОБАВЛЕНИЯ ТОВАРА ===
-@router.callback_query(F.data == "admin_add_product")
+@callbacks.action("admin_add_product")
 async def start_add_product(callback: types.CallbackQuery, state: FSMContext):
     """Начало процесса добавления товара"""
     if not is_admin(callback.from_user.id):
@@ -102,10 +122,10 @@ async def process_product_description(message: types.Message, state: FSMContext)
     )
 
 
-# === ОБРАБОТКА ЦЕНЫ И ФИНАЛИЗАЦИЯ ===
+# === ОБРАБОТКА ЦЕНЫ ===
 @router.message(AddProduct.waiting_for_price)
 async def process_product_price(message: types.Message, state: FSMContext):
-    """Получаем цену и сохраняем товар"""
+    """Получаем цену и запрашиваем фото"""
     try:
         # Пробуем преобразовать в число
         price = int(message.text)
@@ -121,46 +141,224 @@ async def process_product_price(message: types.Message, state: FSMContext):
         )
         return
 
+    await state.update_data(price=price)
+    await state.set_state(AddProduct.waiting_for_photo)
+
+    await message.answer(
+        "✅ Цена сохранена!\n\n"
+        "Отправьте <b>фото товара</b> или /skip, чтобы добавить товар без фото.",
+        parse_mode="HTML"
+    )
+
+
+# === ФОТО (НЕОБЯЗАТЕЛЬНО) И ФИНАЛИЗАЦИЯ ===
+@router.message(AddProduct.waiting_for_photo, F.photo)
+async def process_product_photo(message: types.Message, state: FSMContext, bot: Bot):
+    """Фото товара: file_id от Telegram используется сразу, копия — для миниатюр"""
+    await finish_add_product(message, state, bot, photo=message.photo[-1])
+
+
+@router.message(AddProduct.waiting_for_photo)
+async def skip_product_photo(message: types.Message, state: FSMContext, bot: Bot):
+    """Любой текст (/skip) — товар без фото"""
+    await finish_add_product(message, state, bot, photo=None)
+
+
+async def finish_add_product(message: types.Message, state: FSMContext, bot: Bot,
+                             photo: Optional[types.PhotoSize]):
+    """Сохраняем товар"""
     # Получаем все сохранённые данные
     data = await state.get_data()
-    await state.clear()
-
-    # Создаём новый товар
-    new_product = {
-        "id": len(products) + 1,  # Простой способ генерации ID
-        "name": data['name'],
-        "description": data['description'],
-        "price": price
-    }
+    price = data['price']
 
-    # Добавляем в список товаров
-    products.append(new_product)
+    # ID выдаёт БД — уникален, даже если товары добавляют в разных воркерах
+    try:
+        product_id, version = await db.insert_product(data['name'], price, data['description'])
+    except Exception as e:
+        # Состояние мастера не сбрасываем: повторная отправка фото или /skip сохранит товар
+        logger.error(f"❌ Не удалось сохранить товар {data['name']} в БД: {e}")
+        await message.answer("❌ Не удалось сохранить товар, попробуйте ещё раз")
+        return
+    await state.clear()
 
-    logger.info(f"🆕 Админ добавил товар: {new_product['name']} за {price}₽")
+    # Публикуется новая версия каталога
+    new_product = Product(id=product_id, name=data['name'], price=price,
+                          description=data['description'])
+    previous = catalog.version
+    catalog.put(new_product, version)
+
+    # Сбрасываем только затронутые клавиатуры: страницы прежней версии каталога
+    # (новая версия кэшируется под своим ключом) и карточку этого товара
+    markup_cache.invalidate("catalog", previous)
+    markup_cache.invalidate("product", new_product.id)
+    # Товар сразу находится inline-поиском (индекс дополняется, а не перестраивается)
+    search_index.add(new_product)
+
+    if photo is not None:
+        # Фото уже в Telegram: карточки пойдут по этому file_id без загрузки.
+        # Локальная копия нужна для миниатюр (строятся в пуле процессов)
+        filename = f"product_{new_product.id}.jpg"
+        try:
+            os.makedirs(media_store.images_dir, exist_ok=True)
+            await bot.download(photo.file_id, destination=os.path.join(media_store.images_dir, filename))
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось скачать фото товара {new_product.id}: {e}")
+        try:
+            version = await media_store.set_photo(new_product.id, filename, file_id=photo.file_id)
+            # Фото тоже меняет версию каталога — снимок догоняет БД
+            previous = catalog.version
+            catalog.put(new_product, version)
+            markup_cache.invalidate("catalog", previous)
+        except Exception as e:
+            logger.error(f"❌ Не удалось сохранить фото товара {new_product.id}: {e}")
+
+    logger.info(f"🆕 Админ добавил товар: {new_product.name} за {price}₽")
 
     # Показываем результат
     await message.answer(
         f"✅ <b>Товар успешно добавлен!</b>\n\n"
-        f"🆔 ID: {new_product['id']}\n"
-        f"📦 Название: {new_product['name']}\n"
-        f"📝 Описание: {new_product['description']}\n"
-        f"💰 Цена: {new_product['price']}₽\n\n"
+        f"🆔 ID: {new_product.id}\n"
+        f"📦 Название: {new_product.name}\n"
+        f"📝 Описание: {new_product.description}\n"
+        f"💰 Цена: {new_product.price}₽\n"
+        f"🖼 Фото: {'есть' if photo is not None else 'нет'}\n\n"
         f"Теперь он доступен в каталоге для всех пользователей.",
         parse_mode="HTML"
     )
 
     # Предлагаем дальше
     keyboard = types.InlineKeyboardMarkup(inline_keyboard=[
-        [types.InlineKeyboardButton(text="➕ Добавить ещё товар", callback_data="admin_add_product")],
-        [types.InlineKeyboardButton(text="📦 Перейти в каталог", callback_data="show_catalog")],
-        [types.InlineKeyboardButton(text="🏠 В главное меню", callback_data="go_home")]
+        [types.InlineKeyboardButton(text="➕ Добавить ещё товар", callback_data=callback_data("admin_add_product"))],
+        [types.InlineKeyboardButton(text="📦 Перейти в каталог", callback_data=callback_data("show_catalog"))],
+        [types.InlineKeyboardButton(text="🏠 В главное меню", callback_data=callback_data("go_home"))]
     ])
 
     await message.answer("Что дальше?", reply_markup=keyboard)
 
 
+# === РАССЫЛКА ===
+@callbacks.action("admin_broadcast")
+async def start_broadcast(callback: types.CallbackQuery, state: FSMContext):
+    """Запрашиваем текст рассылки"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("Доступ запрещён", show_alert=True)
+        return
+
+    await state.set_state(Broadcast.waiting_for_text)
+    await callback.message.edit_text(
+        "📣 <b>Рассылка всем пользователям</b>\n\n"
+        "Отправьте <b>текст сообщения</b> (форматирование сохранится):",
+        parse_mode="HTML"
+    )
+    await callback.answer()
+
+
+@router.message(Broadcast.waiting_for_text)
+async def process_broadcast_text(message: types.Message, state: FSMContext):
+    """Показываем предпросмотр и просим подтвердить"""
+    if not message.text:
+        await message.answer("❌ Нужен текст сообщения.")
+        return
+
+    await state.update_data(text=message.html_text)
+    await state.set_state(Broadcast.waiting_for_confirm)
+
+    recipients = await db.count_recipients()
+    await message.answer(
+        f"👀 <b>Предпросмотр</b>\n\n{message.html_text}\n\n"
+        f"👥 Получателей: {recipients}",
+        reply_markup=BROADCAST_CONFIRM_KEYBOARD,
+        parse_mode="HTML"
+    )
+
+
+@callbacks.action("admin_broadcast_confirm")
+async def confirm_broadcast(callback: types.CallbackQuery, state: FSMContext, bot: Bot):
+    """Запускаем рассылку; прогресс обновляется в этом же сообщении"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("Доступ запрещён", show_alert=True)
+        return
+
+    data = await state.get_data()
+    await state.clear()
+    if not data.get('text'):
+        await callback.answer("Текст рассылки потерян, начните заново", show_alert=True)
+        return
+
+    job = await broadcaster.start(
+        bot, data['text'],
+        report_chat_id=callback.message.chat.id,
+        report_message_id=callback.message.message_id
+    )
+    await callback.message.edit_text(
+        job.progress_text(),
+        reply_markup=broadcast_progress_keyboard(job.id, running=True),
+        parse_mode="HTML"
+    )
+    await callback.answer("Рассылка запущена")
+    logger.info(f"📣 Админ {callback.from_user.id} запустил рассылку #{job.id}")
+
+
+@callbacks.action("admin_broadcast_status")
+async def broadcast_status(callback: types.CallbackQuery, args):
+    """Текущий прогресс рассылки"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("Доступ запрещён", show_alert=True)
+        return
+
+    job = broadcaster.jobs.get(int(args[0])) if args else None
+    if job is None:
+        await callback.answer("Рассылка не найдена (бот перезапускался?)", show_alert=True)
+        return
+
+    try:
+        await callback.message.edit_text(
+            job.progress_text(),
+            reply_markup=broadcast_progress_keyboard(job.id, job.status == 'running'),
+            parse_mode="HTML"
+        )
+    except TelegramBadRequest:
+        pass
+    await callback.answer()
+
+
+@callbacks.action("admin_broadcast_stop")
+async def stop_broadcast(callback: types.CallbackQuery, args):
+    """Останавливаем рассылку"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("Доступ запрещён", show_alert=True)
+        return
+
+    job = broadcaster.stop(int(args[0])) if args else None
+    await callback.answer("Рассылка остановлена" if job else "Рассылка не найдена", show_alert=job is None)
+
+
+# === УРОВНИ ЛОГИРОВАНИЯ НА ХОДУ ===
+@router.message(Command("loglevel"))
+async def cmd_loglevel(message: types.Message, command: CommandObject):
+    """/loglevel — текущие уровни; /loglevel handlers.products DEBUG — сменить уровень модуля"""
+    if not is_admin(message.from_user.id):
+        return
+
+    args = (command.args or '').split()
+    if len(args) == 2:
+        try:
+            level = set_level(args[0], args[1])
+        except ValueError as e:
+            await message.answer(f"❌ {e}")
+            return
+        logger.warning(f"🔧 Админ {message.from_user.id} сменил уровень логов {args[0]} на {level}")
+
+    lines = [f"{name}: {level}" for name, level in configured_levels().items()]
+    await message.answer(
+        "🔧 <b>Уровни логирования</b>\n\n<code>" + "\n".join(lines) + "</code>\n\n"
+        "Сменить: <code>/loglevel handlers.products DEBUG</code>",
+        parse_mode="HTML"
+    )
+
+
 # === ОБРАБОТЧИК ОТМЕНЫ (на всякий случай) ===
-@router.callback_query(F.data == "admin_cancel")
+@callbacks.action("admin_cancel")
 async def admin_cancel(callback: types.CallbackQuery, state: FSMContext):
     """Отмена текущего действия в админке"""
     await state.clear()
@@ -169,7 +367,7 @@ async def admin_cancel(callback: types.CallbackQuery, state: FSMContext):
 
 
 # === ЗАГЛУШКИ ДЛЯ ДРУГИХ ФУНКЦИЙ (доделаем завтра) ===
-@router.callback_query(F.data == "admin_manage_products")
+@callbacks.action("admin_manage_products")
 async def manage_products(callback: types.CallbackQuery):
     """Управление товарами (заглушка)"""
     await callback.message.edit_text(
@@ -181,18 +379,20 @@ async def manage_products(callback: types.CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin_stats")
+@callbacks.action("admin_stats")
 async def admin_stats(callback: types.CallbackQuery):
     """Статистика (заглушка)"""
-    from handlers.products import user_carts
+    from handlers.products import cart_store
 
-    total_products = len(products)
-    total_carts = len(user_carts)
+    total_products = len(catalog)
+    cart_stats = cart_store.stats()
 
     await callback.message.edit_text(
         f"📊 <b>Статистика магазина</b>\n\n"
         f"📦 Товаров в каталоге: {total_products}\n"
-        f"🛒 Активных корзин: {total_carts}\n\n"
+        f"🛒 Активных корзин: {cart_stats['entries']}\n"
+        f"💾 Память корзин: ~{cart_stats['approx_bytes'] // 1024} КБ\n"
+        f"🧹 Удалено по TTL/LRU: {cart_stats['evicted_ttl']}/{cart_stats['evicted_lru']}\n\n"
         f"<i>Детальная статистика будет завтра!</i>",
         parse_mode="HTML"
     )
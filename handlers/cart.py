@@ -1,10 +1,16 @@
 from aiogram import Router, types
 from aiogram.filters import Command
-from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 import logging
 
-# Импортируем корзину из products
-from handlers.products import user_carts
+from data.order_history import order_history
+from data.order_log import OrderDeferred, order_writer
+from services.notifications import notifier
+from utils.callbacks import callbacks
+from utils.screens import show_screen
+from keyboards.cart_keyboard import CART_EXIT_KEYBOARD, CART_KEYBOARD, CHECKOUT_KEYBOARD
+
+# Импортируем корзину и каталог из products
+from handlers.products import cart_store, catalog
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -15,20 +21,17 @@ async def show_cart_handler(message: types.Message, user_id: int = None):
     if user_id is None:
         user_id = message.from_user.id
 
-    cart = user_carts.get(user_id, [])
+    cart = cart_store.get(user_id)
 
     if not cart:
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="🛍 В каталог", callback_data="back_to_products")],
-            [InlineKeyboardButton(text="🏠 Главная", callback_data="go_home")]
-        ])
+        keyboard = CART_EXIT_KEYBOARD
 
         if hasattr(message, 'edit_text'):
-            await message.edit_text(
+            await show_screen(
+                message,
                 "🛒 <b>Ваша корзина пуста</b>\n\n"
                 "Добавьте товары из каталога!",
-                reply_markup=keyboard,
-                parse_mode="HTML"
+                reply_markup=keyboard
             )
         else:
             await message.answer(
@@ -39,27 +42,23 @@ async def show_cart_handler(message: types.Message, user_id: int = None):
             )
         return
 
-    # Подсчитываем
-    total = sum(item['price'] for item in cart)
-
-    # Формируем текст
-    cart_text = "🛒 <b>Ваша корзина:</b>\n\n"
-    for i, item in enumerate(cart, 1):
-        cart_text += f"{i}. {item['name']} - {item['price']}₽\n"
+    # Формируем текст (по позициям, итоги уже посчитаны корзиной)
+    snapshot = catalog.snapshot
+    lines = ["🛒 <b>Ваша корзина:</b>\n"]
+    for i, (product_id, qty, price) in enumerate(cart.items(), 1):
+        product = snapshot.get(product_id)
+        name = product.name if product else f"Товар #{product_id}"
+        if qty > 1:
+            lines.append(f"{i}. {name} × {qty} - {price * qty}₽")
+        else:
+            lines.append(f"{i}. {name} - {price}₽")
 
-    cart_text += f"\n<b>Товаров: {len(cart)}</b>\n<b>Итого: {total}₽</b>"
+    cart_text = "\n".join(lines) + f"\n\n<b>Товаров: {cart.count}</b>\n<b>Итого: {cart.total}₽</b>"
 
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🗑 Очистить корзину", callback_data="clear_cart")],
-        [InlineKeyboardButton(text="✅ Оформить заказ", callback_data="create_order")],
-        [
-            InlineKeyboardButton(text="🛍 В каталог", callback_data="back_to_products"),
-            InlineKeyboardButton(text="🏠 Главная", callback_data="go_home")
-        ]
-    ])
+    keyboard = CART_KEYBOARD
 
     if hasattr(message, 'edit_text'):
-        await message.edit_text(cart_text, reply_markup=keyboard, parse_mode="HTML")
+        await show_screen(message, cart_text, reply_markup=keyboard)
     else:
         await message.answer(cart_text, reply_markup=keyboard, parse_mode="HTML")
 
@@ -69,21 +68,18 @@ async def cmd_cart(message: types.Message):
     await show_cart_handler(message)
 
 
-@router.callback_query(lambda c: c.data == "view_cart")
+@callbacks.action("view_cart")
 async def callback_show_cart(callback: types.CallbackQuery):
     await show_cart_handler(callback.message, callback.from_user.id)
     await callback.answer()
 
 
-@router.callback_query(lambda c: c.data == "clear_cart")
+@callbacks.action("clear_cart")
 async def clear_cart(callback: types.CallbackQuery):
     user_id = callback.from_user.id
-    user_carts[user_id] = []
+    cart_store.discard(user_id)
 
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🛍 В каталог", callback_data="back_to_products")],
-        [InlineKeyboardButton(text="🏠 Главная", callback_data="go_home")]
-    ])
+    keyboard = CART_EXIT_KEYBOARD
 
     await callback.message.edit_text(
         "🗑 <b>Корзина очищена!</b>",
@@ -93,26 +89,21 @@ async def clear_cart(callback: types.CallbackQuery):
     await callback.answer("Корзина очищена!", show_alert=False)
 
 
-@router.callback_query(lambda c: c.data == "create_order")
+@callbacks.action("create_order")
 async def create_order(callback: types.CallbackQuery):
     user_id = callback.from_user.id
-    cart = user_carts.get(user_id, [])
+    cart = cart_store.get(user_id)
 
     if not cart:
         await callback.answer("Корзина пуста!", show_alert=True)
         return
 
-    total = sum(item['price'] for item in cart)
-
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="✅ Подтвердить заказ", callback_data="confirm_order")],
-        [InlineKeyboardButton(text="🔙 Назад в корзину", callback_data="view_cart")]
-    ])
+    keyboard = CHECKOUT_KEYBOARD
 
     await callback.message.edit_text(
         f"✅ <b>Оформление заказа</b>\n\n"
-        f"Товаров: {len(cart)}\n"
-        f"Сумма: {total}₽\n\n"
+        f"Товаров: {cart.count}\n"
+        f"Сумма: {cart.total}₽\n\n"
         f"Для оформления нажмите 'Подтвердить заказ'.\n"
         f"Администратор свяжется с вами в ближайшее время.",
         reply_markup=keyboard,
@@ -121,30 +112,57 @@ async def create_order(callback: types.CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(lambda c: c.data == "confirm_order")
+@callbacks.action("confirm_order")
 async def confirm_order(callback: types.CallbackQuery):
     user_id = callback.from_user.id
-    cart = user_carts.get(user_id, [])
+    # Корзина снимается до ожидания записи: повторное нажатие увидит пустую
+    # корзину, а товары, добавленные за время записи, попадут в новую
+    cart = cart_store.discard(user_id)
 
     if not cart:
         await callback.answer("Корзина пуста!", show_alert=True)
         return
 
-    total = sum(item['price'] for item in cart)
+    total = cart.total
+    count = cart.count
+
+    # Сохраняем заказ с позициями (названия — на момент заказа)
+    snapshot = catalog.snapshot
+    items = []
+    for product_id, qty, price in cart.items():
+        product = snapshot.get(product_id)
+        items.append((product_id, product.name if product else f"Товар #{product_id}", qty, price))
+
+    # Заказ уходит в очередь группой записи; номер выдаётся при фиксации в БД
+    try:
+        order_id = await order_writer.submit(user_id, items, total)
+    except OrderDeferred:
+        order_id = None
+    except Exception as e:
+        logger.error(f"❌ Не удалось сохранить заказ пользователя {user_id}: {e}", exc_info=True)
+        # Возвращаем позиции (вместе с добавленными за это время)
+        for product_id, qty, price in cart.items():
+            cart_store.add_item(user_id, product_id, price, qty)
+        await callback.answer("Не удалось оформить заказ, попробуйте ещё раз", show_alert=True)
+        return
+
+    # Первая страница «Моих заказов» устарела
+    order_history.invalidate(user_id)
 
-    # Очищаем корзину
-    user_carts[user_id] = []
+    # Админы узнают о заказе из фоновой очереди — покупатель её не ждёт
+    notifier.order_placed(
+        order_id, user_id, callback.from_user.full_name, total, count,
+        ((name, qty) for _, name, qty, _ in items)
+    )
+    order_number = f"#{order_id}" if order_id else "будет присвоен позже"
 
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🛍 В каталог", callback_data="back_to_products")],
-        [InlineKeyboardButton(text="🏠 Главная", callback_data="go_home")]
-    ])
+    keyboard = CART_EXIT_KEYBOARD
 
     await callback.message.edit_text(
         f"🎉 <b>Заказ оформлен!</b>\n\n"
-        f"Номер заказа: #{user_id}{len(cart)}\n"
+        f"Номер заказа: {order_number}\n"
         f"Сумма: {total}₽\n"
-        f"Товаров: {len(cart)}\n\n"
+        f"Товаров: {count}\n\n"
         f"Администратор свяжется с вами для уточнения деталей.\n"
         f"Спасибо за покупку! 🛍",
         reply_markup=keyboard,
@@ -0,0 +1,50 @@
+from aiogram import Router, types
+from aiogram.filters import Command
+import logging
+
+from keyboards.main_menu import BACK_TO_MENU_INLINE, HELP_TEXT, HOME_TEXT, MAIN_MENU_INLINE, WELCOME_TEXT
+from utils.callbacks import callbacks
+from utils.logging_setup import SAMPLED
+from utils.screens import show_screen
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+
+# ================== ГЛАВНОЕ МЕНЮ НА КНОПКАХ ==================
+# Единый обработчик реагирует на команды /start, /help, /menu
+@router.message(Command("start", "help", "menu"))
+async def unified_menu_handler(message: types.Message):
+    """ЕДИНЫЙ ОБРАБОТЧИК ГЛАВНОГО МЕНЮ (заменяет старые cmd_start и cmd_help)"""
+
+    # Отправляем сообщение с клавиатурой
+    await message.answer(WELCOME_TEXT, reply_markup=MAIN_MENU_INLINE, parse_mode="HTML")
+    logger.debug("📱 Пользователь %s открыл главное меню", message.from_user.id, extra=SAMPLED)
+
+
+# ================== ОБРАБОТЧИКИ КНОПОК МЕНЮ ==================
+@callbacks.action("go_home")
+async def go_home_handler(callback: types.CallbackQuery):
+    """ОБРАБОТЧИК КНОПКИ 'ГЛАВНАЯ' - возврат в главное меню из любого раздела"""
+    # Редактируем существующее сообщение (меняем текст и кнопки)
+    # Из карточки с фото экран приходит новым сообщением
+    await show_screen(callback.message, HOME_TEXT, reply_markup=MAIN_MENU_INLINE)
+    await callback.answer()  # Убираем "часики" у кнопки
+    logger.debug("🔼 Пользователь %s вернулся в главное меню", callback.from_user.id, extra=SAMPLED)
+
+
+@callbacks.action("help_info")
+async def help_info_handler(callback: types.CallbackQuery):
+    """ОБРАБОТЧИК КНОПКИ 'ПОМОЩЬ' - показывает информацию о магазине"""
+    await callback.message.edit_text(HELP_TEXT, reply_markup=BACK_TO_MENU_INLINE, parse_mode="HTML")
+    await callback.answer()
+    logger.debug("❓ Пользователь %s открыл раздел помощи", callback.from_user.id, extra=SAMPLED)
+
+
+# ================== УСТАРЕВШИЕ КНОПКИ ==================
+# Сюда попадают кнопки, для которых в таблице нет маршрута
+@callbacks.fallback
+async def stale_button_handler(callback: types.CallbackQuery):
+    """Кнопка из старого сообщения, которую бот больше не знает"""
+    logger.info("🕸 Неизвестная кнопка %r от пользователя %s", callback.data, callback.from_user.id, extra=SAMPLED)
+    await callback.answer("Эта кнопка устарела. Откройте меню: /start", show_alert=False)
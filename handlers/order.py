@@ -1,10 +1,101 @@
 from aiogram import Router, types
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
+import logging
+
+from data.database import db
+from data.order_history import OrdersPage, order_history
+from handlers.products import cart_store, catalog
+from keyboards.order_keyboard import NEWER, orders_page_keyboard, orders_page_text
+from utils.callbacks import callbacks
 
 router = Router()
+logger = logging.getLogger(__name__)
 
 @router.message(Command("order"))
 async def cmd_order(message: types.Message):
     # Просто перенаправляем в корзину
     from handlers.cart import show_cart_handler
-    await show_cart_handler(message)
\ No newline at end of file
+    await show_cart_handler(message)
+
+
+# === ИСТОРИЯ ЗАКАЗОВ ===
+async def _show_orders_page(callback: types.CallbackQuery, page: OrdersPage):
+    try:
+        await callback.message.edit_text(
+            orders_page_text(page),
+            reply_markup=orders_page_keyboard(page),
+            parse_mode="HTML"
+        )
+    except TelegramBadRequest:
+        # Двойное нажатие: сообщение не изменилось
+        pass
+    await callback.answer()
+
+
+@callbacks.action("my_orders")
+async def my_orders_handler(callback: types.CallbackQuery):
+    """Первая страница истории (из кэша, пока нет новых заказов)"""
+    page = await order_history.first_page(callback.from_user.id)
+    await _show_orders_page(callback, page)
+
+
+@callbacks.action("orders_page")
+async def orders_page_handler(callback: types.CallbackQuery, args):
+    """Листание истории: args = (номер заказа-курсора, направление)"""
+    user_id = callback.from_user.id
+    try:
+        cursor, direction = int(args[0]), int(args[1])
+    except (IndexError, ValueError):
+        await my_orders_handler(callback)
+        return
+
+    if direction == NEWER:
+        page = await order_history.newer(user_id, cursor)
+        if not page.has_newer:
+            # Дошли до самых новых — показываем полную первую страницу
+            page = await order_history.first_page(user_id)
+    else:
+        page = await order_history.older(user_id, cursor)
+    await _show_orders_page(callback, page)
+
+
+# === ПОВТОР ЗАКАЗА ===
+@callbacks.action("repeat_order")
+async def repeat_order_handler(callback: types.CallbackQuery, args):
+    """Собирает корзину из позиций прошлого заказа по текущим ценам"""
+    from handlers.cart import show_cart_handler
+
+    user_id = callback.from_user.id
+    try:
+        order_id = int(args[0])
+    except (IndexError, ValueError):
+        await callback.answer("Заказ не найден", show_alert=True)
+        return
+
+    items = await db.fetch_order_items(order_id, user_id)
+    if not items:
+        await callback.answer("Заказ не найден", show_alert=True)
+        return
+
+    snapshot = catalog.snapshot
+    available = []
+    for product_id, _, qty, _ in items:
+        product = snapshot.get(product_id)
+        if product is not None:
+            available.append((product_id, product.price, qty))
+
+    if not available:
+        await callback.answer("Товаров из этого заказа больше нет в продаже", show_alert=True)
+        return
+
+    # Корзина заменяется целиком одной операцией
+    cart_store.replace(user_id, available)
+    await show_cart_handler(callback.message, user_id)
+
+    missing = len(items) - len(available)
+    if missing:
+        await callback.answer(f"Корзина собрана. Нет в продаже: {missing} поз.", show_alert=True)
+    else:
+        await callback.answer(f"Корзина собрана из заказа #{order_id}")
+    logger.info(f"🔁 Пользователь {user_id} повторил заказ #{order_id}")
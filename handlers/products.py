@@ -1,176 +1,274 @@
 from aiogram import Router, types
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
-from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+import asyncio
 import logging
+import os
+from typing import Optional
+
+from data.cart_store import CartStore
+from data.catalog import Catalog
+from data.database import TEST_PRODUCTS, db
+from keyboards.cache import markup_cache
+from keyboards.product_keyboard import added_to_cart_keyboard, catalog_keyboard, product_card
+from services.media import media_store
+from services.search import search_index
+from utils.callbacks import callbacks
+from utils.logging_setup import SAMPLED
+from utils.screens import show_screen
 
 router = Router()
 logger = logging.getLogger(__name__)
 
-# Товары
-products = [
-    {"id": 1, "name": "📱 iPhone 15", "price": 79900, "description": "Новый iPhone 15"},
-    {"id": 2, "name": "💻 MacBook Air", "price": 119900, "description": "Ноутбук Apple"},
-    {"id": 3, "name": "🎧 AirPods Pro", "price": 24900, "description": "Беспроводные наушники"},
-]
-
-# Временная корзина
-user_carts = {}
+# Товары (каталог с индексом по ID и версионными снимками).
+# При старте содержимое заменяется товарами из БД, см. load_catalog()
+catalog = Catalog(TEST_PRODUCTS)
+
+# Корзины: user_id -> Cart, неактивные удаляются по TTL, общее число ограничено (LRU)
+cart_store = CartStore(
+    ttl=float(os.getenv('CART_TTL', 24 * 3600)),
+    max_entries=int(os.getenv('CART_MAX_ENTRIES', 50_000))
+)
+
+# Товаров на одной странице каталога
+CATALOG_PAGE_SIZE = int(os.getenv('CATALOG_PAGE_SIZE', 8))
+
+
+async def load_catalog():
+    """Загружает каталог из БД (пустую БД заполняет тестовыми товарами)"""
+    products = await db.fetch_products()
+    if not products:
+        await db.save_products(TEST_PRODUCTS)
+        products = list(TEST_PRODUCTS)
+    # Версия из БД: кнопки, нарисованные до перезапуска, не считаются устаревшими
+    catalog.load(products, await db.fetch_catalog_version())
+    search_index.rebuild(catalog.snapshot)
+    logger.info(f"📦 Каталог загружен из БД: {len(catalog)} товаров")
+
+
+class CatalogWatcher:
+    """Перечитывает каталог, когда его изменил другой процесс (WORKERS > 1)"""
+
+    def __init__(self, interval: float = float(os.getenv('CATALOG_SYNC_INTERVAL', 2))):
+        self.interval = interval
+        # Больше изменений за раз — поиск перестраивается целиком (в потоке)
+        self.bulk_threshold = 500
+        self._seen = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._seen = await db.fetch_catalog_version()
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refresh(self, version: Optional[int] = None) -> None:
+        """Применяет изменения каталога из БД без полной перестройки поиска"""
+        products = await db.fetch_products()
+        current = catalog.snapshot.by_id
+        fresh = {product.id: product for product in products}
+        changed = [product for product in products if current.get(product.id) != product]
+        removed = [product_id for product_id in current if product_id not in fresh]
+        # Версия публикуется и без изменений товаров (новое фото): у всех
+        # воркеров она должна совпадать с БД
+        previous = catalog.version
+        catalog.load(products, version)
+        # Страницы прежней версии больше не запрашиваются, карточки — только изменённых товаров
+        if previous != catalog.version:
+            markup_cache.invalidate("catalog", previous)
+        for product_id in removed:
+            markup_cache.invalidate("product", product_id)
+        for product in changed:
+            markup_cache.invalidate("product", product.id)
+        if not changed and not removed:
+            return
+        if len(changed) + len(removed) > self.bulk_threshold:
+            # Массовая замена (save_products): индекс строится в потоке и подменяется целиком
+            await search_index.rebuild_in_thread(catalog.snapshot)
+        else:
+            for product_id in removed:
+                search_index.remove(product_id)
+            for product in changed:
+                search_index.add(product)
+        logger.info(f"📦 Каталог обновлён: изменено {len(changed)}, удалено {len(removed)}")
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                version = await db.fetch_catalog_version()
+                if version == self._seen:
+                    continue
+                self._seen = version
+                await self.refresh(version)
+                await media_store.load()
+            except Exception as e:
+                logger.error(f"❌ Не удалось обновить каталог: {e}")
+
+
+catalog_watcher = CatalogWatcher()
+
+
+def catalog_page(page: int = 0):
+    """Текст и клавиатура страницы каталога (клавиатура кэшируется по версии и странице)"""
+    snapshot = catalog.snapshot
+    pages = snapshot.page_count(CATALOG_PAGE_SIZE)
+    # Каталог мог уменьшиться с тех пор, как была нарисована кнопка
+    page = min(max(page, 0), pages - 1)
+    keyboard = markup_cache.get(
+        ("catalog", snapshot.version, page),
+        lambda: catalog_keyboard(snapshot, page, CATALOG_PAGE_SIZE)
+    )
+    text = "🏪 <b>Каталог товаров:</b>\n\nВыберите товар:"
+    if pages > 1:
+        text += f"\n\n<i>Страница {page + 1} из {pages}</i>"
+    return text, keyboard
 
 
 @router.message(Command("products"))
-async def show_products(message: types.Message):
+async def show_products(message: types.Message, page: int = 0):
     """Показать каталог товаров"""
-    logger.info(f"📦 Пользователь {message.from_user.id} запросил каталог")
+    logger.debug("📦 Пользователь %s запросил каталог", message.from_user.id, extra=SAMPLED)
 
-    # Создаем кнопки для каждого товара
-    keyboard_buttons = []
-
-    for product in products:
-        button = InlineKeyboardButton(
-            text=f"{product['name']} - {product['price']}₽",
-            callback_data=f"product_{product['id']}"
-        )
-        keyboard_buttons.append([button])
-
-    # Кнопки навигации - УЖЕ ЕСТЬ КНОПКА "ГЛАВНАЯ" ✅
-    keyboard_buttons.append([
-        InlineKeyboardButton(text="🛒 Корзина", callback_data="view_cart"),
-        InlineKeyboardButton(text="🏠 Главная", callback_data="go_home")
-    ])
-
-    keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
+    text, keyboard = catalog_page(page)
 
     await message.answer(
-        "🏪 <b>Каталог товаров:</b>\n\nВыберите товар:",
+        text,
         reply_markup=keyboard,
         parse_mode="HTML"
     )
 
 
-@router.callback_query(lambda c: c.data.startswith("product_"))
-async def show_product_detail(callback: types.CallbackQuery):
+@callbacks.action("catalog_page", legacy_prefix="catalog_page")
+async def turn_catalog_page(callback: types.CallbackQuery, args: tuple, version: int):
+    """Листание каталога: редактируем текущее сообщение"""
+    page = int(args[0]) if args else 0
+    text, keyboard = catalog_page(page)
+    try:
+        await show_screen(callback.message, text, reply_markup=keyboard)
+    except TelegramBadRequest:
+        # Нажата кнопка текущей страницы — сообщение не изменилось
+        pass
+    # Кнопка нарисована для старой версии каталога — страницы могли сдвинуться
+    if version and version != catalog.version:
+        await callback.answer("Каталог обновился")
+    else:
+        await callback.answer()
+
+
+@callbacks.action("product", legacy_prefix="product")
+async def show_product_detail(callback: types.CallbackQuery, args: tuple, version: int):
     """Показать детали товара"""
-    logger.info(f"🛍️ ВЫЗВАН обработчик show_product_detail с данными: {callback.data}")
+    logger.debug("🛍️ show_product_detail: %s", callback.data, extra=SAMPLED)
 
     try:
-        product_id = int(callback.data.split("_")[1])
-        logger.info(f"🆔 ID товара: {product_id}")
+        product_id = int(args[0])
+        # Страница каталога, с которой открыт товар (у старых кнопок её нет)
+        page = int(args[1]) if len(args) > 1 else 0
 
-        product = next((p for p in products if p["id"] == product_id), None)
+        product = catalog.get(product_id)
 
         if not product:
-            logger.error(f"❌ Товар с id {product_id} не найден")
+            if version and version != catalog.version:
+                # Кнопка из старого сообщения: товар сняли с продажи — показываем актуальный каталог
+                logger.info("🕸 Устаревшая кнопка товара %s (версия каталога %s)", product_id, version)
+                text, keyboard = catalog_page(page)
+                # Кнопка могла быть под фото товара — edit_text к нему неприменим
+                await show_screen(callback.message, text, reply_markup=keyboard)
+                await callback.answer("Этот товар больше не продаётся", show_alert=True)
+                return
+            logger.error("❌ Товар с id %s не найден", product_id)
             await callback.answer("Товар не найден", show_alert=True)
             return
 
-        logger.info(f"✅ Найден товар: {product['name']}")
-
-        # ВАЖНОЕ ИЗМЕНЕНИЕ: Добавляем кнопку "Главная" в детали товара
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="✅ Добавить в корзину",
-                                  callback_data=f"add_{product_id}")],
-            [
-                InlineKeyboardButton(text="🔙 Назад", callback_data="back_to_products"),
-                InlineKeyboardButton(text="🛒 Корзина", callback_data="view_cart")
-            ],
-            # НОВАЯ СТРОКА: Кнопка "Главная" для навигации
-            [InlineKeyboardButton(text="🏠 Главная", callback_data="go_home")]
-        ])
-
-        logger.info(f"📝 Редактирую сообщение для пользователя {callback.from_user.id}")
-
-        await callback.message.edit_text(
-            f"<b>{product['name']}</b>\n\n"
-            f"{product['description']}\n\n"
-            f"💰 Цена: <b>{product['price']}₽</b>",
-            reply_markup=keyboard,
-            parse_mode="HTML"
+        # Карточка товара кэшируется до изменения этого товара в админке
+        text, keyboard = markup_cache.get(
+            ("product", product_id, page), lambda: product_card(product, page)
         )
 
-        logger.info(f"✅ Сообщение отредактировано для товара {product_id}")
+        # Карточка с фото — новое сообщение (по file_id, без повторной загрузки файла);
+        # список каталога с кнопками удаляем, чтобы в чате был один экран
+        if media_store.has_photo(product_id) and not callback.message.photo:
+            sent = await media_store.send_card(callback.message, product_id, text, keyboard)
+            if sent is not None:
+                try:
+                    await callback.message.delete()
+                except TelegramBadRequest:
+                    pass
+                await callback.answer()
+                return
+
+        await show_screen(callback.message, text, reply_markup=keyboard)
 
         await callback.answer()
 
     except Exception as e:
-        logger.error(f"💥 КРИТИЧЕСКАЯ ОШИБКА в show_product_detail: {e}", exc_info=True)
+        logger.error("💥 КРИТИЧЕСКАЯ ОШИБКА в show_product_detail: %s", e, exc_info=True)
         await callback.answer("Ошибка при загрузке товара", show_alert=True)
 
 
-@router.callback_query(lambda c: c.data == "show_catalog")
+@callbacks.action("show_catalog")
 async def callback_show_catalog(callback: types.CallbackQuery):
     """Обработчик кнопки 'Каталог товаров' из главного меню"""
-    logger.info(f"📱 Пользователь {callback.from_user.id} открыл каталог через кнопку")
+    logger.debug("📱 Пользователь %s открыл каталог через кнопку", callback.from_user.id, extra=SAMPLED)
     await show_products(callback.message)
     await callback.answer()
 
 
-@router.callback_query(lambda c: c.data.startswith("add_"))
-async def add_to_cart(callback: types.CallbackQuery):
+@callbacks.action("add", legacy_prefix="add")
+async def add_to_cart(callback: types.CallbackQuery, args: tuple):
     """Добавить товар в корзину"""
-    logger.info(f"🛒 ВЫЗВАН обработчик add_to_cart с данными: {callback.data}")
+    logger.debug("🛒 add_to_cart: %s", callback.data, extra=SAMPLED)
 
     try:
-        product_id = int(callback.data.split("_")[1])
-        product = next((p for p in products if p["id"] == product_id), None)
+        product_id = int(args[0])
+        page = int(args[1]) if len(args) > 1 else 0
+        product = catalog.get(product_id)
 
         if not product:
-            logger.error(f"❌ Товар с id {product_id} не найден при добавлении в корзину")
+            logger.error("❌ Товар с id %s не найден при добавлении в корзину", product_id)
             await callback.answer("Товар не найден", show_alert=True)
             return
 
         user_id = callback.from_user.id
-        logger.info(f"👤 Добавляем товар для пользователя {user_id}")
-
-        # Инициализируем корзину
-        if user_id not in user_carts:
-            user_carts[user_id] = []
-            logger.info(f"🆕 Создана новая корзина для пользователя {user_id}")
-
-        # Добавляем товар
-        user_carts[user_id].append(product)
-
-        # Подсчет
-        cart_count = len(user_carts[user_id])
-        total_price = sum(item['price'] for item in user_carts[user_id])
-
-        logger.info(f"✅ Товар добавлен. В корзине: {cart_count} товаров на {total_price}₽")
-
-        # ВАЖНОЕ ИЗМЕНЕНИЕ: Добавляем кнопку "Главная" при добавлении в корзину
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="🛒 Перейти в корзину", callback_data="view_cart")],
-            [
-                InlineKeyboardButton(text="🔙 Продолжить покупки", callback_data="back_to_products"),
-                InlineKeyboardButton(text="🏠 Главная", callback_data="go_home")
-            ]
-        ])
-
-        await callback.message.edit_text(
-            f"✅ <b>{product['name']}</b> добавлен в корзину!\n\n"
-            f"💰 Цена: {product['price']}₽\n"
+        # Добавляем товар (повторное нажатие увеличивает количество)
+        cart = cart_store.add_item(user_id, product.id, product.price)
+
+        # Итоги корзина хранит сама
+        cart_count = cart.count
+        total_price = cart.total
+
+        logger.debug("✅ Пользователь %s: товар %s добавлен, в корзине %s шт. на %s₽",
+                     user_id, product_id, cart_count, total_price, extra=SAMPLED)
+
+        # Под фото товара меняется только подпись
+        await show_screen(
+            callback.message,
+            f"✅ <b>{product.name}</b> добавлен в корзину!\n\n"
+            f"💰 Цена: {product.price}₽\n"
             f"🛍 В корзине: {cart_count} товар(ов) на {total_price}₽",
-            reply_markup=keyboard,
-            parse_mode="HTML"
+            reply_markup=markup_cache.get(("added", page), lambda: added_to_cart_keyboard(page)),
+            keep_photo=True
         )
 
         await callback.answer("Товар добавлен!")
 
     except Exception as e:
-        logger.error(f"❌ Ошибка в add_to_cart: {e}", exc_info=True)
+        logger.error("❌ Ошибка в add_to_cart: %s", e, exc_info=True)
         await callback.answer("Ошибка при добавлении в корзину", show_alert=True)
 
 
-@router.callback_query(lambda c: c.data == "back_to_products")
+@callbacks.action("back_to_products")
 async def back_to_products(callback: types.CallbackQuery):
     """Вернуться к каталогу"""
-    logger.info(f"🔙 Возврат в каталог от пользователя {callback.from_user.id}")
+    logger.debug("🔙 Возврат в каталог от пользователя %s", callback.from_user.id, extra=SAMPLED)
     await show_products(callback.message)
     await callback.answer()
-
-
-@router.callback_query(lambda c: c.data == "view_cart")
-async def view_cart(callback: types.CallbackQuery):
-    """Показать корзину"""
-    logger.info(f"🛒 Показ корзины для пользователя {callback.from_user.id}")
-    from handlers.cart import show_cart_handler
-    await show_cart_handler(callback.message, callback.from_user.id)
-    await callback.answer()
\ No newline at end of file
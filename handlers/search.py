@@ -0,0 +1,76 @@
+from aiogram import Bot, F, Router, types
+from aiogram.filters import CommandObject, CommandStart
+import logging
+
+from handlers.products import catalog
+from keyboards.cache import markup_cache
+from keyboards.product_keyboard import product_card
+from services.media import media_store
+from services.search import search_index
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+# Telegram показывает не больше 50 результатов за раз, остальные — по next_offset
+INLINE_PAGE_SIZE = 50
+
+
+# === INLINE-ПОИСК: @bot iphone ===
+@router.inline_query()
+async def inline_search(inline_query: types.InlineQuery, bot: Bot):
+    """Поиск товаров по названию и описанию прямо из строки ввода"""
+    query = inline_query.query.strip()
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+
+    snapshot = catalog.snapshot
+    if query:
+        found = search_index.search(query)
+    else:
+        # Пустой запрос — первые товары каталога
+        found = tuple(p.id for p in snapshot.page(0, INLINE_PAGE_SIZE))
+    page = found[offset:offset + INLINE_PAGE_SIZE]
+
+    me = await bot.me()
+    results = []
+    for product_id in page:
+        product = snapshot.get(product_id)
+        if product is None:
+            continue
+        results.append(types.InlineQueryResultArticle(
+            id=str(product.id),
+            title=product.name,
+            description=f"{product.price}₽ · {product.description}",
+            thumbnail_url=media_store.thumb_url(product.id),
+            input_message_content=types.InputTextMessageContent(
+                message_text=f"<b>{product.name}</b>\n\n{product.description}\n\n💰 Цена: <b>{product.price}₽</b>",
+                parse_mode="HTML"
+            ),
+            reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
+                types.InlineKeyboardButton(text="🛍 Купить в боте",
+                                           url=f"https://t.me/{me.username}?start=p{product.id}")
+            ]])
+        ))
+
+    next_offset = str(offset + INLINE_PAGE_SIZE) if offset + INLINE_PAGE_SIZE < len(found) else ""
+    await inline_query.answer(
+        results,
+        cache_time=30,
+        is_personal=False,
+        next_offset=next_offset,
+        button=types.InlineQueryResultsButton(text="🛒 Открыть каталог", start_parameter="catalog")
+    )
+
+
+# === ССЫЛКА ИЗ РЕЗУЛЬТАТА ПОИСКА: /start p15 ===
+@router.message(CommandStart(deep_link=True, magic=F.args.regexp(r'^p\d+$')))
+async def start_from_search(message: types.Message, command: CommandObject):
+    """Открывает карточку товара, найденного через inline-поиск"""
+    product_id = int(command.args[1:])
+    product = catalog.get(product_id)
+    if product is None:
+        await message.answer("Этот товар больше не продаётся. Откройте каталог: /products")
+        return
+
+    text, keyboard = markup_cache.get(("product", product_id, 0), lambda: product_card(product, 0))
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+    logger.info(f"🔎 Пользователь {message.from_user.id} открыл товар {product_id} из поиска")
@@ -0,0 +1,21 @@
+# keyboards/admin_keyboard.py
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from utils.callbacks import callback_data
+
+# Подтверждение рассылки после предпросмотра текста
+BROADCAST_CONFIRM_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="✅ Отправить всем", callback_data=callback_data("admin_broadcast_confirm"))],
+    [InlineKeyboardButton(text="❌ Отмена", callback_data=callback_data("admin_cancel"))]
+])
+
+
+def broadcast_progress_keyboard(broadcast_id: int, running: bool) -> InlineKeyboardMarkup:
+    """Кнопки под сообщением с прогрессом рассылки"""
+    rows = [[InlineKeyboardButton(text="🔄 Обновить",
+                                  callback_data=callback_data("admin_broadcast_status", broadcast_id))]]
+    if running:
+        rows.append([InlineKeyboardButton(text="⏹ Остановить",
+                                          callback_data=callback_data("admin_broadcast_stop", broadcast_id))])
+    rows.append([InlineKeyboardButton(text="🏠 В главное меню", callback_data=callback_data("go_home"))])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
@@ -0,0 +1,66 @@
+# keyboards/cache.py
+"""Кэш готовых клавиатур и текстов экранов.
+
+Ключ — кортеж, первый элемент которого название экрана: ("catalog", version),
+("product", product_id). Инвалидация по экрану (и, при необходимости, по
+аргументам) удаляет только затронутые записи.
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Set, Tuple
+
+Key = Tuple[Hashable, ...]
+
+
+class MarkupCache:
+    """LRU-кэш клавиатур, сгруппированный по экранам"""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Key, Any]" = OrderedDict()
+        self._by_screen: Dict[Hashable, Set[Key]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Key, build: Callable[[], Any]) -> Any:
+        """Возвращает закэшированное значение или строит его через build()"""
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            value = self._entries[key] = build()
+            self._by_screen.setdefault(key[0], set()).add(key)
+            if len(self._entries) > self.max_entries:
+                self._forget(next(iter(self._entries)))
+            return value
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def invalidate(self, screen: Hashable, *args: Hashable) -> int:
+        """Удаляет записи экрана; с args — только записи с таким началом ключа"""
+        keys = self._by_screen.get(screen)
+        if not keys:
+            return 0
+        prefix = (screen,) + args
+        stale = [key for key in keys if key[:len(prefix)] == prefix]
+        for key in stale:
+            self._forget(key)
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_screen.clear()
+
+    def _forget(self, key: Key) -> None:
+        self._entries.pop(key, None)
+        keys = self._by_screen.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_screen[key[0]]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+markup_cache = MarkupCache()
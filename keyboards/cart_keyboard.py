@@ -0,0 +1,26 @@
+# keyboards/cart_keyboard.py
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from utils.callbacks import callback_data
+
+# Клавиатуры корзины не зависят от пользователя — собираем их один раз
+
+# Пустая корзина, очищенная корзина, оформленный заказ
+CART_EXIT_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="🛍 В каталог", callback_data=callback_data("back_to_products"))],
+    [InlineKeyboardButton(text="🏠 Главная", callback_data=callback_data("go_home"))]
+])
+
+CART_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="🗑 Очистить корзину", callback_data=callback_data("clear_cart"))],
+    [InlineKeyboardButton(text="✅ Оформить заказ", callback_data=callback_data("create_order"))],
+    [
+        InlineKeyboardButton(text="🛍 В каталог", callback_data=callback_data("back_to_products")),
+        InlineKeyboardButton(text="🏠 Главная", callback_data=callback_data("go_home"))
+    ]
+])
+
+CHECKOUT_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="✅ Подтвердить заказ", callback_data=callback_data("confirm_order"))],
+    [InlineKeyboardButton(text="🔙 Назад в корзину", callback_data=callback_data("view_cart"))]
+])
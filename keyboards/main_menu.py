@@ -1,4 +1,8 @@
-from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
+from aiogram.types import (
+    InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
+)
+
+from utils.callbacks import callback_data
 
 def main_menu_keyboard():
     keyboard = ReplyKeyboardMarkup(
@@ -10,4 +14,48 @@ def main_menu_keyboard():
         resize_keyboard=True,
         input_field_placeholder="Выберите действие"
     )
-    return keyboard
\ No newline at end of file
+    return keyboard
+
+# === ИНЛАЙН-МЕНЮ (собираются один раз при импорте) ===
+MAIN_MENU_INLINE = InlineKeyboardMarkup(inline_keyboard=[
+    # Ряд 1: Основные функции
+    [InlineKeyboardButton(text="🛒 Каталог товаров", callback_data=callback_data("show_catalog"))],
+    # Ряд 2: Вспомогательные функции
+    [InlineKeyboardButton(text="📦 Моя корзина", callback_data=callback_data("view_cart")),
+     InlineKeyboardButton(text="📝 Мои заказы", callback_data=callback_data("my_orders"))],
+    # Ряд 3: Информация
+    [InlineKeyboardButton(text="❓ Помощь / О нас", callback_data=callback_data("help_info"))]
+])
+
+BACK_TO_MENU_INLINE = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="⬅️ Назад в меню", callback_data=callback_data("go_home"))]
+])
+
+MENU_ITEMS_TEXT = (
+    "🎯 <b>Выберите действие:</b>\n\n"
+    "• <b>🛒 Каталог</b> — выбор товаров по категориям\n"
+    "• <b>📦 Корзина</b> — просмотр и оформление заказа\n"
+    "• <b>📝 Мои заказы</b> — история ваших покупок\n"
+    "• <b>❓ Помощь</b> — информация о доставке и оплате"
+)
+
+WELCOME_TEXT = (
+    "🏪 <b>Добро пожаловать в магазин электроники FN-Tech!</b>\n\n"
+    + MENU_ITEMS_TEXT +
+    "\n\n✨ <i>Просто нажмите на нужную кнопку!</i>"
+)
+
+HOME_TEXT = "🏪 <b>Главное меню</b>\n\n" + MENU_ITEMS_TEXT
+
+HELP_TEXT = (
+    "❓ <b>Помощь и информация</b>\n\n"
+    "🛒 <b>Как сделать заказ:</b>\n"
+    "1. Перейдите в <b>Каталог товаров</b>\n"
+    "2. Выберите товар и добавьте в корзину\n"
+    "3. Перейдите в <b>Корзину</b> для оформления\n\n"
+    "💰 <b>Оплата:</b> Предоплата 100% переводом на карту\n\n"
+    "🚚 <b>Доставка:</b> По Хабаровску — бесплатно, в регионы — по тарифам ТК\n\n"
+    "⏰ <b>Часы работы:</b> Ежедневно с 9:00 до 21:00\n\n"
+    "📞 <b>Контакты:</b> @nicholasbiz (основной канал связи)\n\n"
+    "🔧 <b>Техподдержка:</b> Если что-то не работает, напишите нам!"
+)
@@ -0,0 +1,58 @@
+# keyboards/order_keyboard.py
+import time
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from data.order_history import OrdersPage
+from utils.callbacks import callback_data
+
+STATUS_TITLES = {
+    'new': '🆕 новый',
+    'processing': '⚙️ в работе',
+    'done': '✅ выполнен',
+    'cancelled': '❌ отменён',
+}
+
+# Направление листания истории
+OLDER, NEWER = 0, 1
+
+
+def orders_page_text(page: OrdersPage) -> str:
+    if not page.orders:
+        return (
+            "📝 <b>Мои заказы</b>\n\n"
+            "У вас пока нет заказов.\n"
+            "Загляните в каталог! 🛍"
+        )
+    lines = []
+    for order in page.orders:
+        date = time.strftime('%d.%m.%Y', time.localtime(order.created_at)) if order.created_at else '—'
+        status = STATUS_TITLES.get(order.status, order.status)
+        lines.append(f"<b>#{order.id}</b> · {date} · {order.count} шт. · {order.total}₽ · {status}")
+    return "📝 <b>Мои заказы</b>\n\n" + "\n".join(lines)
+
+
+def orders_page_keyboard(page: OrdersPage) -> InlineKeyboardMarkup:
+    rows = []
+    buttons = [
+        InlineKeyboardButton(text=f"🔁 Повторить #{order.id}",
+                             callback_data=callback_data("repeat_order", order.id))
+        for order in page.orders
+    ]
+    # По две кнопки «повторить» в ряд
+    rows.extend(buttons[i:i + 2] for i in range(0, len(buttons), 2))
+
+    nav = []
+    if page.has_newer:
+        nav.append(InlineKeyboardButton(text="⬅️ Новее",
+                                        callback_data=callback_data("orders_page", page.first_id, NEWER)))
+    if page.has_older:
+        nav.append(InlineKeyboardButton(text="Старше ➡️",
+                                        callback_data=callback_data("orders_page", page.last_id, OLDER)))
+    if nav:
+        rows.append(nav)
+
+    if not page.orders:
+        rows.append([InlineKeyboardButton(text="🛍 В каталог", callback_data=callback_data("show_catalog"))])
+    rows.append([InlineKeyboardButton(text="⬅️ Назад в меню", callback_data=callback_data("go_home"))])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
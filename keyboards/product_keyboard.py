@@ -1,6 +1,8 @@
 # keyboards/product_keyboards.py
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
+from utils.callbacks import callback_data
+
 def create_product_keyboard(product_id: str) -> InlineKeyboardMarkup:
     """Клавиатура для товара"""
     return InlineKeyboardMarkup(
@@ -8,17 +10,17 @@ def create_product_keyboard(product_id: str) -> InlineKeyboardMarkup:
             [
                 InlineKeyboardButton(
                     text="🛒 Добавить в корзину",
-                    callback_data=f"add_to_cart_{product_id}"
+                    callback_data=callback_data("add", int(product_id))
                 )
             ],
             [
                 InlineKeyboardButton(
                     text="⬅️ Назад к каталогу",
-                    callback_data="catalog"
+                    callback_data=callback_data("back_to_products")
                 ),
                 InlineKeyboardButton(
                     text="🏠 В главное меню",
-                    callback_data="back_to_start"
+                    callback_data=callback_data("go_home")
                 )
             ]
         ]
@@ -31,14 +33,77 @@ def buy_keyboard(product_id: str) -> InlineKeyboardMarkup:
             [
                 InlineKeyboardButton(
                     text="💰 Купить сейчас",
-                    callback_data=f"buy_now_{product_id}"
+                    callback_data=callback_data("add", int(product_id))
                 )
             ],
             [
                 InlineKeyboardButton(
                     text="⬅️ Назад",
-                    callback_data=f"product_{product_id}"
+                    callback_data=callback_data("product", int(product_id))
                 )
             ]
         ]
-    )
\ No newline at end of file
+    )
+
+# === КАТАЛОГ (используются handlers/products.py через markup_cache) ===
+def catalog_keyboard(snapshot, page: int, page_size: int) -> InlineKeyboardMarkup:
+    """Клавиатура одной страницы каталога для конкретной версии каталога"""
+    keyboard_buttons = [
+        [InlineKeyboardButton(
+            text=f"{product.name} - {product.price}₽",
+            callback_data=callback_data("product", product.id, page, version=snapshot.version)
+        )]
+        for product in snapshot.page(page, page_size)
+    ]
+
+    # Листание страниц
+    pages = snapshot.page_count(page_size)
+    if pages > 1:
+        def page_button(text: str, number: int) -> InlineKeyboardButton:
+            return InlineKeyboardButton(
+                text=text, callback_data=callback_data("catalog_page", number, version=snapshot.version)
+            )
+
+        nav_row = []
+        if page > 0:
+            nav_row.append(page_button("⬅️", page - 1))
+        nav_row.append(page_button(f"{page + 1}/{pages}", page))
+        if page < pages - 1:
+            nav_row.append(page_button("➡️", page + 1))
+        keyboard_buttons.append(nav_row)
+
+    # Кнопки навигации
+    keyboard_buttons.append([
+        InlineKeyboardButton(text="🛒 Корзина", callback_data=callback_data("view_cart")),
+        InlineKeyboardButton(text="🏠 Главная", callback_data=callback_data("go_home"))
+    ])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
+
+
+def product_card(product, page: int = 0):
+    """Текст и клавиатура карточки товара; «Назад» ведёт на страницу каталога page"""
+    text = (
+        f"<b>{product.name}</b>\n\n"
+        f"{product.description}\n\n"
+        f"💰 Цена: <b>{product.price}₽</b>"
+    )
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="✅ Добавить в корзину",
+                              callback_data=callback_data("add", product.id, page))],
+        [
+            InlineKeyboardButton(text="🔙 Назад", callback_data=callback_data("catalog_page", page)),
+            InlineKeyboardButton(text="🛒 Корзина", callback_data=callback_data("view_cart"))
+        ],
+        [InlineKeyboardButton(text="🏠 Главная", callback_data=callback_data("go_home"))]
+    ])
+    return text, keyboard
+
+
+def added_to_cart_keyboard(page: int = 0) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🛒 Перейти в корзину", callback_data=callback_data("view_cart"))],
+        [
+            InlineKeyboardButton(text="🔙 Продолжить покупки", callback_data=callback_data("catalog_page", page)),
+            InlineKeyboardButton(text="🏠 Главная", callback_data=callback_data("go_home"))
+        ]
+    ])
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+# loadtest.py
+"""Нагрузочный тест без сети: настоящий диспетчер из main.py и синтетические апдейты.
+
+Диспетчер собирается так же, как в main.py (build_dispatcher +
+setup_global_handlers + хуки старта), но бот работает через FakeSession:
+запросы к Bot API не уходят в сеть, а записываются и отвечают с заданной
+задержкой. БД, FSM, журнал корзин и картинки — во временной папке.
+
+Сценарии:
+  * покупатель: /start → каталог → 1–3 товара (часть — в корзину)
+    → корзина → оформление и подтверждение заказа (с вероятностью --orders);
+  * админ: /admin → «Добавить товар» → название → описание → цена →
+    фото (с --photo: бот скачивает его через FakeSession) или /skip.
+
+Отчёт: пропускная способность (апдейтов в секунду), p50/p95/p99 по
+каждому хендлеру, вызовы API и прирост памяти (tracemalloc).
+
+Запуск:
+    python loadtest.py --users 500 --concurrency 100 --latency 0.05
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+import typing
+from collections import Counter, defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+BOT_ID = 42
+BOT_TOKEN = f'{BOT_ID}:LOADTEST'
+# ID синтетических пользователей не пересекаются с настоящими
+USER_ID_BASE = 9_000_000_000
+ADMIN_ID_BASE = 9_100_000_000
+
+Step = Tuple[str, Any]  # (название шага, Update)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота без сети")
+    parser.add_argument('--users', type=int, default=200, help="сессий покупателей")
+    parser.add_argument('--admins', type=int, default=2, help="сессий админа (добавление товара)")
+    parser.add_argument('--concurrency', type=int, default=50, help="одновременных сессий")
+    parser.add_argument('--latency', type=float, default=0.03, help="задержка ответа Bot API, с")
+    parser.add_argument('--jitter', type=float, default=0.5, help="разброс задержки, доля от --latency")
+    parser.add_argument('--think', type=float, default=0.0, help="пауза пользователя между шагами, с")
+    parser.add_argument('--orders', type=float, default=0.5, help="доля покупателей, оформляющих заказ")
+    parser.add_argument('--telegram-limits', action='store_true',
+                        help="оставить лимиты Telegram (1 сообщение в секунду в чат и общий лимит)")
+    parser.add_argument('--no-tracemalloc', action='store_true',
+                        help="не считать память (tracemalloc замедляет обработку)")
+    parser.add_argument('--photo', help="картинка, которую админ присылает как фото товара "
+                                        "(без неё мастер завершается /skip)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workdir', help="папка для БД и файлов (по умолчанию временная, "
+                                          "удаляется после прогона)")
+    args = parser.parse_args(argv)
+    if args.photo is not None and not os.path.isfile(args.photo):
+        parser.error(f"--photo: файл не найден: {args.photo}")
+    return args
+
+
+def prepare_environment(args: argparse.Namespace) -> str:
+    """Окружение до импорта main.py: модули читают пути и уровни логов при импорте"""
+    workdir = args.workdir or tempfile.mkdtemp(prefix='shop-loadtest-')
+    os.makedirs(workdir, exist_ok=True)
+    paths = {
+        'DB_PATH': 'shop.db',
+        'FSM_DB_PATH': 'shop.db',
+        'CART_JOURNAL_PATH': 'carts',
+        'ORDERS_SPOOL_PATH': 'orders.pending',
+        'IMAGES_DIR': 'images',
+    }
+    for name, filename in paths.items():
+        os.environ[name] = os.path.join(workdir, filename)
+    os.environ['BOT_TOKEN'] = BOT_TOKEN
+    os.environ.pop('TELEGRAM_API_URL', None)
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    if not args.telegram_limits:
+        # Общий лимит читается при импорте; лимиты чатов снимает lift_telegram_limits
+        os.environ['TG_GLOBAL_RATE'] = '1e9'
+    return workdir
+
+
+# === ФЕЙКОВАЯ СЕССИЯ BOT API ===
+def _returns_message(returning: Any) -> bool:
+    from aiogram.types import Message
+
+    return returning is Message or Message in typing.get_args(returning)
+
+
+def make_fake_session(latency: float, jitter: float, seed: int, photo: Optional[str] = None):
+    """Сессия, которая не ходит в сеть: отвечает правдоподобно и считает вызовы.
+
+    Любой файл, который бот скачивает (getFile + загрузка), — это photo.
+    """
+    from aiogram.client.session.base import BaseSession
+    from aiogram.exceptions import TelegramNotFound
+    from aiogram.methods import GetFile, GetMe
+    from aiogram.types import File, Message, User
+
+    class FakeSession(BaseSession):
+        def __init__(self):
+            super().__init__()
+            self.latency = latency
+            self.jitter = jitter
+            self.calls: Counter = Counter()
+            self._random = random.Random(seed)
+            self._message_ids = itertools.count(1_000_000)
+
+        async def make_request(self, bot, method, timeout=None):
+            self.calls[method.__api_method__] += 1
+            if self.latency:
+                spread = self.jitter * (2 * self._random.random() - 1)
+                await asyncio.sleep(max(0.0, self.latency * (1 + spread)))
+            return self._result(bot, method)
+
+        def _result(self, bot, method):
+            if isinstance(method, GetMe):
+                return User(id=BOT_ID, is_bot=True, first_name='Loadtest', username='loadtest_bot')
+            if isinstance(method, GetFile):
+                if photo is None:
+                    raise TelegramNotFound(method, "Bad Request: file not found")
+                return File(file_id=method.file_id, file_unique_id=method.file_id,
+                            file_size=os.path.getsize(photo), file_path=f'photos/{method.file_id}.jpg')
+            if _returns_message(method.__returning__):
+                chat_id = getattr(method, 'chat_id', None) or BOT_ID
+                return Message.model_validate({
+                    'message_id': getattr(method, 'message_id', None) or next(self._message_ids),
+                    'date': int(time.time()),
+                    'chat': {'id': int(chat_id), 'type': 'private'},
+                    'from': {'id': BOT_ID, 'is_bot': True, 'first_name': 'Loadtest'},
+                    'text': getattr(method, 'text', None) or getattr(method, 'caption', None) or '',
+                }, context={'bot': bot})
+            # answerCallbackQuery, deleteMessage, setMyCommands и прочее — bool
+            return True
+
+        async def close(self):
+            pass
+
+        async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536,
+                                 raise_for_status=True):
+            # getFile без --photo уже ответил ошибкой, сюда доходят только скачивания photo
+            self.calls['download'] += 1
+            with open(photo, 'rb') as f:
+                while chunk := f.read(chunk_size):
+                    yield chunk
+
+    return FakeSession()
+
+
+def lift_telegram_limits(bot) -> None:
+    """Снимает лимиты чатов в планировщике отправок: меряем бота, а не лимиты Telegram"""
+    from middlewares.rate_limit import RateLimitMiddleware
+
+    for middleware in bot.session.middleware:
+        if isinstance(middleware, RateLimitMiddleware):
+            scheduler = middleware.scheduler
+            scheduler.chat_rate = scheduler.group_rate = scheduler.chat_burst = float('inf')
+
+
+# === СИНТЕТИЧЕСКИЕ АПДЕЙТЫ ===
+class UpdateFactory:
+    """Апдейты в том виде, в каком их присылает Telegram"""
+
+    def __init__(self, bot, catalog_version: int):
+        self.bot = bot
+        self.catalog_version = catalog_version
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    def _validate(self, raw: Dict[str, Any]):
+        from aiogram.types import Update
+
+        raw['update_id'] = next(self._update_ids)
+        return Update.model_validate(raw, context={'bot': self.bot})
+
+    @staticmethod
+    def _user(user_id: int) -> Dict[str, Any]:
+        return {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id % 100_000}'}
+
+    def message(self, user_id: int, text: str):
+        message = self._message(user_id)
+        message['text'] = text
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        return self._validate({'message': message})
+
+    def photo(self, user_id: int):
+        message = self._message(user_id)
+        file_id = f'loadtest-photo-{message["message_id"]}'
+        message['photo'] = [{'file_id': file_id, 'file_unique_id': file_id, 'width': 800, 'height': 800}]
+        return self._validate({'message': message})
+
+    def _message(self, user_id: int) -> Dict[str, Any]:
+        return {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': self._user(user_id),
+        }
+
+    def button(self, user_id: int, action: str, *args: int, versioned: bool = False):
+        from utils.callbacks import callback_data
+
+        version = self.catalog_version if versioned else 0
+        message_id = next(self._message_ids)
+        return self._validate({'callback_query': {
+            'id': f'{user_id}-{message_id}',
+            'from': self._user(user_id),
+            'chat_instance': str(user_id),
+            'data': callback_data(action, *args, version=version),
+            # Сообщение бота, под которым нажата кнопка
+            'message': {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': {'id': BOT_ID, 'is_bot': True, 'first_name': 'Loadtest'},
+                'text': 'экран бота',
+            },
+        }})
+
+
+def shopper_session(factory: UpdateFactory, user_id: int, product_ids: List[int],
+                    rng: random.Random, order_share: float) -> List[Step]:
+    steps: List[Step] = [
+        ('/start', factory.message(user_id, '/start')),
+        ('show_catalog', factory.button(user_id, 'show_catalog')),
+    ]
+    added = False
+    for product_id in rng.sample(product_ids, min(len(product_ids), rng.randint(1, 3))):
+        steps.append(('product', factory.button(user_id, 'product', product_id, 0, versioned=True)))
+        if rng.random() < 0.7:
+            steps.append(('add', factory.button(user_id, 'add', product_id, 0, versioned=True)))
+            added = True
+    steps.append(('view_cart', factory.button(user_id, 'view_cart')))
+    if added and rng.random() < order_share:
+        steps.append(('create_order', factory.button(user_id, 'create_order')))
+        steps.append(('confirm_order', factory.button(user_id, 'confirm_order')))
+    return steps
+
+
+def admin_session(factory: UpdateFactory, admin_id: int, number: int, photo: bool) -> List[Step]:
+    if photo:
+        last = ('admin: фото', factory.photo(admin_id))
+    else:
+        last = ('admin: /skip', factory.message(admin_id, '/skip'))
+    return [
+        ('/admin', factory.message(admin_id, '/admin')),
+        ('admin_add_product', factory.button(admin_id, 'admin_add_product')),
+        ('admin: название', factory.message(admin_id, f'Нагрузочный товар {number}')),
+        ('admin: описание', factory.message(admin_id, 'Создан нагрузочным тестом')),
+        ('admin: цена', factory.message(admin_id, str(1000 + number))),
+        last,
+    ]
+
+
+# === ЗАМЕРЫ ===
+class HandlerTimings:
+    """Inner-middleware: время каждого вызова хендлера по имени (как в метриках бота)"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    async def __call__(self, handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+                       event: Any, data: Dict[str, Any]) -> Any:
+        from middlewares.metrics import handler_name
+
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.samples[handler_name(data)].append(time.perf_counter() - start)
+
+    def install(self, dp) -> None:
+        for name, observer in dp.observers.items():
+            if name not in ('update', 'error'):
+                observer.middleware(self)
+
+
+def percentile(values: List[float], share: float) -> float:
+    """Перцентиль по отсортированному списку"""
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+# === ПРОГОН ===
+async def run(args: argparse.Namespace) -> None:
+    import main as bot_main
+    from aiogram import Bot
+    from handlers.admin import ADMIN_IDS
+    from handlers.products import catalog
+
+    session = make_fake_session(args.latency, args.jitter, args.seed, args.photo)
+    bot = Bot(token=BOT_TOKEN, session=session)
+    dp = bot_main.build_dispatcher()
+    await bot_main.setup_global_handlers(dp, bot)
+    if not args.telegram_limits:
+        lift_telegram_limits(bot)
+    timings = HandlerTimings()
+    timings.install(dp)
+
+    admin_ids = [ADMIN_ID_BASE + index for index in range(args.admins)]
+    ADMIN_IDS.update(admin_ids)
+
+    await dp.emit_startup(bot=bot, dispatcher=dp, bots=[bot])
+    try:
+        # Апдейты собираются заранее — разбор JSON не входит в замер
+        rng = random.Random(args.seed)
+        factory = UpdateFactory(bot, catalog.version)
+        product_ids = [product.id for product in catalog]
+        sessions = [shopper_session(factory, USER_ID_BASE + index, product_ids, rng, args.orders)
+                    for index in range(args.users)]
+        sessions += [admin_session(factory, admin_id, number, args.photo is not None)
+                     for number, admin_id in enumerate(admin_ids)]
+        rng.shuffle(sessions)
+        total_updates = sum(len(steps) for steps in sessions)
+
+        if not args.no_tracemalloc:
+            tracemalloc.start()
+            memory_before = tracemalloc.take_snapshot()
+
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        errors: Counter = Counter()
+        pending = iter(sessions)
+
+        async def user_loop() -> None:
+            # Апдейты одного пользователя — по очереди, как их присылает Telegram
+            for steps in pending:
+                for label, update in steps:
+                    start = time.perf_counter()
+                    try:
+                        await dp.feed_update(bot, update)
+                    except Exception as e:
+                        errors[f"{label}: {type(e).__name__}"] += 1
+                    latencies[label].append(time.perf_counter() - start)
+                    if args.think:
+                        await asyncio.sleep(args.think)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user_loop() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        memory = None
+        if not args.no_tracemalloc:
+            memory_after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            # Замеры самого теста (списки задержек) в прирост не входят
+            own = [tracemalloc.Filter(False, __file__)]
+            diff = memory_after.filter_traces(own).compare_to(memory_before.filter_traces(own), 'lineno')
+            memory = (diff, current, peak)
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp, bots=[bot])
+        await bot.session.close()
+
+    report(args, total_updates, elapsed, timings.samples, latencies, errors, session.calls, memory)
+
+
+def _table(title: str, samples: Dict[str, List[float]]) -> None:
+    print(f"\n{title}")
+    print(f"  {'':<48} {'вызовов':>8} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'max, мс':>9}")
+    for name, values in sorted(samples.items(), key=lambda item: -sum(item[1])):
+        values = sorted(values)
+        row = [percentile(values, share) * 1000 for share in (0.5, 0.95, 0.99)] + [values[-1] * 1000]
+        print(f"  {name[-48:]:<48} {len(values):>8} " + ' '.join(f"{value:>9.2f}" for value in row))
+
+
+def report(args, total_updates, elapsed, handler_samples, latencies, errors, calls, memory) -> None:
+    print(f"\n📊 Нагрузочный тест: покупателей {args.users}, админов {args.admins}, "
+          f"одновременно {args.concurrency}, задержка API {args.latency * 1000:.0f} мс"
+          f"{', лимиты Telegram включены' if args.telegram_limits else ''}")
+    print(f"⏱ Апдейтов: {total_updates} за {elapsed:.2f} с — {total_updates / elapsed:.1f} апд/с")
+
+    _table("🧩 Хендлеры (время внутри хендлера, вместе с ожиданием API):", handler_samples)
+    _table("🔁 Апдейты по шагам сценария (feed_update целиком):", latencies)
+
+    print("\n📡 Вызовы Bot API: " + ', '.join(f"{name} {count}" for name, count in calls.most_common()))
+    if errors:
+        print("❌ Ошибки: " + ', '.join(f"{name} ×{count}" for name, count in errors.most_common()))
+
+    if memory is not None:
+        diff, current, peak = memory
+        growth = sum(stat.size_diff for stat in diff)
+        print(f"\n🧠 Память за прогон: {growth / 1024 / 1024:+.2f} МБ "
+              f"(сейчас {current / 1024 / 1024:.1f} МБ, пик {peak / 1024 / 1024:.1f} МБ)")
+        for stat in diff[:5]:
+            frame = stat.traceback[0]
+            print(f"  {stat.size_diff / 1024:+9.1f} КБ  {frame.filename}:{frame.lineno}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    workdir = prepare_environment(args)
+    try:
+        asyncio.run(run(args))
+    finally:
+        if args.workdir:
+            print(f"📁 Файлы прогона: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
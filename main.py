@@ -1,33 +1,86 @@
 import asyncio
 import logging
 import os
+import signal
 import sys
 import socket
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import time
+from contextlib import contextmanager
+from typing import List, Optional
 from dotenv import load_dotenv
-from handlers.admin import router as admin_router
 
+# Отсчёт времени старта — до тяжёлых импортов
+_STARTED = time.perf_counter()
+
+# .env загружаем до импорта модулей, которые читают окружение при импорте
 load_dotenv()
 
-from aiogram import Bot, Dispatcher, types
-from aiogram.filters import Command
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram import Bot, Dispatcher
 
 # ================== ИМПОРТ РОУТЕРОВ ==================
-# Существующие роутеры
-from handlers.products import router as products_router
+# Роутеры покупателя; админка и inline-поиск импортируются в build_dispatcher
+from handlers.products import router as products_router, cart_store, catalog_watcher, load_catalog
 from handlers.cart import router as cart_router
 from handlers.order import router as order_router
+from handlers.menu import router as menu_router
+from utils.callbacks import callbacks
+
+from data.cart_journal import CartJournal
+from data.cart_sync import CartSync
+from data.database import db
+from data.fsm_storage import SQLiteStorage
+from data.order_log import order_writer
+from data.users import user_registry
+from middlewares.inflight import InFlightMiddleware
+from middlewares.metrics import ApiMetricsMiddleware, setup_metrics
+from middlewares.rate_limit import GLOBAL_RATE, RateLimitMiddleware, SendScheduler
+from middlewares.users import UserTrackingMiddleware
+from services.broadcast import broadcaster
+from services.media import media_store
+from services.notifications import notifier
+
+from utils.health import health
+from utils.logging_setup import setup_logging
+from utils.metrics import registry as metrics
+from utils.shutdown import shutdown
+from utils import workers
 
 # ================== НАСТРОЙКА ЛОГИРОВАНИЯ ==================
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+# Запись логов идёт в фоновом потоке, формат и уровни — из окружения
+setup_logging()
 logger = logging.getLogger(__name__)
 
 
+# ================== ЗАМЕР ВРЕМЕНИ СТАРТА ==================
+class StartupTimer:
+    """Длительность этапов старта — одной строкой в лог, когда бот готов"""
+
+    def __init__(self, origin: float):
+        self.origin = origin
+        self.stages = []
+
+    def mark(self, name: str) -> None:
+        """Этап, начавшийся с момента запуска процесса (импорты)"""
+        self.stages.append((name, time.perf_counter() - self.origin))
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - start))
+
+    def report(self) -> None:
+        total = time.perf_counter() - self.origin
+        parts = ', '.join(f"{name} {seconds * 1000:.0f} мс" for name, seconds in self.stages)
+        logger.info(f"⏱ Готов к работе за {total:.2f} с: {parts}")
+
+
+startup_timer = StartupTimer(_STARTED)
+startup_timer.mark('импорты')
+
+
 # ================== ЗАЩИТА ОТ МНОЖЕСТВЕННОГО ЗАПУСКА ==================
 def check_single_instance():
     """Проверяем, что бот не запущен уже в другом процессе"""
@@ -45,66 +98,225 @@ def check_single_instance():
         return False
 
 
-# ================== ПРИНУДИТЕЛЬНОЕ ЗАВЕРШЕНИЕ СТАРЫХ СЕССИЙ ==================
-async def cleanup_old_sessions(bot_token: str):
-    """Принудительно завершаем все старые сессии бота"""
+# ================== БОТ ==================
+def create_bot(bot_token: str) -> Bot:
+    """Бот; TELEGRAM_API_URL — свой сервер Bot API (его же опрашивает фронт воркеров)"""
+    api_url = os.getenv('TELEGRAM_API_URL')
+    if not api_url:
+        return Bot(token=bot_token)
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    return Bot(token=bot_token, session=AiohttpSession(api=TelegramAPIServer.from_base(api_url)))
+
+
+# ================== ЗАПУСК И ОСТАНОВКА ХРАНИЛИЩ ==================
+# Корзины переживают перезапуск: в одном процессе — через журнал со
+# снапшотом, при нескольких воркерах — через общую таблицу carts
+cart_journal = CartJournal(cart_store)
+cart_sync = CartSync(cart_store, db)
+
+
+async def on_startup(bot: Bot):
+    """Схема БД и каталог загружаются до обработки первого апдейта"""
+    from handlers.admin import ADMIN_IDS
+
+    await health.start()
+    with startup_timer.stage('схема БД'):
+        await db.init()
+    shard = workers.current
+    sharded = shard.count > 1
+    # Дальше хранилища друг от друга не зависят — поднимаем их параллельно
+    with startup_timer.stage('хранилища'):
+        stores = [
+            load_catalog(),
+            media_store.load(),
+            order_writer.start(shard.index, shard.count),
+            cart_store.start(),
+            user_registry.start(),
+        ]
+        if sharded:
+            stores.append(cart_sync.start(shard.index, shard.count))
+            # Каталог перечитывается, когда его меняет другой воркер
+            stores.append(catalog_watcher.start())
+        else:
+            stores.append(cart_journal.start())
+        await asyncio.gather(*stores)
+    with startup_timer.stage('фоновые задачи'):
+        # Рассылки, прерванные перезапуском, продолжаются с контрольной точки
+        await asyncio.gather(
+            notifier.start(bot, ADMIN_IDS),
+            broadcaster.resume(bot, owns=shard.owns if sharded else None)
+        )
+    # С этого момента /ready отвечает 200
+    health.set_ready(True)
+
+
+async def on_shutdown():
+    """Апдейты в обработке уже завершены (первый хук остановки) — сбрасываем хранилища"""
+    # Платформа перестаёт слать трафик, пока идёт остановка
+    health.set_ready(False)
+    await broadcaster.close()
+    await notifier.close()
+    await catalog_watcher.stop()
+    await user_registry.stop()
+    await cart_sync.stop()
+    await cart_journal.stop()
+    await cart_store.stop()
+    await order_writer.close()
+    await media_store.close()
+    await db.close()
+    await health.stop()
+
+
+# ================== ГЛОБАЛЬНЫЕ MIDDLEWARE И МЕТРИКИ ==================
+async def setup_global_handlers(dp: Dispatcher, bot: Bot):
+    """Лимиты исходящих запросов и метрики (отдаются по /metrics)"""
+    # Все исходящие запросы идут через планировщик с лимитами Telegram;
+    # метрики API — внутри него, чтобы мерить сам запрос без ожидания очереди
+    # Глобальный лимит Telegram общий на бота — делим его между воркерами
+    rate_limiter = RateLimitMiddleware(SendScheduler(global_rate=GLOBAL_RATE / workers.current.count))
+    bot.session.middleware(rate_limiter)
+    bot.session.middleware(ApiMetricsMiddleware())
+
+    # Время по каждому хендлеру и число апдейтов по типам
+    setup_metrics(dp)
+
+    # Размеры хранилищ и очередей читаются в момент запроса /metrics
+    metrics.gauge('cart_store_entries', 'Корзин в памяти', callback=lambda: len(cart_store))
+    metrics.gauge('cart_store_bytes', 'Оценка памяти корзин', callback=lambda: cart_store.approx_bytes)
+    metrics.gauge('cart_journal_bytes', 'Размер журнала корзин после снапшота',
+                  callback=lambda: cart_journal.log_bytes)
+    metrics.gauge('order_writer_pending', 'Заказов в очереди на запись', callback=lambda: order_writer.pending)
+    metrics.gauge('admin_notifier_pending', 'Уведомлений админам в очереди', callback=lambda: notifier.pending)
+    metrics.gauge('send_queue_waiting', 'Запросов, ждущих глобальный лимит Telegram',
+                  callback=lambda: rate_limiter.scheduler.queued)
+    metrics.gauge('event_loop_lag_seconds', 'Задержка event loop за последние секунды',
+                  callback=lambda: health.lag)
+    metrics.gauge('broadcasts_running', 'Идущих рассылок',
+                  callback=lambda: sum(job.status == 'running' for job in broadcaster.jobs.values()))
+
+
+# ================== СБОРКА ДИСПЕТЧЕРА ==================
+def build_dispatcher() -> Dispatcher:
+    """Диспетчер со всеми роутерами, middleware и хуками старта"""
+    # Админка и inline-поиск нужны немногим — импортируются только здесь
+    from handlers.admin import router as admin_router
+    from handlers.search import router as search_router
+
+    # FSM-состояния (мастер добавления товара и т.п.) переживают перезапуск
+    # При нескольких воркерах каждый держит в памяти только своих пользователей
+    shard = workers.current
+    dp = Dispatcher(storage=SQLiteStorage(
+        os.getenv('FSM_DB_PATH', 'shop.db'), owns=shard.owns if shard.count > 1 else None
+    ))
+
+    # Апдейты в обработке — их дожидается плавная остановка
+    dp.update.outer_middleware(InFlightMiddleware())
+    # Все, кто писал боту, попадают в список получателей рассылок
+    dp.update.outer_middleware(UserTrackingMiddleware())
+
+    # Подключаем роутеры
+    # Все callback-кнопки маршрутизируются одной таблицей (O(1) по действию)
+    dp.include_router(callbacks.router)
+    dp.include_router(products_router)
+    dp.include_router(cart_router)
+    dp.include_router(order_router)
+    dp.include_router(admin_router)
+    # Раньше меню: /start с параметром из inline-поиска открывает товар
+    dp.include_router(search_router)
+    dp.include_router(menu_router)
+
+    # Дубли и перекрытия маршрутов видны в логах сразу при старте
+    callbacks.check(dp)
+
+    # БД, каталог и фоновая очистка неактивных корзин
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    # Первым хуком остановки дожидаемся апдейтов в обработке: aiogram
+    # регистрирует закрытие FSM раньше наших хуков, а апдейты ещё пишут в FSM
+    dp.shutdown.register(shutdown.drain)
+    dp.shutdown.handlers.insert(0, dp.shutdown.handlers.pop())
+    return dp
+
+
+# ================== НЕСКОЛЬКО ВОРКЕРОВ (WORKERS > 1) ==================
+def run_worker(index: int, count: int, updates, reports) -> None:
+    """Точка входа процесса-воркера: обрабатывает апдейты своего шарда"""
+    # Останавливает воркеры фронт: доработав очередь, воркер получает None
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    workers.set_current(workers.Shard(index, count))
     try:
-        logger.info("🔄 Очистка старых сессий бота...")
+        asyncio.run(worker_main(updates, reports))
+    except KeyboardInterrupt:
+        pass
 
-        # Создаем временного бота для очистки
-        temp_bot = Bot(token=bot_token)
 
-        # Удаляем вебхук (если был)
-        try:
-            await temp_bot.delete_webhook(drop_pending_updates=True)
-            logger.info("✅ Старые вебхуки удалены")
-        except Exception as e:
-            logger.warning(f"⚠️ Не удалось удалить вебхук: {e}")
+async def worker_main(updates, reports) -> None:
+    bot = create_bot(os.environ['BOT_TOKEN'])
+    dp = build_dispatcher()
+    await setup_global_handlers(dp, bot)
+    await dp.emit_startup(bot=bot, dispatcher=dp, bots=[bot])
+    logger.info(f"🧩 Воркер {workers.current.index} готов")
+    # Метрики хендлеров и Bot API пишутся здесь, а /metrics отдаёт фронт
+    reporter = asyncio.create_task(workers.report_metrics(reports, workers.current.index))
+    try:
+        await workers.consume(dp, bot, updates, drain_timeout=shutdown.timeout)
+    finally:
+        reporter.cancel()
+        # Хуки остановки сбрасывают хранилища, включая FSM
+        await dp.emit_shutdown(bot=bot, dispatcher=dp, bots=[bot])
+        await bot.session.close()
 
-        # Закрываем сессию
-        try:
-            await temp_bot.session.close()
-            logger.info("✅ Сессия закрыта")
-        except Exception as e:
-            logger.warning(f"⚠️ Не удалось закрыть сессию: {e}")
 
-        # Даем время на завершение
-        await asyncio.sleep(2)
+async def run_front(bot: Bot, bot_token: str, allowed_updates: List[str],
+                    webhook_base: Optional[str], is_render: bool, port: int):
+    """Фронт: получает апдейты и раздаёт их воркерам, сам их не обрабатывает"""
+    from utils.web_server import WEBHOOK_PATH, create_web_app, start_web_server, webhook_secret
 
-    except Exception as e:
-        logger.warning(f"⚠️ Ошибка при очистке сессий: {e}")
+    sharder = workers.UpdateSharder(workers.WORKERS, run_worker)
+    sharder.start()
 
+    await health.start()
+    health.add_check('workers', sharder.alive)
+    health.set_ready(True)
+    metrics.gauge('worker_restarts', 'Перезапусков упавших воркеров', callback=lambda: sharder.restarts)
 
-# ================== HEALTH CHECK ДЛЯ RENDER ==================
-class HealthCheckHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path in ['/', '/health', '/ping']:
-            self.send_response(200)
-            self.send_header('Content-type', 'text/plain')
-            self.end_headers()
-            self.wfile.write(b'Shop Bot is running')
+    runner = None
+    try:
+        me = await bot.me()
+        logger.info(f"✅ Бот @{me.username}: фронт и {workers.WORKERS} воркеров")
+        if webhook_base:
+            secret = webhook_secret(bot_token)
+            runner = await start_web_server(create_web_app(secret_token=secret, sharder=sharder), port)
+            webhook_url = webhook_base.rstrip('/') + WEBHOOK_PATH
+            # Апдейты, накопившиеся за время перезапуска, не выбрасываются
+            await bot.set_webhook(webhook_url, secret_token=secret,
+                                  allowed_updates=allowed_updates, drop_pending_updates=False)
+            logger.info(f"✅ Вебхук установлен: {webhook_url}")
+            startup_timer.report()
+            await shutdown.wait()
         else:
-            self.send_response(404)
-            self.end_headers()
-
-    def log_message(self, format, *args):
-        # Отключаем логи health check запросов
-        pass
-
-
-def run_http_server():
-    """Запуск HTTP сервера для health checks (только на Render)"""
-    port = int(os.environ.get('PORT', 10000))
-    server = HTTPServer(('0.0.0.0', port), HealthCheckHandler)
-    logger.info(f"🌐 HTTP server started on port {port}")
-    server.serve_forever()
-
-
-# ================== ГЛОБАЛЬНЫЕ ОБРАБОТЧИКИ ДЛЯ ОТЛАДКИ ==================
-async def setup_global_handlers(dp: Dispatcher):
-    """Настройка глобальных обработчиков (заглушка)"""
-    # Здесь можно добавить глобальные middleware или фильтры
-    pass
+            await bot.delete_webhook(drop_pending_updates=False)
+            if is_render:
+                runner = await start_web_server(create_web_app(), port)
+            startup_timer.report()
+            logger.info("⏳ Запуск polling...")
+            polling = asyncio.create_task(sharder.poll(bot_token, allowed_updates))
+            await shutdown.wait(polling)
+            # Больше не забираем апдейты: то, что уже в очередях, воркеры доработают
+            polling.cancel()
+            await asyncio.gather(polling, return_exceptions=True)
+    finally:
+        health.set_ready(False)
+        if runner is not None:
+            # Порт закрывается — Telegram перестаёт доставлять вебхуки
+            await runner.cleanup()
+        # Воркерам — время доработать апдейты и сбросить хранилища
+        await sharder.stop(timeout=shutdown.remaining())
+        await bot.session.close()
+        await health.stop()
 
 
 # ================== ОСНОВНАЯ ФУНКЦИЯ БОТА ==================
@@ -120,151 +332,98 @@ async def main():
 
         logger.info("🔄 Инициализация бота...")
 
-        # ОЧИСТКА СТАРЫХ СЕССИЙ ПЕРЕД ЗАПУСКОМ
-        await cleanup_old_sessions(bot_token)
-
-        # Даем время на очистку
-        await asyncio.sleep(3)
-
-        # Инициализируем бота
-        bot = Bot(token=bot_token)
-        dp = Dispatcher(storage=MemoryStorage())
-
-        # Подключаем роутеры
-        dp.include_router(products_router)
-        dp.include_router(cart_router)
-        dp.include_router(order_router)
-        dp.include_router(admin_router)
-
-        # Настраиваем глобальные обработчики для отладки
-        await setup_global_handlers(dp)
-
-        # ================== НОВОЕ: ГЛАВНОЕ МЕНЮ НА КНОПКАХ ==================
-        # Вместо старого текстового меню создаем единый обработчик с инлайн-клавиатурой
-        # Этот обработчик реагирует на команды /start, /help, /menu
-
-        @dp.message(Command("start", "help", "menu"))
-        async def unified_menu_handler(message: types.Message):
-            """ЕДИНЫЙ ОБРАБОТЧИК ГЛАВНОГО МЕНЮ (заменяет старые cmd_start и cmd_help)"""
-
-            # Создаем клавиатуру с кнопками
-            keyboard = types.InlineKeyboardMarkup(inline_keyboard=[
-                # Ряд 1: Основные функции
-                [types.InlineKeyboardButton(text="🛒 Каталог товаров", callback_data="show_catalog")],
-                # Ряд 2: Вспомогательные функции
-                [types.InlineKeyboardButton(text="📦 Моя корзина", callback_data="view_cart"),
-                 types.InlineKeyboardButton(text="📝 Мои заказы", callback_data="my_orders")],
-                # Ряд 3: Информация
-                [types.InlineKeyboardButton(text="❓ Помощь / О нас", callback_data="help_info")]
-            ])
-
-            # Текст главного меню
-            welcome_text = (
-                "🏪 <b>Добро пожаловать в магазин электроники FN-Tech!</b>\n\n"
-                "🎯 <b>Выберите действие:</b>\n\n"
-                "• <b>🛒 Каталог</b> — выбор товаров по категориям\n"
-                "• <b>📦 Корзина</b> — просмотр и оформление заказа\n"
-                "• <b>📝 Мои заказы</b> — история ваших покупок\n"
-                "• <b>❓ Помощь</b> — информация о доставке и оплате\n\n"
-                "✨ <i>Просто нажмите на нужную кнопку!</i>"
-            )
-
-            # Отправляем сообщение с клавиатурой
-            await message.answer(welcome_text, reply_markup=keyboard, parse_mode="HTML")
-            logger.info(f"📱 Пользователь {message.from_user.id} открыл главное меню")
-
-        # ================== НОВОЕ: ОБРАБОТЧИКИ КНОПОК МЕНЮ ==================
-
-        @dp.callback_query(lambda c: c.data == "go_home")
-        async def go_home_handler(callback: types.CallbackQuery):
-            """ОБРАБОТЧИК КНОПКИ 'ГЛАВНАЯ' - возврат в главное меню из любого раздела"""
-            keyboard = types.InlineKeyboardMarkup(inline_keyboard=[
-                [types.InlineKeyboardButton(text="🛒 Каталог товаров", callback_data="show_catalog")],
-                [types.InlineKeyboardButton(text="📦 Моя корзина", callback_data="view_cart"),
-                 types.InlineKeyboardButton(text="📝 Мои заказы", callback_data="my_orders")],
-                [types.InlineKeyboardButton(text="❓ Помощь / О нас", callback_data="help_info")]
-            ])
-
-            welcome_text = (
-                "🏪 <b>Главное меню</b>\n\n"
-                "🎯 <b>Выберите действие:</b>\n\n"
-                "• <b>🛒 Каталог</b> — выбор товаров по категориям\n"
-                "• <b>📦 Корзина</b> — просмотр и оформление заказа\n"
-                "• <b>📝 Мои заказы</b> — история ваших покупок\n"
-                "• <b>❓ Помощь</b> — информация о доставке и оплате"
-            )
-
-            # Редактируем существующее сообщение (меняем текст и кнопки)
-            await callback.message.edit_text(welcome_text, reply_markup=keyboard, parse_mode="HTML")
-            await callback.answer()  # Убираем "часики" у кнопки
-            logger.info(f"🔼 Пользователь {callback.from_user.id} вернулся в главное меню")
-
-        @dp.callback_query(lambda c: c.data == "help_info")
-        async def help_info_handler(callback: types.CallbackQuery):
-            """ОБРАБОТЧИК КНОПКИ 'ПОМОЩЬ' - показывает информацию о магазине"""
-            help_text = (
-                "❓ <b>Помощь и информация</b>\n\n"
-                "🛒 <b>Как сделать заказ:</b>\n"
-                "1. Перейдите в <b>Каталог товаров</b>\n"
-                "2. Выберите товар и добавьте в корзину\n"
-                "3. Перейдите в <b>Корзину</b> для оформления\n\n"
-                "💰 <b>Оплата:</b> Предоплата 100% переводом на карту\n\n"
-                "🚚 <b>Доставка:</b> По Хабаровску — бесплатно, в регионы — по тарифам ТК\n\n"
-                "⏰ <b>Часы работы:</b> Ежедневно с 9:00 до 21:00\n\n"
-                "📞 <b>Контакты:</b> @nicholasbiz (основной канал связи)\n\n"
-                "🔧 <b>Техподдержка:</b> Если что-то не работает, напишите нам!"
-            )
-
-            # Кнопка для возврата в меню
-            keyboard = types.InlineKeyboardMarkup(inline_keyboard=[
-                [types.InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="go_home")]
-            ])
-
-            await callback.message.edit_text(help_text, reply_markup=keyboard, parse_mode="HTML")
-            await callback.answer()
-            logger.info(f"❓ Пользователь {callback.from_user.id} открыл раздел помощи")
-
-        @dp.callback_query(lambda c: c.data == "my_orders")
-        async def my_orders_handler(callback: types.CallbackQuery):
-            """ЗАГЛУШКА ДЛЯ РАЗДЕЛА 'МОИ ЗАКАЗЫ' (будет реализовано позже)"""
-            keyboard = types.InlineKeyboardMarkup(inline_keyboard=[
-                [types.InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="go_home")]
-            ])
-
-            await callback.message.edit_text(
-                "📝 <b>История заказов</b>\n\n"
-                "⏳ <i>Этот раздел находится в активной разработке.</i>\n\n"
-                "Скоро здесь появится:\n"
-                "• Полная история ваших покупок\n"
-                "• Статусы текущих заказов\n"
-                "• Возможность повторить заказ\n\n"
-                "Следите за обновлениями!",
-                reply_markup=keyboard,
-                parse_mode="HTML"
-            )
-            await callback.answer("Раздел в разработке", show_alert=False)
-            logger.info(f"📝 Пользователь {callback.from_user.id} открыл раздел 'Мои заказы'")
-
-        # ================== СУЩЕСТВУЮЩАЯ ЛОГИКА (без изменений) ==================
-        # Старый обработчик кнопки "Главная" (оставлен для совместимости со старыми сообщениями)
-        @dp.callback_query(lambda c: c.data == "go_home")
-        async def old_go_home_handler(callback: types.CallbackQuery):
-            """СТАРЫЙ ОБРАБОТЧИК (для совместимости) - удалите через 2 недели"""
-            # Перенаправляем на новый обработчик
-            await go_home_handler(callback)
-
-        # ================== ЗАПУСК И ПРОВЕРКИ ==================
-        # Проверяем подключение
-        me = await bot.get_me()
-        logger.info(f"✅ Бот @{me.username} успешно запущен!")
-
-        # Удаляем вебхуки еще раз (на всякий случай)
-        await bot.delete_webhook(drop_pending_updates=True)
-        logger.info("✅ Вебхуки удалены")
-
-        # Запускаем поллинг
-        logger.info("⏳ Запуск polling...")
-        await dp.start_polling(bot)
+        # SIGTERM (редеплой) и Ctrl+C — плавная остановка без потери апдейтов
+        shutdown.install()
+
+        # Один бот и одна HTTP-сессия на всё время работы
+        bot = create_bot(bot_token)
+        with startup_timer.stage('диспетчер'):
+            dp = build_dispatcher()
+            # Лимиты исходящих запросов и метрики
+            await setup_global_handlers(dp, bot)
+
+        is_render = os.environ.get('ON_RENDER', '').lower() == 'true'
+        port = int(os.environ.get('PORT', 10000))
+
+        # Вебхук включается явно через WEBHOOK_URL, на Render — по внешнему адресу сервиса
+        webhook_base = os.getenv('WEBHOOK_URL')
+        if not webhook_base and is_render:
+            webhook_base = os.getenv('RENDER_EXTERNAL_URL')
+
+        if workers.WORKERS > 1:
+            # ================== НЕСКОЛЬКО ВОРКЕРОВ ==================
+            # Типы апдейтов — по хендлерам, как их соберёт каждый воркер
+            await run_front(bot, bot_token, dp.resolve_used_update_types(), webhook_base, is_render, port)
+        elif webhook_base:
+            # ================== РЕЖИМ ВЕБХУКА ==================
+            from utils.web_server import WEBHOOK_PATH, create_web_app, start_web_server, webhook_secret
+
+            # Один aiohttp-сервер на $PORT: апдейты Telegram, /health и /ping.
+            # Хуки старта (БД, каталог) выполняются при запуске приложения
+            secret = webhook_secret(bot_token)
+            app = create_web_app(dp, bot, secret_token=secret)
+            runner = await start_web_server(app, port)
+
+            # Проверка токена и установка вебхука — одновременно.
+            # bot.me() кэширует ответ, повторных getMe не будет
+            webhook_url = webhook_base.rstrip('/') + WEBHOOK_PATH
+            with startup_timer.stage('Bot API'):
+                me, _ = await asyncio.gather(
+                    bot.me(),
+                    bot.set_webhook(
+                        webhook_url,
+                        secret_token=secret,
+                        allowed_updates=dp.resolve_used_update_types(),
+                        # Апдейты, накопившиеся за время перезапуска, обрабатываются
+                        drop_pending_updates=False
+                    )
+                )
+            logger.info(f"✅ Бот @{me.username} успешно запущен!")
+            logger.info(f"✅ Вебхук установлен: {webhook_url}")
+            startup_timer.report()
+
+            try:
+                # Сервер работает в этом же event loop — ждём сигнала остановки
+                await shutdown.wait()
+            finally:
+                health.set_ready(False)
+                # Порт закрывается сразу; затем хуки остановки дожидаются
+                # апдейтов в обработке, сбрасывают хранилища и закрывают сессию
+                await runner.cleanup()
+        else:
+            # ================== РЕЖИМ POLLING ==================
+            # Проверка токена и снятие вебхука — одновременно; polling
+            # стартует сразу после ответа, без фиксированных пауз
+            with startup_timer.stage('Bot API'):
+                me, _ = await asyncio.gather(
+                    bot.me(),
+                    bot.delete_webhook(drop_pending_updates=False)
+                )
+            logger.info(f"✅ Бот @{me.username} успешно запущен!")
+
+            runner = None
+            if is_render:
+                from utils.web_server import create_web_app, start_web_server
+
+                # Render требует открытый порт — health check в том же event loop
+                runner = await start_web_server(create_web_app(), port)
+
+            # Итог замеров — после хуков старта, перед первым getUpdates
+            dp.startup.register(startup_timer.report)
+            logger.info("⏳ Запуск polling...")
+            # Сигналы обрабатывает GracefulShutdown, а не aiogram
+            polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False))
+            try:
+                await shutdown.wait(polling)
+                if not polling.done():
+                    health.set_ready(False)
+                    # Новые апдейты больше не забираются; start_polling дождётся
+                    # апдейтов в обработке, сбросит хранилища и закроет сессию
+                    await dp.stop_polling()
+                await polling
+            finally:
+                if runner is not None:
+                    await runner.cleanup()
 
     except Exception as e:
         logger.error(f"❌ Ошибка запуска бота: {e}")
@@ -278,20 +437,14 @@ if __name__ == '__main__':
         sys.exit(1)
 
     # Проверяем, запущен ли на Render
-    is_render = os.environ.get('ON_RENDER', '').lower() == 'true'
-
-    if is_render:
+    if os.environ.get('ON_RENDER', '').lower() == 'true':
         logger.info("🌐 Запуск на Render")
-        # Запускаем HTTP сервер в отдельном потоке
-        import threading
-
-        http_thread = threading.Thread(target=run_http_server, daemon=True)
-        http_thread.start()
     else:
         logger.info("💻 Локальный запуск")
 
     try:
         asyncio.run(main())
+        logger.info("⏹ Бот остановлен")
     except KeyboardInterrupt:
         logger.info("⏹ Бот остановлен пользователем")
     except Exception as e:
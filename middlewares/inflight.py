@@ -0,0 +1,24 @@
+# middlewares/inflight.py
+"""Учёт апдейтов в обработке — их дожидается плавная остановка"""
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from utils.shutdown import GracefulShutdown, shutdown
+
+
+class InFlightMiddleware(BaseMiddleware):
+    """Outer-middleware апдейтов: апдейт считается в обработке до выхода из хендлера"""
+
+    def __init__(self, coordinator: GracefulShutdown = shutdown):
+        self.coordinator = coordinator
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        with self.coordinator.track():
+            return await handler(event, data)
@@ -0,0 +1,93 @@
+# middlewares/metrics.py
+"""Сбор метрик: апдейты, хендлеры и запросы к Bot API (см. utils/metrics.py)"""
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.types import TelegramObject, Update
+
+from utils.health import health
+from utils.metrics import API_DURATION, API_ERRORS, HANDLER_DURATION, HANDLER_ERRORS, UPDATE_DURATION, UPDATES
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Outer-middleware апдейтов: число и полное время обработки по типу апдейта"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        update_type = event.event_type if isinstance(event, Update) else type(event).__name__
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            health.mark_update()
+            UPDATES.inc(update_type)
+            UPDATE_DURATION.observe(time.perf_counter() - start, update_type)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner-middleware событий: время и ошибки конкретного хендлера"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        name = handler_name(data)
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            HANDLER_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            HANDLER_DURATION.observe(time.perf_counter() - start, name)
+
+
+def handler_name(data: Dict[str, Any]) -> str:
+    """Имя хендлера для метрик (им же пользуется loadtest.py)"""
+    # Все кнопки идут через одну таблицу — настоящий хендлер лежит в маршруте
+    route = data.get('callback_route')
+    if route is not None:
+        return route.name
+    handler = data.get('handler')
+    if handler is None:
+        return 'unknown'
+    callback = handler.callback
+    return f"{callback.__module__}.{getattr(callback, '__qualname__', type(callback).__name__)}"
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии: время и ошибки запросов к Telegram по методу API"""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot,
+        method: TelegramMethod,
+    ) -> Response:
+        name = method.__api_method__
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            API_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            API_DURATION.observe(time.perf_counter() - start, name)
+
+
+def setup_metrics(dp: Dispatcher) -> None:
+    """Подключает middleware метрик ко всем типам событий диспетчера"""
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    handler_metrics = HandlerMetricsMiddleware()
+    for name, observer in dp.observers.items():
+        if name not in ('update', 'error'):
+            observer.middleware(handler_metrics)
@@ -0,0 +1,221 @@
+# middlewares/rate_limit.py
+"""Планировщик исходящих запросов к Telegram: лимиты, приоритеты, RetryAfter.
+
+Подключается к сессии бота (bot.session.middleware) и пропускает через себя
+все отправки. Лимиты Telegram:
+  * ~30 сообщений в секунду на бота в целом;
+  * ~1 сообщение в секунду в один чат, ~20 в минуту в группу.
+
+Ответы на нажатия кнопок (answerCallbackQuery) идут вне очереди, массовые
+рассылки — в последнюю очередь (см. bulk_priority()).
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+
+logger = logging.getLogger(__name__)
+
+# === ПРИОРИТЕТЫ (меньше — важнее) ===
+PRIORITY_CALLBACK = 0     # ответ на нажатие кнопки: пользователь смотрит на «часики»
+PRIORITY_INTERACTIVE = 1  # ответы пользователям
+PRIORITY_BULK = 2         # рассылки, уведомления
+
+# Общий лимит бота; поднимается, если Telegram выдал боту повышенный лимит
+GLOBAL_RATE = float(os.getenv('TG_GLOBAL_RATE', 30))
+
+_priority: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar('send_priority', default=None)
+
+# Методы, не привязанные к чату, но требующие быстрого ответа
+_URGENT_METHODS = {'answerCallbackQuery', 'answerInlineQuery'}
+# Методы, которые считаются отправкой сообщений (по префиксу имени)
+_SEND_PREFIXES = ('send', 'edit', 'copy', 'forward')
+
+
+@contextmanager
+def bulk_priority():
+    """Все отправки внутри блока идут с низким приоритетом (рассылки)"""
+    token = _priority.set(PRIORITY_BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity в запасе"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', 'blocked_until')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self, now: float) -> float:
+        """Забирает токен (возможно, в долг); возвращает, сколько ждать"""
+        self._refill(now)
+        self.tokens -= 1
+        wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def delay(self, now: float) -> float:
+        """Сколько ждать до появления токена (не забирая его)"""
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def block(self, until: float) -> None:
+        self.blocked_until = max(self.blocked_until, until)
+
+
+class SendScheduler:
+    """Глобальное ведро с очередью по приоритетам + вёдра на каждый чат"""
+
+    def __init__(self, global_rate: float = GLOBAL_RATE, chat_rate: float = 1, group_rate: float = 20 / 60,
+                 chat_burst: float = 3, max_chats: int = 10_000):
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_chats = max_chats
+
+        self._global = TokenBucket(global_rate, global_rate, time.monotonic())
+        self._chats: Dict[int, TokenBucket] = {}
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._pump: Optional[asyncio.Task] = None
+
+        # Счётчики для статистики
+        self.throttled = 0
+        self.retry_after_hits = 0
+
+    @property
+    def queued(self) -> int:
+        """Запросов, ожидающих глобальный токен"""
+        return len(self._waiters)
+
+    # === ЧАТЫ ===
+    def _chat_bucket(self, chat_id: int, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.max_chats:
+                self._prune(now)
+            # Отрицательный chat_id — группа или канал: там лимит строже
+            rate = self.group_rate if chat_id < 0 else self.chat_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, self.chat_burst, now)
+        return bucket
+
+    def _prune(self, now: float) -> None:
+        # Полное ведро без блокировки ничем не отличается от нового
+        idle = [chat_id for chat_id, bucket in self._chats.items()
+                if bucket.blocked_until <= now and bucket.delay(now) == 0
+                and bucket.tokens >= bucket.capacity]
+        for chat_id in idle:
+            del self._chats[chat_id]
+
+    def block_chat(self, chat_id: Optional[int], seconds: float) -> None:
+        now = time.monotonic()
+        if chat_id is None:
+            self._global.block(now + seconds)
+        else:
+            self._chat_bucket(chat_id, now).block(now + seconds)
+
+    # === ОЖИДАНИЕ ТОКЕНОВ ===
+    async def acquire(self, chat_id: Optional[int], priority: int) -> None:
+        if chat_id is not None:
+            # Сначала лимит чата: пока ждём свой чат, глобальный токен не занимаем
+            wait = self._chat_bucket(chat_id, time.monotonic()).reserve(time.monotonic())
+            if wait > 0:
+                self.throttled += 1
+                await asyncio.sleep(wait)
+
+        if not self._waiters and self._global.delay(time.monotonic()) == 0:
+            self._global.reserve(time.monotonic())
+            return
+
+        self.throttled += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run_pump())
+        await future
+
+    async def _run_pump(self) -> None:
+        """Выдаёт глобальные токены ожидающим строго по приоритету"""
+        while self._waiters:
+            wait = self._global.delay(time.monotonic())
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if future.cancelled():
+                continue
+            self._global.reserve(time.monotonic())
+            future.set_result(None)
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """Middleware сессии: ждёт токены перед отправкой и повторяет после RetryAfter"""
+
+    def __init__(self, scheduler: Optional[SendScheduler] = None, max_retries: int = 3):
+        self.scheduler = scheduler or SendScheduler()
+        self.max_retries = max_retries
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot,
+        method: TelegramMethod,
+    ) -> Response:
+        api_method = method.__api_method__
+        urgent = api_method in _URGENT_METHODS
+        if not urgent and not api_method.startswith(_SEND_PREFIXES):
+            # getMe, getUpdates, setWebhook и т.п. не лимитируем
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, 'chat_id', None)
+        if not isinstance(chat_id, int):
+            # @username каналов и inline-сообщения считаем только в общем лимите
+            chat_id = None
+        if urgent:
+            priority = PRIORITY_CALLBACK
+        else:
+            priority = _priority.get()
+            if priority is None:
+                priority = PRIORITY_INTERACTIVE
+
+        attempt = 0
+        while True:
+            await self.scheduler.acquire(chat_id, priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                attempt += 1
+                self.scheduler.retry_after_hits += 1
+                # Блокируем только этот чат (или всех, если чат неизвестен) — остальные работают
+                self.scheduler.block_chat(chat_id, e.retry_after)
+                if attempt > self.max_retries:
+                    raise
+                logger.warning(
+                    f"⏳ Flood control: {api_method} в чат {chat_id}, "
+                    f"повтор через {e.retry_after} с (попытка {attempt}/{self.max_retries})"
+                )
+                # Небольшой разброс, чтобы повторы не пришли одной пачкой
+                await asyncio.sleep(random.uniform(0, 0.1 * attempt))
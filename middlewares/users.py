@@ -0,0 +1,28 @@
+# middlewares/users.py
+"""Запоминает всех, кто писал боту (для рассылок)"""
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from data.users import UserRegistry, user_registry
+
+
+class UserTrackingMiddleware(BaseMiddleware):
+    """Outer-middleware апдейтов: отмечает отправителя в реестре пользователей"""
+
+    def __init__(self, registry: UserRegistry = user_registry):
+        self.registry = registry
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get('event_from_user')
+        chat = data.get('event_chat')
+        # В рассылку попадают только личные чаты (групп там нет)
+        if user is not None and not user.is_bot and (chat is None or chat.type == 'private'):
+            self.registry.touch(user.id)
+        return await handler(event, data)
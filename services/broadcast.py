@@ -0,0 +1,220 @@
+# services/broadcast.py
+"""Рассылки по всем пользователям с контрольными точками.
+
+Получатели читаются из users порциями по ключу (id > последнего), а не
+целиком: память не зависит от числа пользователей. Сообщения отправляют
+несколько воркеров с низким приоритетом (bulk_priority), так что ответы
+покупателям в том же event loop идут раньше рассылки.
+
+Перед отправкой порции её граница сохраняется в broadcasts.last_user_id.
+После перезапуска рассылка продолжается с этой границы: повторно никто
+сообщение не получит. При штатной остановке граница сдвигается назад до
+последнего взятого в работу получателя, так что остаток порции не теряется;
+при аварии посреди порции её остаток пропускается.
+"""
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from data.database import Database, db
+from keyboards.admin_keyboard import broadcast_progress_keyboard
+from middlewares.rate_limit import bulk_priority
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastJob:
+    """Состояние одной рассылки"""
+
+    def __init__(self, broadcast_id: int, text: str, total: int, last_user_id: int = 0,
+                 sent: int = 0, failed: int = 0, report_chat_id: Optional[int] = None,
+                 report_message_id: Optional[int] = None):
+        self.id = broadcast_id
+        self.text = text
+        self.total = total
+        self.last_user_id = last_user_id
+        # Последний получатель, взятый в работу (получатели идут по возрастанию id)
+        self.cursor = last_user_id
+        self.sent = sent
+        self.failed = failed
+        self.blocked = 0
+        self.report_chat_id = report_chat_id
+        self.report_message_id = report_message_id
+        self.status = 'running'
+        self.started = time.monotonic()
+        self._started_done = sent + failed
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> int:
+        return self.sent + self.failed
+
+    @property
+    def rate(self) -> float:
+        """Сообщений в секунду с момента (пере)запуска"""
+        elapsed = time.monotonic() - self.started
+        return (self.done - self._started_done) / elapsed if elapsed > 0 else 0.0
+
+    def progress_text(self) -> str:
+        rate = self.rate
+        left = max(0, self.total - self.done)
+        eta = f"{int(left / rate) // 60} мин {int(left / rate) % 60} с" if rate > 0 else "—"
+        titles = {'running': '⏳ идёт', 'done': '✅ завершена', 'stopped': '⏹ остановлена'}
+        return (
+            f"📣 <b>Рассылка #{self.id}</b> — {titles.get(self.status, self.status)}\n\n"
+            f"📬 Отправлено: {self.sent} из {self.total}\n"
+            f"⚠️ Ошибок: {self.failed} (заблокировали бота: {self.blocked})\n"
+            f"🚀 Скорость: {rate:.1f} сообщ./с\n"
+            f"⏱ Осталось: {eta}"
+        )
+
+
+class Broadcaster:
+    """Запускает и возобновляет рассылки"""
+
+    def __init__(self, database: Database, concurrency: int = 25, chunk_size: int = 500,
+                 report_interval: float = 5.0):
+        self.database = database
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self.report_interval = report_interval
+        self.jobs: Dict[int, BroadcastJob] = {}
+
+    async def start(self, bot: Bot, text: str, report_chat_id: Optional[int] = None,
+                    report_message_id: Optional[int] = None) -> BroadcastJob:
+        broadcast_id = await self.database.create_broadcast(text, report_chat_id, report_message_id)
+        total = await self.database.count_recipients()
+        job = BroadcastJob(broadcast_id, text, total, report_chat_id=report_chat_id,
+                           report_message_id=report_message_id)
+        self._launch(bot, job)
+        logger.info(f"📣 Рассылка #{job.id} запущена: {total} получателей")
+        return job
+
+    async def resume(self, bot: Bot, owns: Optional[Callable[[Optional[int]], bool]] = None) -> int:
+        """Продолжает рассылки, прерванные перезапуском.
+
+        owns — при нескольких воркерах рассылку продолжает процесс, которому
+        принадлежит чат отчёта: туда же придут нажатия «Статус» и «Стоп».
+        """
+        rows = await self.database.fetch_running_broadcasts()
+        if owns is not None:
+            rows = [row for row in rows if owns(row[5])]
+        for broadcast_id, text, last_user_id, sent, failed, chat_id, message_id in rows:
+            left = await self.database.count_recipients(last_user_id)
+            job = BroadcastJob(broadcast_id, text, sent + failed + left, last_user_id,
+                               sent, failed, chat_id, message_id)
+            self._launch(bot, job)
+            logger.info(f"♻️ Рассылка #{job.id} продолжена с пользователя {last_user_id}")
+        return len(rows)
+
+    def stop(self, broadcast_id: int) -> Optional[BroadcastJob]:
+        job = self.jobs.get(broadcast_id)
+        if job is not None and job.task is not None:
+            job.status = 'stopped'
+            job.task.cancel()
+        return job
+
+    async def close(self) -> None:
+        """Останавливает воркеры при выключении; рассылки останутся 'running' и продолжатся"""
+        tasks = [job.task for job in self.jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _launch(self, bot: Bot, job: BroadcastJob) -> None:
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(bot, job))
+
+    # === ОТПРАВКА ===
+    async def _run(self, bot: Bot, job: BroadcastJob) -> None:
+        reporter = asyncio.create_task(self._report_loop(bot, job))
+        try:
+            with bulk_priority():
+                while True:
+                    chunk = await self.database.fetch_recipients(job.last_user_id, self.chunk_size)
+                    if not chunk:
+                        break
+                    # Граница порции фиксируется до отправки: после рестарта не шлём повторно
+                    job.cursor = job.last_user_id
+                    job.last_user_id = chunk[-1]
+                    await self._checkpoint(job)
+                    await self._send_chunk(bot, job, chunk)
+            job.status = 'done'
+            logger.info(f"✅ Рассылка #{job.id} завершена: {job.sent} отправлено, {job.failed} ошибок")
+        except asyncio.CancelledError:
+            if job.status != 'stopped':
+                # Выключение бота: статус остаётся 'running', рассылка продолжится
+                # с первого получателя, до которого очередь ещё не дошла
+                job.last_user_id = job.cursor
+                raise
+            logger.info(f"⏹ Рассылка #{job.id} остановлена администратором")
+        finally:
+            reporter.cancel()
+            await self._checkpoint(job)
+            await self._report(bot, job)
+
+    async def _send_chunk(self, bot: Bot, job: BroadcastJob, chunk: List[int]) -> None:
+        recipients = iter(chunk)
+        blocked: List[int] = []
+
+        async def worker():
+            for user_id in recipients:
+                job.cursor = user_id
+                try:
+                    await bot.send_message(user_id, job.text, parse_mode="HTML")
+                    job.sent += 1
+                except TelegramForbiddenError:
+                    job.failed += 1
+                    job.blocked += 1
+                    blocked.append(user_id)
+                except TelegramBadRequest as e:
+                    job.failed += 1
+                    logger.debug(f"Рассылка #{job.id}: {user_id} — {e}")
+                except Exception as e:
+                    job.failed += 1
+                    logger.warning(f"⚠️ Рассылка #{job.id}: ошибка отправки {user_id}: {e}")
+
+        try:
+            # Воркеры делят один итератор: параллельно не больше concurrency отправок
+            await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(chunk)))))
+        finally:
+            if blocked:
+                await self.database.mark_users_blocked(blocked)
+
+    async def _checkpoint(self, job: BroadcastJob) -> None:
+        try:
+            await self.database.save_broadcast_progress(
+                job.id, job.status, job.last_user_id, job.sent, job.failed
+            )
+        except Exception as e:
+            logger.error(f"❌ Не удалось сохранить прогресс рассылки #{job.id}: {e}")
+
+    # === ПРОГРЕСС В АДМИНКЕ ===
+    async def _report_loop(self, bot: Bot, job: BroadcastJob) -> None:
+        while True:
+            await asyncio.sleep(self.report_interval)
+            await self._report(bot, job)
+
+    async def _report(self, bot: Bot, job: BroadcastJob) -> None:
+        if job.report_chat_id is None or job.report_message_id is None:
+            return
+        try:
+            await bot.edit_message_text(
+                job.progress_text(),
+                chat_id=job.report_chat_id,
+                message_id=job.report_message_id,
+                reply_markup=broadcast_progress_keyboard(job.id, job.status == 'running'),
+                parse_mode="HTML"
+            )
+        except TelegramBadRequest:
+            # "message is not modified" — прогресс не изменился
+            pass
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось обновить прогресс рассылки #{job.id}: {e}")
+
+
+broadcaster = Broadcaster(db)
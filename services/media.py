@@ -0,0 +1,219 @@
+# services/media.py
+"""Фото товаров: загрузка в Telegram один раз, дальше — по file_id.
+
+Первая отправка фото загружает файл, Telegram возвращает file_id, он
+сохраняется в product_media и все следующие карточки отправляются по
+нему — без повторной выгрузки мегабайтов.
+
+Из исходного JPEG заранее готовятся варианты (карточка до 1280 px и
+миниатюра 320 px для inline-поиска). Готовит их Pillow в пуле процессов,
+чтобы сжатие не занимало event loop. Без Pillow отправляется исходный файл,
+а миниатюры не строятся.
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile, InlineKeyboardMarkup, Message
+
+from data.database import Database, db
+from data.images import product_images
+
+# Pillow не обязателен и нужен только процессам пула: в основном процессе
+# его не импортируем, чтобы не тратить на это время старта
+HAS_PILLOW = importlib.util.find_spec('PIL') is not None
+
+logger = logging.getLogger(__name__)
+
+IMAGES_DIR = os.getenv('IMAGES_DIR', 'images')
+# Готовые варианты; раздаются веб-сервером по /media/<файл>
+VARIANTS_DIR = os.path.join(IMAGES_DIR, 'variants')
+# Внешний адрес сервиса — для ссылок на миниатюры в inline-поиске
+PUBLIC_URL = os.getenv('PUBLIC_URL') or os.getenv('WEBHOOK_URL') or os.getenv('RENDER_EXTERNAL_URL')
+
+# Вариант -> максимальная сторона, px
+VARIANTS = {'card': 1280, 'thumb': 320}
+
+
+def variant_filename(product_id: int, variant: str) -> str:
+    return f"{product_id}_{variant}.jpg"
+
+
+def _make_variants(source: str, product_id: int, out_dir: str) -> Tuple[str, ...]:
+    """Выполняется в отдельном процессе: сохраняет уменьшенные копии фото"""
+    from PIL import Image
+
+    os.makedirs(out_dir, exist_ok=True)
+    made = []
+    with Image.open(source) as image:
+        image = image.convert('RGB')
+        for variant, size in VARIANTS.items():
+            copy = image.copy()
+            copy.thumbnail((size, size), Image.LANCZOS)
+            path = os.path.join(out_dir, variant_filename(product_id, variant))
+            # Своё имя у каждого процесса: воркеры могут строить одно фото одновременно,
+            # и os.replace должен публиковать только дописанный файл
+            tmp = f"{path}.{os.getpid()}.tmp"
+            try:
+                copy.save(tmp, 'JPEG', quality=85, optimize=True, progressive=True)
+                os.replace(tmp, path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+            made.append(variant)
+    return tuple(made)
+
+
+class MediaStore:
+    """Фото товаров: файлы, готовые варианты и file_id загруженных карточек"""
+
+    def __init__(self, database: Database, images_dir: str = IMAGES_DIR,
+                 variants_dir: str = VARIANTS_DIR, workers: int = 2):
+        self.database = database
+        self.images_dir = images_dir
+        self.variants_dir = variants_dir
+        self.workers = workers
+
+        self._files: Dict[int, str] = {}
+        self._file_ids: Dict[int, str] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._tasks: set = set()
+
+        # Счётчики для статистики
+        self.uploads = 0
+        self.reused = 0
+
+    def has_photo(self, product_id: int) -> bool:
+        return product_id in self._file_ids or product_id in self._files
+
+    # === ЗАГРУЗКА ПРИ СТАРТЕ ===
+    async def load(self) -> None:
+        rows = await self.database.fetch_media()
+        # Фото из data/images.py — если в БД про товар ещё ничего нет
+        for product_id, filename in product_images.items():
+            self._files[product_id] = filename
+        for product_id, filename, file_id in rows:
+            self._files[product_id] = filename
+            if file_id:
+                self._file_ids[product_id] = file_id
+
+        missing = [pid for pid in self._files if self._needs_variants(pid)]
+        for product_id in missing:
+            self._schedule(product_id)
+        logger.info(f"🖼 Фото товаров: {len(self._files)}, уже загружено в Telegram: {len(self._file_ids)}")
+
+    async def close(self) -> None:
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    # === ВАРИАНТЫ ===
+    def _source(self, product_id: int) -> Optional[str]:
+        filename = self._files.get(product_id)
+        if filename is None:
+            return None
+        path = os.path.join(self.images_dir, filename)
+        return path if os.path.exists(path) else None
+
+    def variant_path(self, product_id: int, variant: str) -> Optional[str]:
+        path = os.path.join(self.variants_dir, variant_filename(product_id, variant))
+        return path if os.path.exists(path) else None
+
+    def thumb_url(self, product_id: int) -> Optional[str]:
+        """Ссылка на миниатюру для inline-поиска (если сервис доступен снаружи)"""
+        if PUBLIC_URL is None or self.variant_path(product_id, 'thumb') is None:
+            return None
+        return f"{PUBLIC_URL.rstrip('/')}/media/{variant_filename(product_id, 'thumb')}"
+
+    def _needs_variants(self, product_id: int) -> bool:
+        if not HAS_PILLOW or self._source(product_id) is None:
+            return False
+        return any(self.variant_path(product_id, v) is None for v in VARIANTS)
+
+    def _schedule(self, product_id: int) -> None:
+        task = asyncio.create_task(self.prepare(product_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def prepare(self, product_id: int) -> bool:
+        """Строит варианты фото в пуле процессов"""
+        source = self._source(product_id)
+        if not HAS_PILLOW or source is None:
+            return False
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._pool, _make_variants, source, product_id, self.variants_dir)
+        except Exception as e:
+            logger.error(f"❌ Не удалось подготовить фото товара {product_id}: {e}")
+            return False
+        return True
+
+    # === ФОТО ОТ АДМИНА ===
+    async def set_photo(self, product_id: int, filename: str, file_id: Optional[str] = None) -> int:
+        """Новое фото товара. file_id — если фото уже лежит в Telegram (прислал админ).
+
+        Возвращает новую версию каталога в БД.
+        """
+        self._files[product_id] = filename
+        if file_id:
+            self._file_ids[product_id] = file_id
+        else:
+            self._file_ids.pop(product_id, None)
+        version = await self.database.save_media(product_id, filename, file_id, catalog_changed=True)
+        self._schedule(product_id)
+        return version
+
+    # === ОТПРАВКА ===
+    async def send_card(self, message: Message, product_id: int, caption: str,
+                        reply_markup: InlineKeyboardMarkup) -> Optional[Message]:
+        """Отправляет карточку с фото в чат message; None — у товара нет фото"""
+        file_id = self._file_ids.get(product_id)
+        if file_id is not None:
+            try:
+                sent = await message.answer_photo(file_id, caption=caption,
+                                                  reply_markup=reply_markup, parse_mode="HTML")
+                self.reused += 1
+                return sent
+            except TelegramBadRequest as e:
+                # file_id недействителен (например, сменился токен бота) — загрузим заново
+                logger.warning(f"⚠️ file_id фото товара {product_id} не принят: {e}")
+                self._file_ids.pop(product_id, None)
+
+        if not self.has_photo(product_id):
+            return None
+
+        # Одновременные первые просмотры ждут одну загрузку, а не грузят файл каждый
+        lock = self._locks.setdefault(product_id, asyncio.Lock())
+        async with lock:
+            file_id = self._file_ids.get(product_id)
+            if file_id is not None:
+                self.reused += 1
+                return await message.answer_photo(file_id, caption=caption,
+                                                  reply_markup=reply_markup, parse_mode="HTML")
+            path = self.variant_path(product_id, 'card') or self._source(product_id)
+            if path is None:
+                return None
+            sent = await message.answer_photo(FSInputFile(path), caption=caption,
+                                              reply_markup=reply_markup, parse_mode="HTML")
+            self.uploads += 1
+            file_id = sent.photo[-1].file_id
+            self._file_ids[product_id] = file_id
+        self._locks.pop(product_id, None)
+        try:
+            await self.database.save_media(product_id, self._files[product_id], file_id)
+        except Exception as e:
+            logger.error(f"❌ Не удалось сохранить file_id фото товара {product_id}: {e}")
+        return sent
+
+
+media_store = MediaStore(db)
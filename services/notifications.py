@@ -0,0 +1,194 @@
+# services/notifications.py
+"""Уведомления администраторам о новых заказах.
+
+Оформление заказа только кладёт событие в очередь (put_nowait) — доставка
+идёт в фоновой задаче и на время ответа покупателю не влияет. Первый заказ
+после затишья уходит сразу; заказы, пришедшие в течение digest_window после
+отправки, копятся и уходят одной сводкой: «12 новых заказов за 10 с».
+При остановке накопленная сводка уходит сразу, не дожидаясь конца окна.
+"""
+import asyncio
+import html
+import logging
+import time
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from middlewares.rate_limit import bulk_priority
+from utils.shutdown import shutdown
+
+logger = logging.getLogger(__name__)
+
+
+class OrderAlert(NamedTuple):
+    """Событие «новый заказ» для администраторов"""
+    order_id: Optional[int]  # None — заказ отложен и получит номер после перезапуска
+    user_id: int
+    customer: str
+    total: int
+    count: int
+    items: Tuple[Tuple[str, int], ...]  # (название, количество)
+    created: float
+
+
+def _format_single(alert: OrderAlert) -> str:
+    number = f"#{alert.order_id}" if alert.order_id else "(номер будет присвоен позже)"
+    lines = "\n".join(f"• {html.escape(name)} × {qty}" for name, qty in alert.items)
+    return (
+        f"🛎 <b>Новый заказ {number}</b>\n\n"
+        f"👤 {html.escape(alert.customer)} (ID {alert.user_id})\n"
+        f"{lines}\n\n"
+        f"💰 Сумма: {alert.total}₽ ({alert.count} шт.)"
+    )
+
+
+def _format_digest(alerts: Sequence[OrderAlert], max_lines: int = 15) -> str:
+    span = max(1, round(alerts[-1].created - alerts[0].created))
+    total = sum(alert.total for alert in alerts)
+    lines = [
+        f"• {'#' + str(a.order_id) if a.order_id else 'без номера'} — {a.total}₽, "
+        f"{html.escape(a.customer)}"
+        for a in alerts[:max_lines]
+    ]
+    if len(alerts) > max_lines:
+        lines.append(f"… и ещё {len(alerts) - max_lines}")
+    return (
+        f"🔥 <b>{len(alerts)} новых заказов за {span} с</b>\n\n"
+        + "\n".join(lines)
+        + f"\n\n💰 На сумму: {total}₽"
+    )
+
+
+class AdminNotifier:
+    """Очередь уведомлений с группировкой всплесков и повторами доставки"""
+
+    def __init__(self, digest_window: float = 10.0, max_queue: int = 10_000,
+                 max_attempts: int = 4, retry_delay: float = 1.0):
+        self.digest_window = digest_window
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+        self.admin_ids: Tuple[int, ...] = ()
+        self._bot: Optional[Bot] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._closing: Optional[asyncio.Event] = None
+
+        # Счётчики для статистики
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def order_placed(self, order_id: Optional[int], user_id: int, customer: str, total: int,
+                     count: int, items: Iterable[Tuple[str, int]]) -> None:
+        """Ставит уведомление в очередь; никогда не ждёт и не бросает исключений"""
+        if self._queue is None or not self.admin_ids:
+            return
+        alert = OrderAlert(order_id, user_id, customer, total, count, tuple(items), time.monotonic())
+        try:
+            self._queue.put_nowait(alert)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    # === ЗАПУСК И ОСТАНОВКА ===
+    async def start(self, bot: Bot, admin_ids: Iterable[int]) -> None:
+        self._bot = bot
+        self.admin_ids = tuple(admin_ids)
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._closing = asyncio.Event()
+        self._worker = asyncio.create_task(self._run())
+
+    async def close(self, timeout: Optional[float] = None) -> None:
+        """Досылает накопленное сразу и останавливает воркер.
+
+        По умолчанию ждёт не дольше половины оставшегося бюджета остановки —
+        вторая половина остаётся хукам, которые пишут хранилища.
+        """
+        if self._queue is None:
+            return
+        if timeout is None:
+            timeout = shutdown.remaining() / 2
+        queue, self._queue = self._queue, None
+        # Сводка уходит без ожидания окна, повторы доставки не ждут
+        self._closing.set()
+        try:
+            queue.put_nowait(None)
+        except asyncio.QueueFull:
+            # Воркер сам остановится, когда разберёт очередь
+            pass
+        worker, self._worker = self._worker, None
+        done, _ = await asyncio.wait((worker,), timeout=timeout)
+        if not done:
+            logger.warning(f"⚠️ Не все уведомления админам доставлены за {timeout:.1f} с: "
+                           f"осталось {queue.qsize()}")
+            worker.cancel()
+            await asyncio.wait((worker,))
+
+    # === ДОСТАВКА ===
+    async def _run(self) -> None:
+        queue = self._queue
+        closing = self._closing
+        loop = asyncio.get_running_loop()
+        # До этого момента новые заказы копятся в сводку
+        quiet_after = 0.0
+        stop = False
+        while not stop:
+            if closing.is_set() and queue.empty():
+                # Очередь была полна и маркер остановки в неё не попал
+                break
+            alert = await queue.get()
+            if alert is None:
+                break
+            batch: List[OrderAlert] = [alert]
+            wait = quiet_after - loop.time()
+            if wait > 0 and not closing.is_set():
+                try:
+                    await asyncio.wait_for(closing.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+            while not queue.empty():
+                alert = queue.get_nowait()
+                if alert is None:
+                    stop = True
+                    break
+                batch.append(alert)
+
+            text = _format_single(batch[0]) if len(batch) == 1 else _format_digest(batch)
+            await self._deliver(text)
+            quiet_after = loop.time() + self.digest_window
+
+    async def _deliver(self, text: str) -> None:
+        with bulk_priority():
+            await asyncio.gather(*(self._send(admin_id, text) for admin_id in self.admin_ids))
+
+    async def _send(self, admin_id: int, text: str) -> None:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self._bot.send_message(admin_id, text, parse_mode="HTML")
+                self.delivered += 1
+                return
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                # Админ не начал диалог с ботом или заблокировал его — повтор не поможет
+                logger.error(f"❌ Уведомление админу {admin_id} не доставлено: {e}")
+                break
+            except Exception as e:
+                if attempt == self.max_attempts or self._closing.is_set():
+                    logger.error(f"❌ Уведомление админу {admin_id} не доставлено после "
+                                 f"{attempt} попыток: {e}")
+                    break
+                try:
+                    # Остановка прерывает паузу: последняя попытка — сразу
+                    await asyncio.wait_for(self._closing.wait(), self.retry_delay * 2 ** (attempt - 1))
+                except asyncio.TimeoutError:
+                    pass
+        self.failed += 1
+
+
+notifier = AdminNotifier()
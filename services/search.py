@@ -0,0 +1,226 @@
+# services/search.py
+"""Поиск товаров по названию и описанию для inline-режима.
+
+Индекс держится в памяти:
+  * триграммы -> слова словаря (для запросов от 3 символов);
+  * отсортированный словарь слов (префиксный поиск для 1–2 символов);
+  * слово -> множество ID товаров.
+Названия и описания индексируются раздельно: совпадения в названии
+показываются первыми. Пересечения множеств выполняются в C, поэтому
+запрос к каталогу на 50k товаров укладывается в единицы миллисекунд.
+
+Новые товары добавляются в индекс по одному (add), без перестройки.
+Результаты кэшируются по нормализованному запросу на несколько секунд —
+inline-запросы приходят на каждое нажатие клавиши.
+"""
+import asyncio
+import heapq
+import re
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from data.catalog import Product
+
+_WORD = re.compile(r'\w+')
+
+# Слишком короткий запрос даёт почти весь каталог — столько Telegram всё равно не покажет
+MAX_RESULTS = 200
+
+
+def _normalize(text: str) -> List[str]:
+    return _WORD.findall(text.casefold().replace('ё', 'е'))
+
+
+def _trigrams(word: str) -> Set[str]:
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+class _FieldIndex:
+    """Индекс одного поля (название или описание).
+
+    Триграммы указывают на слова словаря, а слова — на товары: проверка
+    «слово содержит запрос» идёт по словарю (он мал), а не по товарам.
+    """
+
+    __slots__ = ('texts', 'grams', 'words', 'sorted_words', '_cache')
+
+    def __init__(self):
+        self.texts: Dict[int, Tuple[str, ...]] = {}  # ID -> слова поля
+        self.grams: Dict[str, Set[str]] = {}         # триграмма -> слова
+        self.words: Dict[str, Set[int]] = {}         # слово -> ID
+        self.sorted_words: List[str] = []
+        # Результаты по слову запроса; сбрасываются при любом изменении поля
+        self._cache: Dict[str, FrozenSet[int]] = {}
+
+    def add(self, product_id: int, text: str) -> None:
+        self._cache.clear()
+        words = tuple(set(_normalize(text)))
+        self.texts[product_id] = words
+        for word in words:
+            ids = self.words.get(word)
+            if ids is None:
+                ids = self.words[word] = set()
+                insort(self.sorted_words, word)
+                for gram in _trigrams(word):
+                    self.grams.setdefault(gram, set()).add(word)
+            ids.add(product_id)
+
+    def remove(self, product_id: int) -> None:
+        words = self.texts.pop(product_id, None)
+        if words is None:
+            return
+        self._cache.clear()
+        for word in words:
+            ids = self.words[word]
+            ids.discard(product_id)
+            if ids:
+                continue
+            del self.words[word]
+            del self.sorted_words[bisect_left(self.sorted_words, word)]
+            for gram in _trigrams(word):
+                gram_words = self.grams[gram]
+                gram_words.discard(word)
+                if not gram_words:
+                    del self.grams[gram]
+
+    def match(self, term: str) -> FrozenSet[int]:
+        """ID товаров, в поле которых есть слово, содержащее term"""
+        result = self._cache.get(term)
+        if result is None:
+            result = self._cache[term] = frozenset().union(*(self.words[w] for w in self._matching_words(term)))
+            if len(self._cache) > 4096:
+                self._cache.clear()
+        return result
+
+    def _matching_words(self, term: str) -> Iterable[str]:
+        if len(term) < 3:
+            # Короткий запрос — префикс слова
+            start = bisect_left(self.sorted_words, term)
+            for word in self.sorted_words[start:]:
+                if not word.startswith(term):
+                    break
+                yield word
+            return
+
+        postings = []
+        for gram in _trigrams(term):
+            words = self.grams.get(gram)
+            if not words:
+                return
+            postings.append(words)
+        postings.sort(key=len)
+        for word in postings[0].intersection(*postings[1:]):
+            # Все триграммы есть, но не обязательно подряд — проверяем подстроку
+            if len(term) == 3 or term in word:
+                yield word
+
+
+class SearchIndex:
+    """Триграммный индекс каталога с кэшем результатов"""
+
+    def __init__(self, cache_ttl: float = 30.0, cache_size: int = 4096):
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._names = _FieldIndex()
+        self._descriptions = _FieldIndex()
+        self._cache: "OrderedDict[str, Tuple[float, Tuple[int, ...]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._names.texts)
+
+    # === ПОСТРОЕНИЕ ===
+    def rebuild(self, products: Iterable[Product]) -> None:
+        """Полная перестройка (при загрузке каталога)"""
+        self._names = _FieldIndex()
+        self._descriptions = _FieldIndex()
+        for product in products:
+            self._index(product)
+        self._cache.clear()
+
+    async def rebuild_in_thread(self, products: Iterable[Product]) -> None:
+        """Перестройка в отдельном потоке: event loop не стоит; индекс подменяется целиком"""
+        products = tuple(products)
+        names, descriptions = await asyncio.get_running_loop().run_in_executor(
+            None, self._build, products
+        )
+        self._names, self._descriptions = names, descriptions
+        self._cache.clear()
+
+    @staticmethod
+    def _build(products: Tuple[Product, ...]) -> Tuple["_FieldIndex", "_FieldIndex"]:
+        names, descriptions = _FieldIndex(), _FieldIndex()
+        for product in products:
+            names.add(product.id, product.name)
+            descriptions.add(product.id, product.description)
+        return names, descriptions
+
+    def add(self, product: Product) -> None:
+        """Добавляет или обновляет один товар"""
+        self.remove(product.id)
+        self._index(product)
+        self._cache.clear()
+
+    def remove(self, product_id: int) -> None:
+        self._names.remove(product_id)
+        self._descriptions.remove(product_id)
+        self._cache.clear()
+
+    def _index(self, product: Product) -> None:
+        self._names.add(product.id, product.name)
+        self._descriptions.add(product.id, product.description)
+
+    # === ПОИСК ===
+    def search(self, query: str) -> Tuple[int, ...]:
+        """ID найденных товаров: сначала совпадения в названии, затем в описании"""
+        terms = _normalize(query)
+        if not terms:
+            return ()
+        key = ' '.join(terms)
+        now = time.monotonic()
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > now:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return cached[1]
+
+        self.misses += 1
+        result = self._search(terms)
+        self._cache[key] = (now + self.cache_ttl, result)
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def _search(self, terms: List[str]) -> Tuple[int, ...]:
+        terms = list(set(terms))
+        names = [self._names.match(term) for term in terms]
+
+        # Сначала только названия: если их хватает на выдачу, описания не трогаем
+        in_names = min(names, key=len)
+        for ids in names:
+            if not in_names:
+                break
+            in_names = in_names & ids
+        first = heapq.nsmallest(MAX_RESULTS, in_names)
+        if len(first) == MAX_RESULTS:
+            return tuple(first)
+
+        # Каждое слово запроса должно найтись в названии или описании.
+        # (A & N) | (A & D) обходит только A, не объединяя большие множества N и D
+        anywhere: Optional[FrozenSet[int]] = None
+        for term, term_names in zip(terms, names):
+            descriptions = self._descriptions.match(term)
+            if anywhere is None:
+                anywhere = term_names | descriptions
+            else:
+                anywhere = (anywhere & term_names) | (anywhere & descriptions)
+            if not anywhere:
+                break
+        first += heapq.nsmallest(MAX_RESULTS - len(first), anywhere - in_names)
+        return tuple(first)
+
+search_index = SearchIndex()
@@ -0,0 +1,106 @@
+# utils/callback_codec.py
+"""Компактный типизированный формат callback_data.
+
+Кнопка кодируется в байты и затем в base64url без паддинга:
+
+    [версия схемы][код действия][varint версии каталога][varint аргумента]...
+
+Аргументы — неотрицательные целые (ID товаров, страницы, номера заказов).
+Разбор — один проход по байтам, без регулярных выражений и split().
+Результат всегда укладывается в лимит Telegram 64 байта (проверяется
+при кодировании).
+"""
+import base64
+import binascii
+from typing import NamedTuple, Optional, Tuple
+
+SCHEMA_VERSION = 1
+
+# Лимит Telegram на callback_data
+MAX_CALLBACK_BYTES = 64
+
+# Коды действий. Кнопки живут в старых сообщениях, поэтому коды неизменны:
+# новые действия только дописываются в конец, удалённые не переиспользуются.
+ACTIONS = (
+    'go_home',                # 1
+    'help_info',              # 2
+    'my_orders',              # 3
+    'show_catalog',           # 4
+    'catalog_page',           # 5
+    'product',                # 6
+    'add',                    # 7
+    'back_to_products',       # 8
+    'view_cart',              # 9
+    'clear_cart',             # 10
+    'create_order',           # 11
+    'confirm_order',          # 12
+    'admin_add_product',      # 13
+    'admin_cancel',           # 14
+    'admin_manage_products',  # 15
+    'admin_stats',            # 16
+    'admin_broadcast',        # 17
+    'admin_broadcast_confirm',  # 18
+    'admin_broadcast_status',   # 19
+    'admin_broadcast_stop',     # 20
+    'orders_page',            # 21
+    'repeat_order',           # 22
+)
+
+_CODES = {name: code for code, name in enumerate(ACTIONS, 1)}
+
+
+class Callback(NamedTuple):
+    """Разобранная кнопка"""
+    action: str
+    args: Tuple[int, ...]
+    version: int  # версия каталога, на которой нарисована кнопка (0 — не привязана)
+
+
+def _put_varint(out: bytearray, value: int) -> None:
+    if value < 0:
+        raise ValueError(f"Аргумент callback_data должен быть неотрицательным: {value}")
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def encode(action: str, *args: int, version: int = 0) -> str:
+    """Кодирует действие и аргументы в строку для callback_data"""
+    out = bytearray((SCHEMA_VERSION, _CODES[action]))
+    _put_varint(out, version)
+    for arg in args:
+        _put_varint(out, int(arg))
+    data = base64.urlsafe_b64encode(bytes(out)).rstrip(b'=').decode('ascii')
+    if len(data) > MAX_CALLBACK_BYTES:
+        raise ValueError(f"callback_data длиннее {MAX_CALLBACK_BYTES} байт: {action} {args}")
+    return data
+
+
+def decode(data: str) -> Optional[Callback]:
+    """Разбирает callback_data; None — не наш формат или другая версия схемы"""
+    if len(data) < 4 or len(data) > MAX_CALLBACK_BYTES:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+    except (binascii.Error, ValueError):
+        return None
+    if len(raw) < 3 or raw[0] != SCHEMA_VERSION:
+        return None
+    code = raw[1]
+    if not 0 < code <= len(ACTIONS):
+        return None
+
+    values = []
+    value = shift = 0
+    for byte in raw[2:]:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value = shift = 0
+    if shift:
+        # Обрезанный varint
+        return None
+    return Callback(ACTIONS[code - 1], tuple(values[1:]), values[0])
@@ -0,0 +1,178 @@
+# utils/callbacks.py
+"""Единая таблица маршрутизации callback-кнопок.
+
+callback_data разбирается один раз в (action, args), обработчик находится
+по action в словаре — стоимость маршрутизации не растёт с числом экранов,
+в отличие от цепочки лямбда-фильтров, которые aiogram проверяет по очереди.
+
+Формат данных — компактный base64 из utils/callback_codec.py. Для кнопок
+в старых сообщениях понимаем и прежние форматы: "action", "action:arg:arg"
+и "product_5_0".
+"""
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.types import CallbackQuery
+
+from utils import callback_codec
+
+logger = logging.getLogger(__name__)
+
+Args = Tuple[Any, ...]
+
+
+def callback_data(action: str, *args: int, version: int = 0) -> str:
+    """Собирает callback_data для кнопки.
+
+    version — версия каталога, для которой нарисована кнопка; по ней
+    обработчик дёшево узнаёт, что кнопка из устаревшего сообщения.
+    """
+    return callback_codec.encode(action, *args, version=version)
+
+
+class Route:
+    """Зарегистрированный обработчик действия"""
+
+    __slots__ = ('action', 'handler', 'name')
+
+    def __init__(self, action: str, callback: Callable[..., Any]):
+        self.action = action
+        self.handler = CallableObject(callback)
+        self.name = f"{callback.__module__}.{callback.__qualname__}"
+
+
+class CallbackTable:
+    """Словарь action -> обработчик поверх одного aiogram-роутера"""
+
+    def __init__(self, name: str = 'callbacks'):
+        self.router = Router(name=name)
+        self._routes: Dict[str, Route] = {}
+        # Старые форматы "product_5_0" -> action "product" (кнопки в старых сообщениях)
+        self._legacy: Dict[str, str] = {}
+        self._duplicates: List[str] = []
+        self._fallback: Optional[Route] = None
+
+        self.router.callback_query.register(self._dispatch, self._match)
+
+    # === РЕГИСТРАЦИЯ ===
+    def action(self, name: str, *, legacy_prefix: Optional[str] = None):
+        """Декоратор: регистрирует обработчик действия name.
+
+        Обработчик получает callback и (по желанию) args и version, а также
+        любые данные aiogram (state, bot, ...) — как обычный хендлер.
+        """
+        if name not in callback_codec.ACTIONS:
+            raise ValueError(f"Действие '{name}' не описано в callback_codec.ACTIONS")
+
+        def decorator(callback: Callable[..., Any]) -> Callable[..., Any]:
+            route = Route(name, callback)
+            existing = self._routes.get(name)
+            if existing is not None:
+                # Первый зарегистрированный выигрывает, конфликт покажет check()
+                self._duplicates.append(
+                    f"действие '{name}': {route.name} дублирует {existing.name}"
+                )
+            else:
+                self._routes[name] = route
+            if legacy_prefix is not None:
+                self._legacy[legacy_prefix] = name
+            return callback
+        return decorator
+
+    def fallback(self, callback: Callable[..., Any]) -> Callable[..., Any]:
+        """Декоратор: обработчик кнопок, для которых нет маршрута (устаревшие кнопки)"""
+        self._fallback = Route('*', callback)
+        return callback
+
+    # === РАЗБОР И ДИСПЕТЧЕРИЗАЦИЯ ===
+    def parse(self, data: str) -> Tuple[Optional[Route], Args, int]:
+        """Возвращает (маршрут, аргументы, версия каталога кнопки)"""
+        # Кнопки без аргументов из старых сообщений: "go_home"
+        route = self._routes.get(data)
+        if route is not None:
+            return route, (), 0
+
+        decoded = callback_codec.decode(data)
+        if decoded is not None:
+            return self._routes.get(decoded.action), decoded.args, decoded.version
+
+        # Прежние текстовые форматы
+        action, sep, rest = data.partition(':')
+        if sep:
+            route = self._routes.get(action)
+            if route is not None:
+                return route, tuple(rest.split(':')), 0
+        route, args = self._parse_legacy(data)
+        return route, args, 0
+
+    def _parse_legacy(self, data: str) -> Tuple[Optional[Route], Args]:
+        # "catalog_page_2" -> самый длинный зарегистрированный префикс "catalog_page"
+        parts = data.split('_')
+        found = None
+        for i in range(1, len(parts)):
+            action = self._legacy.get('_'.join(parts[:i]))
+            if action is not None:
+                found = (self._routes.get(action), tuple(parts[i:]))
+        return found if found is not None else (None, ())
+
+    def _match(self, callback: CallbackQuery) -> Any:
+        """Фильтр aiogram: находит маршрут и передаёт его хендлеру"""
+        if not callback.data:
+            return False
+        route, args, version = self.parse(callback.data)
+        if route is None:
+            route = self._fallback
+            if route is None:
+                return False
+        return {'callback_route': route, 'callback_args': args, 'callback_version': version}
+
+    async def _dispatch(self, callback: CallbackQuery, callback_route: Route,
+                        callback_args: Args, callback_version: int, **data: Any) -> Any:
+        return await callback_route.handler.call(
+            callback, args=callback_args, version=callback_version, **data
+        )
+
+    # === ПРОВЕРКА ПРИ СТАРТЕ ===
+    def check(self, root: Optional[Router] = None) -> List[str]:
+        """Возвращает (и логирует) найденные проблемы маршрутизации"""
+        problems = list(self._duplicates)
+
+        # Старый префикс, перекрывающий действие или другой префикс
+        for prefix, action in self._legacy.items():
+            if prefix in self._routes and prefix != action:
+                problems.append(f"префикс '{prefix}' совпадает с действием '{prefix}'")
+            for other in self._legacy:
+                if other != prefix and other.startswith(prefix + '_'):
+                    problems.append(
+                        f"префикс '{prefix}' перекрывает '{other}' (выбирается самый длинный)"
+                    )
+
+        # Callback-хендлеры вне таблицы проверяются aiogram последовательно
+        if root is not None:
+            for router in _walk(root):
+                if router is self.router:
+                    continue
+                count = len(router.callback_query.handlers)
+                if count:
+                    problems.append(
+                        f"роутер '{router.name}': {count} callback-хендлер(ов) вне таблицы"
+                    )
+
+        for problem in problems:
+            logger.warning(f"⚠️ Маршрутизация: {problem}")
+        logger.info(f"🧭 Таблица callback-маршрутов: {len(self._routes)} действий")
+        return problems
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+
+def _walk(router: Router):
+    yield router
+    for sub_router in router.sub_routers:
+        yield from _walk(sub_router)
+
+
+callbacks = CallbackTable()
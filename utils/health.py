@@ -0,0 +1,110 @@
+# utils/health.py
+"""Состояние процесса для /live и /ready.
+
+Задержка event loop меряется фоновой задачей: она засыпает на interval и
+смотрит, насколько позже проснулась. Если loop занят синхронной работой,
+опоздание растёт — и /ready начинает отвечать 503, чтобы платформа
+перестала слать трафик на перегруженный экземпляр (а /live — чтобы его
+перезапустила, если лаг совсем большой).
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+# Пороги задержки event loop, секунды
+READY_MAX_LAG = float(os.getenv('HEALTH_READY_MAX_LAG', 1.0))
+LIVE_MAX_LAG = float(os.getenv('HEALTH_LIVE_MAX_LAG', 10.0))
+
+
+class HealthMonitor:
+    """Задержка event loop, время последнего апдейта и готовность к работе"""
+
+    def __init__(self, interval: float = 0.5, window: int = 20,
+                 ready_max_lag: float = READY_MAX_LAG, live_max_lag: float = LIVE_MAX_LAG):
+        self.interval = interval
+        self.ready_max_lag = ready_max_lag
+        self.live_max_lag = live_max_lag
+
+        # Последние замеры задержки: окно в window * interval секунд
+        self._lags: Deque[float] = deque(maxlen=window)
+        self._last_beat = 0.0
+        self._last_update: Optional[float] = None
+        self._started = time.monotonic()
+        self._ready = False
+        self._sampler: Optional[asyncio.Task] = None
+        # Дополнительные условия готовности (например, живы ли воркеры)
+        self._checks: Dict[str, Callable[[], bool]] = {}
+
+    # === ЗАМЕРЫ ===
+    def mark_update(self) -> None:
+        """Вызывается на каждый обработанный апдейт"""
+        self._last_update = time.monotonic()
+
+    def set_ready(self, ready: bool) -> None:
+        self._ready = ready
+
+    def add_check(self, name: str, check: Callable[[], bool]) -> None:
+        """Условие, без которого /ready отвечает 503"""
+        self._checks[name] = check
+
+    @property
+    def lag(self) -> float:
+        """Худшая задержка loop за окно; учитывает и зависание прямо сейчас"""
+        worst = max(self._lags, default=0.0)
+        if self._sampler is not None and self._last_beat:
+            # Сэмплер не просыпался дольше положенного — loop занят прямо сейчас
+            worst = max(worst, time.monotonic() - self._last_beat - self.interval)
+        return worst
+
+    async def start(self) -> None:
+        if self._sampler is None or self._sampler.done():
+            self._last_beat = time.monotonic()
+            self._sampler = asyncio.create_task(self._sample())
+
+    async def stop(self) -> None:
+        self._ready = False
+        if self._sampler is not None:
+            self._sampler.cancel()
+            try:
+                await self._sampler
+            except asyncio.CancelledError:
+                pass
+            self._sampler = None
+
+    async def _sample(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._lags.append(max(0.0, now - expected))
+            self._last_beat = now
+
+    # === ОТЧЁТЫ ===
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        checks = {name: check() for name, check in self._checks.items()}
+        return {
+            'ready': self._ready and all(checks.values()),
+            'checks': checks,
+            'loop_lag_seconds': round(self.lag, 4),
+            'seconds_since_last_update': (
+                round(now - self._last_update, 1) if self._last_update is not None else None
+            ),
+            'pending_tasks': len(asyncio.all_tasks()),
+            'uptime_seconds': round(now - self._started, 1),
+        }
+
+    def live(self) -> Tuple[bool, Dict[str, Any]]:
+        """Процесс жив: loop отвечает без огромной задержки"""
+        report = self.snapshot()
+        return report['loop_lag_seconds'] < self.live_max_lag, report
+
+    def ready(self) -> Tuple[bool, Dict[str, Any]]:
+        """Можно принимать трафик: бот запущен и loop не перегружен"""
+        report = self.snapshot()
+        return report['ready'] and report['loop_lag_seconds'] < self.ready_max_lag, report
+
+
+health = HealthMonitor()
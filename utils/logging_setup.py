@@ -0,0 +1,156 @@
+# utils/logging_setup.py
+"""Логирование без блокировки event loop.
+
+Хендлеры кладут записи в очередь (QueueHandler) — это O(1) и без
+форматирования. Форматирует и пишет в stderr фоновый поток QueueListener,
+поэтому медленный вывод не задерживает обработку апдейтов.
+
+Настройка через окружение:
+  LOG_FORMAT=json          — JSON по строке на запись (по умолчанию текст);
+  LOG_LEVEL=INFO           — общий уровень;
+  LOG_LEVELS=handlers.products=DEBUG,aiogram.event=WARNING — уровни модулей;
+  LOG_SAMPLE_EVERY=100     — из частых строк (extra=SAMPLED) пишется каждая N-я.
+Уровни модулей меняются и на ходу: set_level() / команда /loglevel в админке.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# Пометка частых строк для выборочной записи: logger.debug("...", extra=SAMPLED)
+SAMPLED = {'sampled': True}
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который не форматирует запись в потоке вызова.
+
+    Стандартный prepare() собирает сообщение сразу — то есть в event loop.
+    Здесь запись уходит в очередь как есть, а msg % args выполняет поток
+    слушателя. Аргументы логов должны быть неизменяемыми (числа, строки).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает каждую N-ю из помеченных записей для каждого места вызова"""
+
+    def __init__(self, every: int = 100):
+        super().__init__()
+        self.every = max(1, every)
+        self._seen: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, 'sampled', False) or self.every == 1:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            seen = self._seen.get(key, 0)
+            self._seen[key] = seen + 1
+        if seen % self.every:
+            return False
+        # Сколько таких строк представляет эта запись
+        record.sample_weight = self.every
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created))
+                  + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        weight = getattr(record, 'sample_weight', None)
+        if weight:
+            entry['sample_weight'] = weight
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def setup_logging(level: Optional[str] = None, fmt: Optional[str] = None) -> None:
+    """Настраивает корневой логгер: очередь + фоновый поток записи"""
+    global _listener
+    if _listener is not None:
+        return
+
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    fmt = (fmt or os.getenv('LOG_FORMAT', 'text')).lower()
+
+    output = logging.StreamHandler(sys.stderr)
+    if fmt == 'json':
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT, DATE_FORMAT))
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = _DeferredQueueHandler(log_queue)
+    # Выборка на стороне вызова: отброшенные записи даже не попадают в очередь
+    handler.addFilter(SamplingFilter(int(os.getenv('LOG_SAMPLE_EVERY', 100))))
+
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    for name, module_level in _parse_levels(os.getenv('LOG_LEVELS', '')).items():
+        set_level(name, module_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Дописывает очередь и останавливает поток записи"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in spec.split(','):
+        name, sep, value = item.strip().partition('=')
+        if sep and name:
+            levels[name.strip()] = value.strip().upper()
+    return levels
+
+
+def set_level(name: str, level: str) -> str:
+    """Меняет уровень логгера модуля на ходу; возвращает установленный уровень"""
+    level = level.upper()
+    if not isinstance(logging.getLevelName(level), int):
+        raise ValueError(f"Неизвестный уровень логирования: {level}")
+    logger = logging.getLogger(name if name != 'root' else None)
+    logger.setLevel(level)
+    return level
+
+
+def configured_levels() -> Dict[str, str]:
+    """Логгеры с явно заданным уровнем (для /loglevel без аргументов)"""
+    levels = {'root': logging.getLevelName(logging.getLogger().level)}
+    for name, logger in sorted(logging.Logger.manager.loggerDict.items()):
+        if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET:
+            levels[name] = logging.getLevelName(logger.level)
+    return levels
@@ -0,0 +1,212 @@
+# utils/metrics.py
+"""Метрики в формате Prometheus без внешних зависимостей.
+
+Счётчики, гистограммы и «измерители» (gauge) живут в одном реестре и
+отдаются текстом по /metrics. Запись метрики — словарь по кортежу меток
+и пара сложений, поэтому её можно вызывать на каждом апдейте.
+
+При нескольких воркерах (WORKERS > 1) каждый процесс пишет в свой реестр,
+а воркеры периодически присылают фронту его содержимое (collect); фронт
+отдаёт их метрики вместе со своими, с меткой worker="N".
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+Labels = Tuple[str, ...]
+
+# Метрика в готовом виде: (строки HELP/TYPE, строки значений)
+Family = Tuple[List[str], List[str]]
+
+# Границы корзин гистограмм, секунды: от 1 мс до 10 с
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _add_label(line: str, label: str) -> str:
+    """Добавляет метку к строке значения: 'name{a="1"} 5' -> 'name{a="1",worker="0"} 5'"""
+    series, value = line.rsplit(' ', 1)
+    if series.endswith('}'):
+        series = series[:-1] + ',' + label + '}'
+    else:
+        series += '{' + label + '}'
+    return f"{series} {value}"
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Монотонно растущий счётчик"""
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {value}"
+                for labels, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    """Текущее значение; может читаться функцией в момент выдачи /metrics"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Labels, float] = {}
+        self._callback = callback
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def set_function(self, callback: Callable[[], float]) -> None:
+        self._callback = callback
+
+    def render(self) -> List[str]:
+        if self._callback is not None:
+            return [f"{self.name} {self._callback()}"]
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {value}"
+                for labels, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    """Распределение значений (задержек) по корзинам"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        # Метки -> [счётчики по корзинам (+Inf последней), сумма]
+        self._series: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = series
+        # Счётчик хранится только в первой подходящей корзине, накопление — при выдаче
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {total[0]}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Набор метрик процесса"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        # Последние метрики других процессов: воркер -> имя -> Family
+        self._remote: Dict[str, Dict[str, Family]] = {}
+
+    def _add(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = (),
+              callback: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._add(Gauge(name, documentation, labels, callback))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, documentation, labels, buckets))
+
+    def collect(self) -> Dict[str, Family]:
+        """Метрики процесса в готовом виде — для передачи фронту"""
+        families: Dict[str, Family] = {}
+        for metric in self._metrics.values():
+            body = metric.render()
+            if body:
+                families[metric.name] = (metric.header(), body)
+        return families
+
+    def merge(self, source: str, families: Dict[str, Family]) -> None:
+        """Заменяет метрики процесса source (воркера) их свежей копией"""
+        self._remote[source] = families
+
+    def render(self) -> str:
+        """Текст для /metrics (text exposition format 0.0.4)"""
+        families = self.collect()
+        # Значения одной метрики из всех процессов идут одним блоком под одним HELP/TYPE
+        for source, remote in self._remote.items():
+            label = f'worker="{_escape(source)}"'
+            for name, (header, body) in remote.items():
+                family = families.setdefault(name, (header, []))
+                family[1].extend(_add_label(line, label) for line in body)
+        lines: List[str] = []
+        for header, body in families.values():
+            lines.extend(header)
+            lines.extend(body)
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# === МЕТРИКИ БОТА ===
+UPDATES = registry.counter('bot_updates_total', 'Обработанные апдейты по типу', ('type',))
+UPDATE_DURATION = registry.histogram(
+    'bot_update_duration_seconds', 'Время обработки апдейта целиком', ('type',)
+)
+HANDLER_DURATION = registry.histogram(
+    'bot_handler_duration_seconds', 'Время работы хендлера', ('handler',)
+)
+HANDLER_ERRORS = registry.counter(
+    'bot_handler_errors_total', 'Исключения в хендлерах', ('handler', 'error')
+)
+API_DURATION = registry.histogram(
+    'telegram_api_duration_seconds', 'Время запроса к Bot API', ('method',)
+)
+API_ERRORS = registry.counter(
+    'telegram_api_errors_total', 'Ошибки запросов к Bot API', ('method', 'error')
+)
@@ -0,0 +1,33 @@
+# utils/screens.py
+"""Смена экрана в том же сообщении.
+
+Текстовое сообщение редактируется на месте. Сообщение с фото (карточка
+товара) нельзя превратить в текстовое через edit_text — его удаляем и
+отправляем экран новым сообщением.
+"""
+from typing import Optional
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, Message
+
+
+async def show_screen(message: Message, text: str,
+                      reply_markup: Optional[InlineKeyboardMarkup] = None,
+                      keep_photo: bool = False) -> None:
+    """Показывает текстовый экран вместо message.
+
+    keep_photo — у сообщения с фото меняется только подпись (например,
+    «добавлено в корзину» под фото товара).
+    """
+    if not message.photo:
+        await message.edit_text(text, reply_markup=reply_markup, parse_mode="HTML")
+        return
+    if keep_photo:
+        await message.edit_caption(caption=text, reply_markup=reply_markup, parse_mode="HTML")
+        return
+    await message.answer(text, reply_markup=reply_markup, parse_mode="HTML")
+    try:
+        await message.delete()
+    except TelegramBadRequest:
+        # Сообщение старше 48 часов удалить нельзя — остаётся в истории
+        pass
@@ -0,0 +1,118 @@
+# utils/shutdown.py
+"""Плавная остановка по SIGTERM/SIGINT.
+
+Порядок: перестаём принимать апдейты (polling останавливается, вебхук
+закрывает порт), ждём апдейты, которые уже обрабатываются, — не дольше
+timeout секунд, затем хуки остановки сбрасывают на диск корзины, FSM,
+очередь заказов и прочее, и только потом закрывается сессия бота.
+
+Render между SIGTERM и SIGKILL даёт 30 секунд. Весь бюджет остановки —
+SHUTDOWN_BUDGET (28 с, 2 с запаса); из него ожидание апдейтов занимает
+не больше SHUTDOWN_TIMEOUT (20 с), а хуки берут свои таймауты из остатка
+(remaining), а не из собственных констант.
+"""
+import asyncio
+import logging
+import os
+import signal
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+SHUTDOWN_BUDGET = float(os.getenv('SHUTDOWN_BUDGET', 28))
+SHUTDOWN_TIMEOUT = min(float(os.getenv('SHUTDOWN_TIMEOUT', 20)), SHUTDOWN_BUDGET)
+
+
+class GracefulShutdown:
+    """Сигнал остановки и учёт апдейтов, которые сейчас обрабатываются"""
+
+    def __init__(self, timeout: float = SHUTDOWN_TIMEOUT, budget: float = SHUTDOWN_BUDGET):
+        self.timeout = timeout
+        self.budget = budget
+        self.requested = asyncio.Event()
+        self._started: Optional[float] = None
+        self._inflight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    # === СИГНАЛЫ ===
+    def install(self) -> None:
+        """Перехватывает SIGTERM и SIGINT в текущем event loop"""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.request, sig.name)
+            except NotImplementedError:
+                # Windows: обработчик сигнала выполняется вне loop
+                signal.signal(sig, lambda signum, frame: loop.call_soon_threadsafe(
+                    self.request, signal.Signals(signum).name))
+
+    def request(self, reason: str = 'shutdown') -> None:
+        if self.requested.is_set():
+            logger.warning(f"⚠️ Повторный {reason}: остановка уже идёт")
+            return
+        logger.info(f"⏹ Получен {reason}: останавливаемся, в обработке апдейтов: {self._inflight}")
+        self.begin()
+        self.requested.set()
+
+    # === БЮДЖЕТ ВРЕМЕНИ ===
+    def begin(self) -> None:
+        """Запускает отсчёт бюджета остановки (повторные вызовы ничего не меняют).
+
+        Воркер сигналов не получает — у него отсчёт начинается с конца очереди.
+        """
+        if self._started is None:
+            self._started = time.monotonic()
+
+    def remaining(self) -> float:
+        """Сколько секунд бюджета осталось; до начала остановки — весь бюджет"""
+        if self._started is None:
+            return self.budget
+        return max(0.0, self.budget - (time.monotonic() - self._started))
+
+    async def wait(self, task: Optional[asyncio.Future] = None) -> None:
+        """Ждёт сигнала остановки — или завершения task (например, упавшего polling)"""
+        waiter = asyncio.ensure_future(self.requested.wait())
+        try:
+            if task is None:
+                await waiter
+            else:
+                await asyncio.wait((waiter, task), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+
+    # === АПДЕЙТЫ В ОБРАБОТКЕ ===
+    @contextmanager
+    def track(self):
+        self._inflight += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._inflight -= 1
+            if not self._inflight:
+                self._idle.set()
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    async def drain(self) -> bool:
+        """Ждёт завершения апдейтов в обработке; False — не уложились в timeout"""
+        if not self._inflight:
+            return True
+        started = time.monotonic()
+        timeout = min(self.timeout, self.remaining())
+        logger.info(f"⏳ Ждём апдейты в обработке: {self._inflight}")
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ За {timeout:.0f} с не завершились апдейтов: {self._inflight}")
+            return False
+        logger.info(f"✅ Апдейты в обработке завершены за {time.monotonic() - started:.1f} с")
+        return True
+
+
+shutdown = GracefulShutdown()
@@ -0,0 +1,120 @@
+import hashlib
+import logging
+import os
+from typing import Any, Callable, Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from services.media import VARIANTS_DIR
+from utils.health import health
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Путь, на который Telegram присылает обновления
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+
+
+def webhook_secret(bot_token: str) -> str:
+    """Секрет для заголовка X-Telegram-Bot-Api-Secret-Token.
+
+    Если WEBHOOK_SECRET не задан, выводим его из токена, чтобы
+    секрет был стабильным между перезапусками.
+    """
+    secret = os.getenv('WEBHOOK_SECRET')
+    if secret:
+        return secret
+    return hashlib.sha256(bot_token.encode()).hexdigest()[:32]
+
+
+# === HEALTH CHECK ДЛЯ RENDER ===
+async def health_handler(request: web.Request) -> web.Response:
+    return web.Response(text='Shop Bot is running')
+
+
+async def live_handler(request: web.Request) -> web.Response:
+    """Liveness: 503 — процесс завис, его нужно перезапустить"""
+    ok, report = health.live()
+    return web.json_response(report, status=200 if ok else 503)
+
+
+async def ready_handler(request: web.Request) -> web.Response:
+    """Readiness: 503 — бот ещё не запущен, останавливается или loop перегружен"""
+    ok, report = health.ready()
+    return web.json_response(report, status=200 if ok else 503)
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(body=registry.render().encode(),
+                        headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+
+def sharded_webhook_handler(sharder: Any, secret_token: Optional[str]) -> Callable:
+    """Вебхук фронта (WORKERS > 1): апдейт уходит воркеру без разбора в модели aiogram"""
+    async def handler(request: web.Request) -> web.Response:
+        if secret_token and request.headers.get('X-Telegram-Bot-Api-Secret-Token') != secret_token:
+            return web.Response(status=401, text='Unauthorized')
+        # На битое тело отвечаем 200: иначе Telegram повторял бы его бесконечно
+        try:
+            update = await request.json()
+        except ValueError as e:
+            logger.warning(f"⚠️ Вебхук: тело не JSON, пропускаем: {e}")
+            return web.json_response({})
+        if not isinstance(update, dict) or not isinstance(update.get('update_id'), int):
+            logger.warning(f"⚠️ Вебхук: тело не похоже на апдейт Telegram, пропускаем: {update!r:.200}")
+            return web.json_response({})
+        await sharder.dispatch(update)
+        return web.json_response({})
+    return handler
+
+
+def create_web_app(dp: Optional[Dispatcher] = None, bot: Optional[Bot] = None,
+                   secret_token: Optional[str] = None, sharder: Any = None) -> web.Application:
+    """Создаёт aiohttp-приложение: health check и (опционально) вебхук.
+
+    Без dp/bot приложение отвечает только на health check — это режим
+    polling на Render, где нужен открытый порт. С sharder вебхук
+    раздаёт апдейты воркерам.
+    """
+    app = web.Application()
+    for path in ('/', '/health', '/ping'):
+        app.router.add_get(path, health_handler)
+    # Проверки для платформы: жив ли процесс и готов ли принимать трафик
+    app.router.add_get('/live', live_handler)
+    app.router.add_get('/ready', ready_handler)
+    # Метрики в формате Prometheus
+    app.router.add_get('/metrics', metrics_handler)
+
+    # Миниатюры товаров для inline-поиска
+    os.makedirs(VARIANTS_DIR, exist_ok=True)
+    app.router.add_static('/media', VARIANTS_DIR)
+
+    if dp is not None and bot is not None:
+        # Хуки остановки диспетчера (дождаться апдейтов, сбросить хранилища)
+        # регистрируются раньше обработчика вебхука: он при остановке
+        # закрывает сессию бота, а она нужна апдейтам, которые ещё в работе
+        setup_application(app, dp, bot=bot)
+        # handle_in_background: отвечаем Telegram сразу, а апдейт
+        # обрабатывается отдельной задачей — апдейты идут параллельно
+        SimpleRequestHandler(
+            dispatcher=dp,
+            bot=bot,
+            secret_token=secret_token,
+            handle_in_background=True,
+        ).register(app, path=WEBHOOK_PATH)
+    elif sharder is not None:
+        app.router.add_post(WEBHOOK_PATH, sharded_webhook_handler(sharder, secret_token))
+
+    return app
+
+
+async def start_web_server(app: web.Application, port: int) -> web.AppRunner:
+    """Запускает приложение внутри текущего event loop"""
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host='0.0.0.0', port=port)
+    await site.start()
+    logger.info(f"🌐 HTTP server started on port {port}")
+    return runner
@@ -0,0 +1,284 @@
+# utils/workers.py
+"""Многопроцессный режим: фронт-процесс и N воркеров (WORKERS=N).
+
+Фронт только получает апдейты (long polling или вебхук) и раскладывает
+их по воркерам по ID пользователя, а если его нет — по ID чата. Все
+апдейты одного пользователя попадают в один процесс и обрабатываются там
+строго по очереди. Фронт не разбирает апдейты в модели aiogram: только
+json и поиск ID, поэтому он не становится узким местом — разбор и
+обработка идут в воркерах, каждый на своём ядре.
+
+Общее состояние лежит в SQLite (WAL): FSM, корзины, каталог. Воркер
+держит в памяти только «своих» пользователей, а каталог перечитывает,
+когда его меняет другой процесс.
+
+Метрики воркер раз в METRICS_REPORT_INTERVAL секунд отправляет фронту
+по общей очереди, и /metrics фронта отдаёт их с меткой worker.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import aiohttp
+
+from utils.metrics import registry
+from utils.shutdown import shutdown
+
+logger = logging.getLogger(__name__)
+
+# Число процессов-воркеров; 1 — обычный однопроцессный режим
+WORKERS = max(1, int(os.getenv('WORKERS', 1)))
+
+# Сколько апдейтов воркер берёт из очереди, не дождавшись их обработки.
+# Остальные ждут в очереди фронта: она даёт обратное давление на приём,
+# а при падении воркера теряется не больше этого числа апдейтов
+WORKER_MAX_INFLIGHT = max(1, int(os.getenv('WORKER_MAX_INFLIGHT', 100)))
+
+# Как часто воркер отправляет фронту свои метрики, секунды
+METRICS_REPORT_INTERVAL = float(os.getenv('METRICS_REPORT_INTERVAL', 5))
+
+TELEGRAM_API = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
+
+Update = Dict[str, Any]
+
+
+class Shard(NamedTuple):
+    """Доля пользователей, которую обслуживает процесс"""
+    index: int
+    count: int
+
+    def owns(self, key: Optional[int]) -> bool:
+        """Принадлежит ли пользователь (чат) этому процессу; None — шарду 0"""
+        return (key or 0) % self.count == self.index
+
+
+# Шард текущего процесса; воркер выставляет его до сборки диспетчера
+current = Shard(0, 1)
+
+
+def set_current(shard: Shard) -> None:
+    global current
+    current = shard
+
+
+def shard_key(update: Update) -> int:
+    """ID пользователя (или чата) апдейта — по нему выбирается воркер"""
+    for name, event in update.items():
+        if not isinstance(event, dict):
+            continue
+        user = event.get('from') or event.get('user')
+        if user:
+            return user['id']
+        chat = event.get('chat') or event.get('message', {}).get('chat')
+        if chat:
+            return chat['id']
+    # Опросы и прочее без пользователя: порядок не важен
+    return update.get('update_id', 0)
+
+
+# === ФРОНТ ===
+class UpdateSharder:
+    """Запускает воркеры, раздаёт им апдейты и перезапускает упавших"""
+
+    def __init__(self, count: int, target: Callable[[int, int, Any, Any], None],
+                 queue_size: int = 10_000, check_interval: float = 1.0):
+        self.count = count
+        self.check_interval = check_interval
+        self._target = target
+        # spawn: воркер стартует с чистым интерпретатором, без потоков и loop фронта
+        self._ctx = multiprocessing.get_context('spawn')
+        self._queues = [self._ctx.Queue(maxsize=queue_size) for _ in range(count)]
+        # Обратный канал: метрики воркеров -> фронт
+        self._reports = self._ctx.Queue()
+        self._processes: List[Optional[multiprocessing.process.BaseProcess]] = [None] * count
+        self._supervisor: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        # Статистика
+        self.forwarded = [0] * count
+        self.restarts = 0
+
+    def start(self) -> None:
+        for index in range(self.count):
+            self._spawn(index)
+        self._supervisor = asyncio.create_task(self._supervise())
+        logger.info(f"🧩 Запущено воркеров: {self.count}")
+
+    def _spawn(self, index: int) -> None:
+        process = self._ctx.Process(
+            target=self._target, args=(index, self.count, self._queues[index], self._reports),
+            name=f'worker-{index}'
+        )
+        process.start()
+        self._processes[index] = process
+
+    def alive(self) -> bool:
+        return all(p is not None and p.is_alive() for p in self._processes)
+
+    async def _supervise(self) -> None:
+        # Очередь упавшего воркера живёт во фронте: новый процесс продолжит с неё
+        # (апдейты, которые воркер уже взял в обработку, — не больше WORKER_MAX_INFLIGHT — теряются)
+        while True:
+            await asyncio.sleep(self.check_interval)
+            self._collect_reports()
+            for index, process in enumerate(self._processes):
+                if process is not None and not process.is_alive() and not self._stopping:
+                    logger.error(f"💥 Воркер {index} завершился с кодом {process.exitcode}, перезапуск")
+                    self.restarts += 1
+                    self._spawn(index)
+
+    def _collect_reports(self) -> None:
+        """Забирает присланные воркерами метрики в реестр фронта"""
+        while True:
+            try:
+                index, families = self._reports.get_nowait()
+            except queue.Empty:
+                return
+            registry.merge(str(index), families)
+
+    # === РАЗДАЧА АПДЕЙТОВ ===
+    async def dispatch(self, update: Update) -> None:
+        """Кладёт апдейт в очередь его воркера; полная очередь притормаживает приём"""
+        index = shard_key(update) % self.count
+        updates = self._queues[index]
+        while True:
+            try:
+                updates.put_nowait(update)
+                break
+            except queue.Full:
+                await asyncio.sleep(0.05)
+        self.forwarded[index] += 1
+
+    async def poll(self, bot_token: str, allowed_updates: Optional[List[str]] = None,
+                   timeout: int = 30) -> None:
+        """Long polling без разбора в модели aiogram: апдейты уходят воркерам как есть"""
+        url = f"{TELEGRAM_API}/bot{bot_token}/getUpdates"
+        offset = 0
+        backoff = 1.0
+        client_timeout = aiohttp.ClientTimeout(total=timeout + 10)
+        async with aiohttp.ClientSession(timeout=client_timeout) as session:
+            while True:
+                params = {'offset': offset, 'timeout': timeout, 'allowed_updates': allowed_updates}
+                try:
+                    async with session.post(url, json=params) as response:
+                        payload = await response.json()
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    logger.warning(f"⚠️ getUpdates: {e!r}, повтор через {backoff:.0f} с")
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 30)
+                    continue
+
+                if not payload.get('ok'):
+                    retry_after = payload.get('parameters', {}).get('retry_after')
+                    logger.error(f"❌ getUpdates: {payload.get('description')}")
+                    await asyncio.sleep(retry_after or backoff)
+                    backoff = min(backoff * 2, 30)
+                    continue
+
+                backoff = 1.0
+                for update in payload['result']:
+                    await self.dispatch(update)
+                    offset = update['update_id'] + 1
+
+    async def stop(self, timeout: float = 30) -> None:
+        """Воркеры дообрабатывают свои очереди и завершаются"""
+        self._stopping = True
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            try:
+                await self._supervisor
+            except asyncio.CancelledError:
+                pass
+            self._supervisor = None
+
+        # None в конце очереди — сигнал воркеру завершиться после уже принятых апдейтов
+        for updates in self._queues:
+            updates.put(None)
+        loop = asyncio.get_running_loop()
+        processes = [p for p in self._processes if p is not None]
+        await asyncio.gather(*(loop.run_in_executor(None, p.join, timeout) for p in processes))
+        for process in processes:
+            if process.is_alive():
+                logger.warning(f"⚠️ Воркер {process.name} не завершился за {timeout} с")
+                process.terminate()
+        logger.info(f"🧩 Воркеры остановлены, передано апдейтов: {sum(self.forwarded)}")
+
+
+# === ВОРКЕР ===
+def _next_update(updates: Any, poll_interval: float = 1.0) -> Optional[Update]:
+    """Следующий апдейт из очереди; None — пора завершаться (или фронт умер)"""
+    parent = multiprocessing.parent_process()
+    while True:
+        try:
+            return updates.get(timeout=poll_interval)
+        except queue.Empty:
+            if parent is not None and not parent.is_alive():
+                logger.error("💥 Фронт-процесс завершился, воркер останавливается")
+                return None
+
+
+async def consume(dp: Any, bot: Any, updates: Any, drain_timeout: float = 20,
+                  max_inflight: int = WORKER_MAX_INFLIGHT) -> None:
+    """Обрабатывает апдейты из очереди фронта; апдейты одного пользователя — по порядку.
+
+    Из очереди берётся не больше max_inflight необработанных апдейтов.
+    Получив None, дожидается уже начатых апдейтов (не дольше drain_timeout).
+    """
+    loop = asyncio.get_running_loop()
+    # Блокирующее чтение multiprocessing-очереди — в отдельном потоке
+    reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix='updates')
+    chains: Dict[int, asyncio.Task] = {}
+    slots = asyncio.Semaphore(max_inflight)
+
+    def _forget(key: int, task: asyncio.Task) -> None:
+        if chains.get(key) is task:
+            del chains[key]
+
+    try:
+        while True:
+            # Слот занимается до чтения: пока все заняты, апдейты остаются в очереди фронта
+            await slots.acquire()
+            update = await loop.run_in_executor(reader, _next_update, updates)
+            if update is None:
+                slots.release()
+                # Отсюда считается бюджет остановки воркера: доработка и хуки
+                shutdown.begin()
+                break
+            key = shard_key(update)
+            task = asyncio.create_task(_process(dp, bot, update, chains.get(key)))
+            chains[key] = task
+            task.add_done_callback(lambda t, key=key: _forget(key, t))
+            task.add_done_callback(lambda t: slots.release())
+        if chains:
+            logger.info(f"⏳ Воркер дорабатывает апдейты: {len(chains)} пользователей")
+            drain_timeout = min(drain_timeout, shutdown.remaining())
+            done, pending = await asyncio.wait(list(chains.values()), timeout=drain_timeout)
+            if pending:
+                logger.warning(f"⚠️ За {drain_timeout:.0f} с не завершились апдейтов: {len(pending)}")
+    finally:
+        reader.shutdown(wait=False)
+
+
+async def report_metrics(reports: Any, index: int,
+                         interval: float = METRICS_REPORT_INTERVAL) -> None:
+    """Периодически отправляет фронту метрики воркера (до отмены задачи)"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            reports.put_nowait((index, registry.collect()))
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось отправить метрики фронту: {e}")
+
+
+async def _process(dp: Any, bot: Any, update: Update, previous: Optional[asyncio.Task]) -> None:
+    # Следующий апдейт пользователя ждёт предыдущий — порядок как у одного процесса
+    if previous is not None:
+        await asyncio.wait((previous,))
+    try:
+        await dp.feed_raw_update(bot, update)
+    except Exception as e:
+        logger.error(f"❌ Ошибка обработки апдейта {update.get('update_id')}: {e}", exc_info=True)